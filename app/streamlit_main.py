@@ -1,6 +1,26 @@
+import calendar
+import ctypes
+import functools
+import hashlib
+import io
 import json
-from typing import Any, Dict, Optional
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import streamlit as st
+from PIL import Image, ImageOps
 from snowflake.snowpark.context import get_active_session
 import pypdfium2 as pdfium
 
@@ -13,6 +33,340 @@ STAGE_NAME = "DOCS_ROUTER_STAGE"
 RAW_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.RAW"
 DOC_TYPES_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.DOC_TYPES"
 DOC_PROMPTS_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.DOC_TYPE_PROMPTS"
+FINGERPRINTS_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.FILE_FINGERPRINTS"
+FIELD_INDEX_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.RECORD_FIELD_INDEX"
+EXPORT_WATERMARKS_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.EXPORT_WATERMARKS"
+PROCESSING_LOG_TABLE = f"{DB_NAME}.{SCHEMA_NAME}.PROCESSING_LOG"
+EXPORT_STAGE_NAME = "EXPORT_STAGE"
+
+# Upload pipeline defaults (overridable from the Upload tab)
+UPLOAD_WORKERS = 4
+PROCESS_WORKERS = 4
+MAX_ATTEMPTS = 3
+BATCH_SIZE = 1
+
+# Local pre-classification from the PDF text layer (skips the classification AI_EXTRACT pass)
+PRECLASSIFY_PAGES = 1
+PRECLASSIFY_MIN_SCORE = 0.6
+PRECLASSIFY_MIN_MARGIN = 0.25
+RETRY_BACKOFF_SECONDS = 1.0
+
+# Page-chunked extraction for large PDFs (optional, Upload tab): split in the warehouse, extract chunks in parallel
+CHUNK_PAGES = 10
+CHUNK_MIN_PAGES = 20
+CHUNK_PREFIX = "_chunks/"  # stage folder for chunk files; PROCESS_RAW skips it
+
+# Upload preprocessing (optional, Upload tab): shrink oversized scans before they are staged
+UPLOAD_MAX_IMAGE_DPI = 200
+UPLOAD_PAGE_INCHES = 11.69  # long side of an A4 page; phone and scanner images rarely carry a usable DPI
+UPLOAD_JPEG_QUALITY = 85
+# Re-encoding pays only when the upload time saved beats the CPU spent: at 100 Mbps that takes
+# a scan of 2+ MB at 2x+ the target resolution, where JPEG decoding starts at 1/2 scale or less
+# and 3/4+ of the pixels are dropped (see the preprocess benchmark)
+UPLOAD_DOWNSAMPLE_MIN_BYTES = 2 * 1024 * 1024
+UPLOAD_DOWNSAMPLE_MIN_RATIO = 2.0
+UPLOAD_HASH_BLOCK_BYTES = 1024 * 1024
+
+# Rendered PDF page cache (shared across sessions in this app process)
+PAGE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PAGE_CACHE_MAX_DOCS = 8
+
+# Stage file byte cache: hot entries in memory, cold entries spilled to local disk
+DOC_CACHE_MEMORY_BYTES = 128 * 1024 * 1024
+DOC_CACHE_DISK_BYTES = 2 * 1024 * 1024 * 1024
+DOC_CACHE_DIR: Optional[str] = None  # None = a private temp directory
+DOC_CACHE_MAX_MAPS = 32  # spilled files kept mapped at once; each map holds a file descriptor
+
+# Review tab: records listed per page (keyset-paginated on created_at, file_name)
+REVIEW_PAGE_SIZE = 50
+# Review search: most matching records returned from RECORD_FIELD_INDEX
+SEARCH_MAX_RESULTS = 200
+
+# Presigned stage URLs: signed for an hour, handed out only while 15+ minutes remain, and
+# re-signed in the background with 20 minutes left if used within the last 30 minutes
+PRESIGNED_URL_EXPIRY_SECONDS = 3600
+PRESIGNED_URL_MIN_LIFETIME_SECONDS = 900
+PRESIGNED_URL_REFRESH_SECONDS = 1200
+PRESIGNED_URL_KEEP_WARM_SECONDS = 1800
+PRESIGNED_URL_BATCH = 200  # files signed per GET_PRESIGNED_URL query
+
+# Caches are invalidated by scoped version bumps; the TTL catches writes made outside this
+# app process. Tasks (ingestion, VALIDATE_PENDING_TASK) write RAW without bumping anything, so
+# record, validation and export loaders keep a short TTL; doc types and prompts only change
+# through saves, which bump, and the change poller below
+CACHE_MAX_AGE_SECONDS = 10
+METADATA_CACHE_MAX_AGE_SECONDS = 600
+# DOC_TYPES/DOC_TYPE_PROMPTS change markers are polled at most this often per app process (from
+# open sessions' script threads), so outside writes reach the shared metadata caches within a poll
+METADATA_POLL_SECONDS = 15
+
+# Tier-1 validation runs asynchronously (VALIDATE_PENDING_TASK); pending records are re-checked this often
+VALIDATION_POLL_SECONDS = 5
+# Value types a prompt's validation rule can declare; records whose rule-checked fields all pass
+# are marked valid by VALIDATE_PENDING without an AI_COMPLETE call
+FIELD_RULE_TYPES = ["string", "number", "integer", "boolean", "date", "email", "phone", "zip"]
+
+# Export tab: watermark names, one incremental position per destination and document type
+EXPORT_NAME_DOWNLOAD = "app_download"
+EXPORT_NAME_STAGE = "stage"  # EXPORT_APPROVED's default, shared with the nightly task
+
+# Telemetry tab: look-back windows (hours) over PROCESSING_LOG and the order stages are listed in
+TELEMETRY_WINDOWS = {"Last 24 hours": 24, "Last 7 days": 7 * 24, "Last 30 days": 30 * 24}
+TELEMETRY_STAGES = ["reuse", "classify", "extract", "write", "total", "validate_rules", "validate_ai"]
+TELEMETRY_CACHE_MAX_AGE_SECONDS = 60  # aggregates over the whole window; "Refresh" forces a reload
+
+# Performance panel: reruns kept per browser session and SQL text shown per span
+PERF_HISTORY_RERUNS = 50
+PERF_SQL_PREVIEW_CHARS = 160
+
+# Stage file contents: plain bytes while hot, a read-only-to-disk memory map once spilled
+FileData = Union[bytes, mmap.mmap]
+
+
+# --- Performance instrumentation ---
+@st.cache_resource(show_spinner=False)
+def _perf_thread_state() -> threading.local:
+    # Shared across reruns: cached objects (page cache, ...) keep the globals of the run that built them
+    return threading.local()
+
+
+# The script thread of the current rerun (and pipeline workers bound to it) record into ``.trace``
+_perf_local = _perf_thread_state()
+
+
+class PerfTrace:
+    """Timing spans recorded during one script rerun; pipeline workers may add spans too."""
+
+    def __init__(self, rerun: int, session_id: str) -> None:
+        self.rerun = rerun
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.total_ms: Optional[float] = None
+        self.aborted = False
+        self.spans: List[Dict[str, Any]] = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span: Dict[str, Any]) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def offset_ms(self, t: float) -> float:
+        return round((t - self._t0) * 1000, 3)
+
+    def finish(self, aborted: bool = False) -> None:
+        if self.total_ms is None:
+            self.total_ms = self.offset_ms(time.perf_counter())
+            self.aborted = aborted
+
+    def records(self) -> List[Dict[str, Any]]:
+        # One flat JSON-lines record per span, tagged with the rerun it belongs to
+        base = {
+            "session_id": self.session_id,
+            "rerun": self.rerun,
+            "rerun_started_at": self.started_at,
+            "rerun_ms": self.total_ms,
+            "aborted": self.aborted,
+        }
+        with self._lock:
+            return [{**base, **span} for span in self.spans]
+
+
+def current_perf_trace() -> Optional[PerfTrace]:
+    return getattr(_perf_local, "trace", None)
+
+
+@contextmanager
+def perf_span(kind: str, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """Time the enclosed block into the current rerun's trace (no-op outside a rerun)."""
+    span: Dict[str, Any] = {"kind": kind, "name": name, **attrs}
+    trace = current_perf_trace()
+    if trace is None:
+        yield span
+        return
+    start = time.perf_counter()
+    try:
+        yield span
+    finally:
+        span["start_ms"] = trace.offset_ms(start)
+        span["ms"] = round((time.perf_counter() - start) * 1000, 3)
+        span["thread"] = threading.current_thread().name
+        trace.add(span)
+
+
+def bind_perf_trace(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Return ``fn`` wrapped so a worker thread records spans into the caller's trace."""
+    trace = current_perf_trace()
+
+    def bound(*args: Any, **kwargs: Any) -> Any:
+        previous = current_perf_trace()
+        _perf_local.trace = trace
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _perf_local.trace = previous
+
+    return bound
+
+
+def traced_cache(name: str, ttl: float) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Cache a loader with ``st.cache_data`` and time its calls; a call that ran the body is a miss."""
+
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)  # st.cache_data keys on the loader's own name and source
+        def body(*args: Any, **kwargs: Any) -> Any:
+            # st.cache_data runs the body on the calling thread, so a thread-local flag is exact
+            _perf_local.cache_miss = True
+            return fn(*args, **kwargs)
+
+        cached = st.cache_data(show_spinner=False, ttl=ttl)(body)
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            outer = getattr(_perf_local, "cache_miss", False)
+            _perf_local.cache_miss = False
+            try:
+                with perf_span("cache", name) as span:
+                    result = cached(*args, **kwargs)
+                    span["hit"] = not _perf_local.cache_miss
+            finally:
+                _perf_local.cache_miss = outer
+            return result
+
+        call.clear = cached.clear  # type: ignore[attr-defined]
+        call.__name__ = name
+        return call
+
+    return decorate
+
+
+def _sql_label(query: str) -> str:
+    words = query.split(None, 2)
+    verb = words[0].upper() if words else "SQL"
+    if verb == "CALL" and len(words) > 1:
+        return f"CALL {words[1].split('(')[0].rsplit('.', 1)[-1]}"
+    target = re.search(r"\b(?:FROM|INTO|TABLE|TASK|STAGE)\s+([\w.$]+)", query, re.IGNORECASE)
+    return f"{verb} {target.group(1).rsplit('.', 1)[-1]}" if target else verb
+
+
+class _TracedDataFrame:
+    # Snowpark DataFrames are lazy: the statement runs in collect()/to_pandas()
+    def __init__(self, df: Any, query: str) -> None:
+        self._df = df
+        self._query = query
+
+    def _span(self) -> Any:
+        return perf_span("sql", _sql_label(self._query), detail=" ".join(self._query.split())[:PERF_SQL_PREVIEW_CHARS])
+
+    def collect(self, *args: Any, **kwargs: Any) -> Any:
+        with self._span() as span:
+            rows = self._df.collect(*args, **kwargs)
+            span["rows"] = len(rows)
+        return rows
+
+    def to_pandas(self, *args: Any, **kwargs: Any) -> Any:
+        with self._span() as span:
+            df = self._df.to_pandas(*args, **kwargs)
+            span["rows"] = len(df)
+        return df
+
+    def to_pandas_batches(self, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        # The span covers the whole stream, including the caller's work between batches
+        with self._span() as span:
+            span["rows"] = 0
+            for batch in self._df.to_pandas_batches(*args, **kwargs):
+                span["rows"] += len(batch)
+                yield batch
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._df, name)
+
+
+class _TracedFileOperation:
+    def __init__(self, file_op: Any) -> None:
+        self._file = file_op
+
+    def put_stream(self, input_stream: Any, stage_location: str, *args: Any, **kwargs: Any) -> Any:
+        with perf_span("stage", "put_stream", detail=stage_location.rsplit("/", 1)[-1]):
+            return self._file.put_stream(input_stream, stage_location, *args, **kwargs)
+
+    def get_stream(self, stage_location: str, *args: Any, **kwargs: Any) -> Any:
+        with perf_span("stage", "get_stream", detail=stage_location.rsplit("/", 1)[-1]):
+            return self._file.get_stream(stage_location, *args, **kwargs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+
+class TracedSession:
+    """Snowpark session proxy that records every statement and stage transfer as a span."""
+
+    def __init__(self, session: Any) -> None:
+        self._session = session
+        self.file = _TracedFileOperation(session.file)
+
+    def sql(self, query: str, *args: Any, **kwargs: Any) -> _TracedDataFrame:
+        return _TracedDataFrame(self._session.sql(query, *args, **kwargs), query)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._session, name)
+
+
+def begin_perf_trace() -> PerfTrace:
+    state = st.session_state
+    previous = state.get("perf_trace")
+    if previous is not None and previous.total_ms is None:
+        # st.rerun()/st.stop() ended the last run before end_perf_trace
+        previous.finish(aborted=True)
+        state.setdefault("perf_history", deque(maxlen=PERF_HISTORY_RERUNS)).append(previous)
+    if "perf_session_id" not in state:
+        state["perf_session_id"] = uuid.uuid4().hex[:12]
+    trace = PerfTrace(int(state.get("perf_reruns", 0)) + 1, state["perf_session_id"])
+    state["perf_reruns"] = trace.rerun
+    state["perf_trace"] = trace
+    _perf_local.trace = trace
+    return trace
+
+
+def end_perf_trace(trace: PerfTrace) -> None:
+    if trace.total_ms is not None:
+        return
+    trace.finish()
+    st.session_state.setdefault("perf_history", deque(maxlen=PERF_HISTORY_RERUNS)).append(trace)
+    if current_perf_trace() is trace:
+        _perf_local.trace = None
+
+
+def render_perf_panel(trace: PerfTrace, history: Iterable[PerfTrace]) -> None:
+    history = list(history)
+    spans = list(trace.spans)
+    st.caption(f"Rerun #{trace.rerun}: {trace.total_ms or 0:.0f} ms, {len(spans)} span(s)")
+    by_kind: Dict[str, Dict[str, Any]] = {}
+    for span in spans:
+        agg = by_kind.setdefault(span["kind"], {"kind": span["kind"], "count": 0, "total_ms": 0.0, "hits": 0, "misses": 0})
+        agg["count"] += 1
+        agg["total_ms"] = round(agg["total_ms"] + span.get("ms", 0.0), 3)
+        if "hit" in span:
+            agg["hits" if span["hit"] else "misses"] += 1
+    if by_kind:
+        st.dataframe(sorted(by_kind.values(), key=lambda a: -a["total_ms"]), hide_index=True, use_container_width=True)
+        slowest = sorted(spans, key=lambda s: -s.get("ms", 0.0))[:25]
+        st.dataframe(
+            [{k: s.get(k) for k in ("kind", "name", "ms", "hit", "start_ms", "detail")} for s in slowest],
+            hide_index=True,
+            use_container_width=True,
+        )
+    if history:
+        st.caption("Recent reruns")
+        st.bar_chart({"ms": [t.total_ms or 0 for t in history]}, height=120)
+        lines = "\n".join(json.dumps(r, default=str) for t in history for r in t.records())
+        st.download_button(
+            "Export JSON lines",
+            data=lines,
+            file_name=f"perf_{trace.session_id}.jsonl",
+            mime="application/jsonl",
+            use_container_width=True,
+            key="perf_export",
+        )
 
 
 # --- Helpers ---
@@ -41,15 +395,16 @@ def ensure_dict(value: Any) -> Dict[str, Any]:
 
 
 def extract_response_fields(extract_json: Any) -> Dict[str, Any]:
-    obj = ensure_dict(extract_json)
-    payload = obj.get("response", obj)
-    normalized: Dict[str, Any] = {}
-    for key, val in payload.items():
-        if isinstance(val, list):
-            normalized[key] = ", ".join([str(v) for v in val])
-        else:
-            normalized[key] = val
-    return normalized
+    with perf_span("parse", "extract_response_fields"):
+        obj = ensure_dict(extract_json)
+        payload = obj.get("response", obj)
+        normalized: Dict[str, Any] = {}
+        for key, val in payload.items():
+            if isinstance(val, list):
+                normalized[key] = ", ".join([str(v) for v in val])
+            else:
+                normalized[key] = val
+        return normalized
 
 
 def escape_json_for_sql(json_str: str) -> str:
@@ -62,30 +417,416 @@ def esc(value: Any) -> str:
     return s.replace("'", "''")
 
 
-@st.cache_data(show_spinner=False)
-def get_presigned_url(_session, file_name: str) -> Optional[str]:
-    try:
-        sql = f"SELECT GET_PRESIGNED_URL('@{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}', '{file_name}') AS URL"
-        row = _session.sql(sql).collect()[0]
-        return row["URL"]
-    except Exception:
+def presigned_url_expiry(url: Optional[str]) -> Optional[float]:
+    # Epoch seconds at which a presigned S3/GCS/Azure URL stops working, if its query string says
+    if not url:
         return None
+    try:
+        params = {k.lower(): v[-1] for k, v in parse_qs(urlsplit(str(url)).query).items()}
+        for prefix in ("x-amz-", "x-goog-"):
+            if prefix + "date" in params and prefix + "expires" in params:
+                signed_at = calendar.timegm(time.strptime(params[prefix + "date"], "%Y%m%dT%H%M%SZ"))
+                return signed_at + float(params[prefix + "expires"])
+        if "se" in params:  # Azure SAS expiry, a UTC date or date-time
+            se = params["se"].rstrip("Z")
+            return calendar.timegm(time.strptime(se, "%Y-%m-%dT%H:%M:%S" if "T" in se else "%Y-%m-%d"))
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+class PresignedUrlResolver:
+    """Process-wide cache of presigned stage URLs, signed a page at a time and re-signed before expiry."""
+
+    def __init__(
+        self,
+        stage: str = STAGE_NAME,
+        expiry_s: int = PRESIGNED_URL_EXPIRY_SECONDS,
+        min_lifetime_s: int = PRESIGNED_URL_MIN_LIFETIME_SECONDS,
+        refresh_s: int = PRESIGNED_URL_REFRESH_SECONDS,
+        keep_warm_s: int = PRESIGNED_URL_KEEP_WARM_SECONDS,
+        batch: int = PRESIGNED_URL_BATCH,
+    ) -> None:
+        self.stage = stage
+        self.expiry_s = expiry_s
+        self.min_lifetime_s = min_lifetime_s
+        self.refresh_s = max(refresh_s, min_lifetime_s)
+        self.keep_warm_s = keep_warm_s
+        self.batch = max(1, batch)
+        # file_name -> (url, expires_at, last_used), both times in epoch seconds
+        self._entries: Dict[str, Tuple[str, float, float]] = {}
+        self._next_refresh_at = 0.0
+        self._lock = threading.Lock()
+
+    def resolve(self, _session, file_names: Iterable[str], known: Optional[Dict[str, Any]] = None) -> Dict[str, Optional[str]]:
+        """URLs for ``file_names`` (None where signing failed); ``known`` offers URLs to reuse."""
+        names = list(dict.fromkeys(str(n) for n in file_names if n))
+        urls: Dict[str, Optional[str]] = {}
+        missing: List[str] = []
+        now = time.time()
+        with perf_span("cache", "presigned_urls", detail=f"{len(names)} file(s)") as span:
+            with self._lock:
+                for name in names:
+                    entry = self._entries.get(name)
+                    if entry is None or entry[1] - now < self.min_lifetime_s:
+                        offered = (known or {}).get(name)
+                        expires = presigned_url_expiry(offered)
+                        if expires is None or expires - now < self.min_lifetime_s:
+                            missing.append(name)
+                            continue
+                        entry = (str(offered), expires, now)
+                    self._entries[name] = (entry[0], entry[1], now)
+                    urls[name] = entry[0]
+            span["hit"] = not missing
+        if missing:
+            signed = self._sign(_session, missing)
+            with self._lock:
+                for name, (url, expires) in signed.items():
+                    self._entries[name] = (url, expires, now)
+            urls.update((name, url) for name, (url, _) in signed.items())
+        return {name: urls.get(name) for name in names}
+
+    def _sign(self, _session, names: List[str]) -> Dict[str, Tuple[str, float]]:
+        signed: Dict[str, Tuple[str, float]] = {}
+        for i in range(0, len(names), self.batch):
+            chunk = names[i:i + self.batch]
+            sql = (
+                f"SELECT value::STRING AS file_name, "
+                f"GET_PRESIGNED_URL('@{DB_NAME}.{SCHEMA_NAME}.{self.stage}', value::STRING, {int(self.expiry_s)}) AS url "
+                f"FROM TABLE(FLATTEN(input => PARSE_JSON('{escape_json_for_sql(json.dumps(chunk))}')))"
+            )
+            issued_at = time.time()
+            try:
+                rows = _session.sql(sql).collect()
+            except Exception:
+                continue  # No link rather than an error; previews render from the stage bytes
+            for row in rows:
+                url = row["URL"]
+                if url:
+                    signed[str(row["FILE_NAME"])] = (url, presigned_url_expiry(url) or issued_at + self.expiry_s)
+        return signed
+
+    def refresh(self, _session) -> int:
+        """Re-sign URLs in use that are close to expiry; returns how many were re-signed."""
+        now = time.time()
+        with self._lock:
+            if now < self._next_refresh_at:
+                return 0
+            due = []
+            wake = now + self.refresh_s
+            for name, (_, expires, last_used) in list(self._entries.items()):
+                if now - last_used > self.keep_warm_s:
+                    if expires - now < self.min_lifetime_s:
+                        del self._entries[name]
+                elif expires - now < self.refresh_s:
+                    due.append(name)
+                else:
+                    wake = min(wake, expires - self.refresh_s)
+            # Claimed under the lock, so concurrent sessions do not sign the same URLs twice.
+            # Re-check at least once a minute so newly cached URLs are picked up.
+            self._next_refresh_at = now + min(max(wake - now, 1.0), 60.0)
+        if not due:
+            return 0
+        signed = self._sign(_session, due)
+        with self._lock:
+            for name, (url, expires) in signed.items():
+                entry = self._entries.get(name)
+                if entry is not None:
+                    self._entries[name] = (url, expires, entry[2])
+        return len(signed)
+
+
+@st.cache_resource(show_spinner=False)
+def get_url_resolver() -> PresignedUrlResolver:
+    return PresignedUrlResolver()
+
 
+class DocumentByteCache:
+    """Size-capped cache of stage file bytes; older entries spill to disk and come back memory-mapped."""
 
-@st.cache_data(show_spinner=False)
-def fetch_stage_file(_session, file_name: str) -> Optional[bytes]:
-        stage_path = f"@{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}/{file_name}"
-        stream = _session.file.get_stream(stage_path, decompress=False)
-        data = stream.read()
-        stream.close()
-        return data
+    def __init__(
+        self,
+        memory_bytes: int = DOC_CACHE_MEMORY_BYTES,
+        disk_bytes: int = DOC_CACHE_DISK_BYTES,
+        spill_dir: Optional[str] = DOC_CACHE_DIR,
+        max_maps: int = DOC_CACHE_MAX_MAPS,
+    ) -> None:
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.max_maps = max_maps
+        self.spill_dir = spill_dir or tempfile.mkdtemp(prefix="extract_doc_cache_")
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._disk: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._maps: "OrderedDict[str, mmap.mmap]" = OrderedDict()  # one shared map per spilled file, LRU
+        self._retired: List[mmap.mmap] = []  # maps dropped while a render still held a view of them
+        self._versions: Dict[str, int] = {}  # per-key put counter behind content_key
+        self._next_version = 0
+        self._memory_size = 0
+        self._disk_size = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "spills": 0, "evictions": 0}
+        self._lock = threading.Lock()
 
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def _content_key(self, key: str) -> str:
+        # Caller must hold _lock
+        return f"{key}::{self._versions.get(key, 0)}"
+
+    def get(self, key: str) -> Optional[FileData]:
+        return self.lookup(key)[0]
+
+    def lookup(self, key: str) -> Tuple[Optional[FileData], str]:
+        """Cached bytes for ``key`` and a content key that changes every time ``key`` is put."""
+        with self._lock:
+            self._close_retired()
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return data, self._content_key(key)
+            entry = self._disk.get(key)
+            if entry is not None:
+                self._disk.move_to_end(key)
+                mapped = self._maps.get(key)
+                try:
+                    if mapped is None:
+                        with open(entry[0], "rb") as fh:
+                            # ACCESS_COPY keeps the map writable in-process (needed for zero-copy
+                            # ctypes views) without ever writing back to the spill file
+                            mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_COPY)
+                        if len(mapped) != entry[1]:
+                            self._retire(mapped)
+                            raise ValueError("truncated spill file")
+                        self._maps[key] = mapped
+                        while len(self._maps) > self.max_maps:
+                            self._retire(self._maps.popitem(last=False)[1])
+                    else:
+                        self._maps.move_to_end(key)
+                    self._counters["disk_hits"] += 1
+                    return mapped, self._content_key(key)
+                except (OSError, ValueError):  # mmap raises ValueError on an empty file
+                    self._drop_disk(key)
+            self._counters["misses"] += 1
+            return None, self._content_key(key)
+
+    def put(self, key: str, data: bytes) -> str:
+        """Store ``data`` under ``key`` and return its new content key."""
+        with self._lock:
+            self._close_retired()
+            self._discard(key)
+            self._next_version += 1
+            self._versions[key] = self._next_version
+            content_key = self._content_key(key)
+            if len(data) > self.memory_bytes:
+                self._spill(key, data)
+                return content_key
+            self._memory[key] = data
+            self._memory_size += len(data)
+            while self._memory_size > self.memory_bytes:
+                old_key, old_data = self._memory.popitem(last=False)
+                self._memory_size -= len(old_data)
+                self._spill(old_key, old_data)
+            return content_key
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._counters,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_size,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_size,
+                "open_maps": len(self._maps) + len(self._retired),
+            }
+
+    def _spill(self, key: str, data: bytes) -> None:
+        # Caller must hold _lock. Empty files cannot be mapped, and are cheap to fetch again.
+        if not data:
+            self._versions.pop(key, None)
+            self._counters["evictions"] += 1
+            return
+        path = self._spill_path(key)
+        try:
+            with open(path, "wb") as fh:
+                fh.write(data)
+        except OSError:
+            self._versions.pop(key, None)
+            self._counters["evictions"] += 1
+            return
+        self._disk[key] = (path, len(data))
+        self._disk_size += len(data)
+        self._counters["spills"] += 1
+        while self._disk_size > self.disk_bytes and self._disk:
+            old_key = next(iter(self._disk))
+            self._drop_disk(old_key)
+            self._counters["evictions"] += 1
+
+    def _retire(self, mapped: mmap.mmap) -> None:
+        # Caller must hold _lock. close() refuses while a render still holds a view of the map
+        # (an open PdfDocument); such maps are closed on a later get/put instead.
+        try:
+            mapped.close()
+        except BufferError:
+            self._retired.append(mapped)
 
-def render_document_preview(file_name: str, file_url: Optional[str], file_bytes: Optional[bytes], scale: float = 2.0) -> None:
+    def _close_retired(self) -> None:
+        # Caller must hold _lock
+        pending, self._retired = self._retired, []
+        for mapped in pending:
+            self._retire(mapped)
+
+    def _drop_disk(self, key: str) -> None:
+        # Caller must hold _lock. A map stays valid after unlink on POSIX until it is closed.
+        mapped = self._maps.pop(key, None)
+        if mapped is not None:
+            self._retire(mapped)
+        path, size = self._disk.pop(key)
+        self._disk_size -= size
+        self._versions.pop(key, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _discard(self, key: str) -> None:
+        # Caller must hold _lock
+        self._versions.pop(key, None)
+        data = self._memory.pop(key, None)
+        if data is not None:
+            self._memory_size -= len(data)
+        if key in self._disk:
+            self._drop_disk(key)
+
+
+@st.cache_resource(show_spinner=False)
+def get_document_cache() -> DocumentByteCache:
+    return DocumentByteCache()
+
+
+def fetch_stage_file(_session, file_name: str) -> Tuple[FileData, str]:
+    """Stage file bytes and their document cache content key, which keys rendered pages."""
+    cache = get_document_cache()
+    with perf_span("cache", "document_cache", detail=file_name) as span:
+        data, doc_key = cache.lookup(file_name)
+        span["hit"] = data is not None
+    if data is not None:
+        return data, doc_key
+    stage_path = f"@{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}/{file_name}"
+    stream = _session.file.get_stream(stage_path, decompress=False)
+    data = stream.read()
+    stream.close()
+    return data, cache.put(file_name, data)
+
+
+class PageRenderCache:
+    """LRU cache of rendered PDF pages keyed by (document, page, scale); pdfium calls share one lock."""
+
+    def __init__(self, max_bytes: int = PAGE_CACHE_MAX_BYTES, max_docs: int = PAGE_CACHE_MAX_DOCS) -> None:
+        self.max_bytes = max_bytes
+        self.max_docs = max_docs
+        self._pages: "OrderedDict[Tuple[str, int, float], Tuple[Any, int]]" = OrderedDict()
+        self._docs: "OrderedDict[str, Any]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, int, float], Any] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.pdfium_lock = threading.Lock()
+        self._prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-prefetch")
+
+    def _document(self, doc_key: str, file_bytes: FileData) -> Any:
+        # Caller must hold pdfium_lock
+        pdf = self._docs.get(doc_key)
+        if pdf is not None:
+            self._docs.move_to_end(doc_key)
+            return pdf
+        if isinstance(file_bytes, mmap.mmap):
+            # Hand pdfium a zero-copy view of the spilled file instead of materialising bytes
+            file_bytes = (ctypes.c_char * len(file_bytes)).from_buffer(file_bytes)
+        pdf = pdfium.PdfDocument(file_bytes)
+        self._docs[doc_key] = pdf
+        while len(self._docs) > self.max_docs:
+            _, old = self._docs.popitem(last=False)
+            try:
+                old.close()
+            except Exception:
+                pass
+        return pdf
+
+    def page_count(self, doc_key: str, file_bytes: FileData) -> int:
+        with self.pdfium_lock:
+            return len(self._document(doc_key, file_bytes))
+
+    def _render(self, doc_key: str, file_bytes: FileData, page_index: int, scale: float) -> Any:
+        key = (doc_key, page_index, scale)
+        with self._lock:
+            hit = self._pages.get(key)
+            if hit is not None:
+                self._pages.move_to_end(key)
+                return hit[0]
+        with perf_span("render", "pdfium_page", detail=f"page {page_index + 1}"), self.pdfium_lock:
+            pil_image = self._document(doc_key, file_bytes)[page_index].render(scale=scale, rotation=0).to_pil()
+        nbytes = pil_image.width * pil_image.height * len(pil_image.getbands())
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = (pil_image, nbytes)
+                self._size += nbytes
+            while self._size > self.max_bytes and len(self._pages) > 1:
+                _, (_, evicted) = self._pages.popitem(last=False)
+                self._size -= evicted
+        return pil_image
+
+    def get(self, doc_key: str, file_bytes: FileData, page_index: int, scale: float) -> Any:
+        key = (doc_key, page_index, scale)
+        with perf_span("cache", "page_cache", detail=f"page {page_index + 1}") as span:
+            with self._lock:
+                pending = self._inflight.get(key)
+                # A page still being prefetched counts as a hit: no render on this thread
+                span["hit"] = key in self._pages or pending is not None
+            if pending is not None:
+                try:
+                    return pending.result()
+                except Exception:
+                    pass
+            return self._render(doc_key, file_bytes, page_index, scale)
+
+    def prefetch(self, doc_key: str, file_bytes: FileData, page_indexes: Iterable[int], scale: float) -> None:
+        for page_index in page_indexes:
+            key = (doc_key, page_index, scale)
+            with self._lock:
+                if key in self._pages or key in self._inflight:
+                    continue
+                fut = self._prefetcher.submit(self._render, doc_key, file_bytes, page_index, scale)
+                self._inflight[key] = fut
+            fut.add_done_callback(lambda _f, k=key: self._discard_inflight(k))
+
+    def _discard_inflight(self, key: Tuple[str, int, float]) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+
+@st.cache_resource(show_spinner=False)
+def get_page_cache() -> PageRenderCache:
+    return PageRenderCache()
+
+
+def show_preview_page(file_name: str, page: int) -> None:
+    # Dropping the slider's widget state lets it re-initialise from the stored page
+    st.session_state[f"pdf_page::{file_name}"] = int(page)
+    st.session_state.pop(f"pdf_page_slider::{file_name}", None)
+
+
+def render_document_preview(
+    file_name: str, file_url: Optional[str], file_bytes: Optional[FileData], doc_key: str, scale: float = 2.0
+) -> None:
     ftype = get_file_type(file_name)
     if ftype == "image":
         if file_bytes:
-            st.image(file_bytes, use_container_width=True)
+            st.image(bytes(file_bytes), use_container_width=True)
         elif file_url:
             st.image(file_url, use_container_width=True)
         else:
@@ -93,15 +834,13 @@ def render_document_preview(file_name: str, file_url: Optional[str], file_bytes:
     elif ftype == "pdf":
         if file_bytes and pdfium is not None:
             try:
-                pdf = pdfium.PdfDocument(file_bytes)
-                total_pages = len(pdf)
+                page_cache = get_page_cache()
+                total_pages = page_cache.page_count(doc_key, file_bytes)
                 if total_pages <= 0:
                     st.info("PDF has no pages.")
                 elif total_pages == 1:
                     # Single page: render without slider/navigation
-                    page = pdf[0]
-                    bitmap = page.render(scale=scale, rotation=0)
-                    pil_image = bitmap.to_pil()
+                    pil_image = page_cache.get(doc_key, file_bytes, 0, scale)
                     st.image(pil_image, use_container_width=True)
                     st.caption("Page 1 of 1")
                 else:
@@ -145,11 +884,12 @@ def render_document_preview(file_name: str, file_url: Optional[str], file_bytes:
                     st.session_state[state_key] = current
 
                     page_index = current - 1
-                    page = pdf[page_index]
-                    bitmap = page.render(scale=scale, rotation=0)
-                    pil_image = bitmap.to_pil()
+                    pil_image = page_cache.get(doc_key, file_bytes, page_index, scale)
                     st.image(pil_image, use_container_width=True)
                     st.caption(f"Page {current} of {total_pages}")
+                    # Warm the neighbouring pages so ◀/▶ and the slider respond from cache
+                    neighbours = [i for i in (page_index + 1, page_index - 1) if 0 <= i < total_pages]
+                    page_cache.prefetch(doc_key, file_bytes, neighbours, scale)
             except Exception:
                 st.info("PDF preview unavailable.")
         # Always provide download button when URL is available
@@ -198,36 +938,137 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# Snowflake session
+# Snowflake session (wrapped so statements and stage I/O show up in the Performance panel)
+perf_trace = begin_perf_trace()
 try:
-    session = get_active_session()
+    session = TracedSession(get_active_session())
 except Exception as e:
     st.error(f"Error getting Snowflake session: {e}")
     st.stop()
 
 
-# Cache control helper
-if "_cache_buster" not in st.session_state:
-    st.session_state["_cache_buster"] = 0
+# Cache control helpers
+class CacheVersions:
+    """Process-wide version counters per cache scope, passed to cached loaders as hashed arguments."""
 
-def _bump_cache() -> None:
-    st.session_state["_cache_buster"] = int(st.session_state.get("_cache_buster", 0)) + 1
+    def __init__(self) -> None:
+        # ("doc_types",), ("prompts", type), ("records", type, approval_filter), ("record", file),
+        # ("record_type", type); "*" as the type marks writes whose type is not known yet
+        self._versions: Dict[Tuple[str, ...], int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, *scope: str) -> int:
+        with self._lock:
+            return self._versions.get(scope, 0)
+
+    def bump(self, *scopes: Tuple[str, ...]) -> None:
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+
+@st.cache_resource(show_spinner=False)
+def get_cache_versions() -> CacheVersions:
+    return CacheVersions()
+
+
+class MetadataChangePoller:
+    """Bumps doc type and prompt scopes when DOC_TYPES/DOC_TYPE_PROMPTS change outside this process."""
+
+    def __init__(self, versions: CacheVersions, interval_s: float = METADATA_POLL_SECONDS) -> None:
+        self.versions = versions
+        self.interval_s = max(1.0, interval_s)
+        # scope -> (row_count, changed_at, digest); None until the first poll
+        self._markers: Optional[Dict[Tuple[str, ...], Tuple[Any, ...]]] = None
+        self._next_poll_at = 0.0
+        self._lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+
+    def maybe_poll(self, _session) -> List[Tuple[str, ...]]:
+        """Poll unless another session did within ``interval_s``; returns the changed scopes."""
+        with self._lock:
+            now = time.time()
+            if now < self._next_poll_at:
+                return []
+            self._next_poll_at = now + self.interval_s
+        try:
+            return self.poll(_session)
+        except Exception:
+            return []  # Transient query failure: keep the old markers; TTL expiry still refreshes
+
+    def poll(self, _session) -> List[Tuple[str, ...]]:
+        """Read the markers once and bump every scope that changed; returns those scopes."""
+        with self._poll_lock:
+            rows = _session.sql(
+                f"SELECT 'doc_types' AS scope, NULL AS document_type, COUNT(*) AS row_count, MAX(created_at) AS changed_at, "
+                f"HASH_AGG(document_type, description) AS digest FROM {DOC_TYPES_TABLE} "
+                f"UNION ALL "
+                f"SELECT 'prompts', document_type, COUNT(*), MAX(created_at), "
+                f"HASH_AGG(field_name, retrieval_prompt, sort_order, value_type, pattern, min_value, max_value, required) "
+                f"FROM {DOC_PROMPTS_TABLE} GROUP BY document_type"
+            ).collect()
+            markers: Dict[Tuple[str, ...], Tuple[Any, ...]] = {}
+            for row in rows:
+                scope = ("doc_types",) if row["SCOPE"] == "doc_types" else ("prompts", str(row["DOCUMENT_TYPE"]))
+                markers[scope] = (row["ROW_COUNT"], row["CHANGED_AT"], row["DIGEST"])
+            previous, self._markers = self._markers, markers
+        if previous is None:
+            return []
+        changed = [scope for scope in previous.keys() | markers.keys() if previous.get(scope) != markers.get(scope)]
+        if changed:
+            self.versions.bump(*changed)
+        return changed
+
+    def refresh(self, _session, *fallback: Tuple[str, ...]) -> None:
+        """Poll right after this process wrote metadata; bump ``fallback`` scopes if the poll fails."""
+        try:
+            self.poll(_session)
+        except Exception:
+            self.versions.bump(*fallback)
+
+
+@st.cache_resource(show_spinner=False)
+def get_metadata_poller() -> MetadataChangePoller:
+    return MetadataChangePoller(get_cache_versions())
+
+
+def records_version(doc_type: str, approval_filter: str) -> Tuple[int, int]:
+    versions = get_cache_versions()
+    return (versions.get("records", "*", approval_filter), versions.get("records", doc_type, approval_filter))
+
+
+def bump_records(doc_type: Optional[str], approval_states: Iterable[str]) -> None:
+    """Invalidate record lists (including "All") that can hold a ``doc_type`` record in these states."""
+    filters = {"All", *approval_states}
+    scopes: List[Tuple[str, ...]] = []
+    for f in filters:
+        if doc_type is None:
+            scopes.append(("records", "*", f))
+        else:
+            scopes.extend([("records", doc_type, f), ("records", "All", f)])
+    get_cache_versions().bump(*scopes)
 
 # Uploader widget versioning to force clear after success
 if "uploader_nonce" not in st.session_state:
     st.session_state["uploader_nonce"] = 0
 
 
-@st.cache_data(show_spinner=False, ttl=10)
-def list_doc_types(_buster: int):
+@traced_cache("list_doc_types", ttl=METADATA_CACHE_MAX_AGE_SECONDS)
+def list_doc_types(version: int):
     rows = session.sql(f"SELECT document_type FROM {DOC_TYPES_TABLE} ORDER BY document_type").collect()
     return [r[0] for r in rows]
 
 
-@st.cache_data(show_spinner=False, ttl=10)
-def load_prompts(doc_type: str, _buster: int):
+@traced_cache("load_doc_type_profiles", ttl=METADATA_CACHE_MAX_AGE_SECONDS)
+def load_doc_type_profiles(version: int) -> Dict[str, str]:
+    rows = session.sql(f"SELECT document_type, description FROM {DOC_TYPES_TABLE}").collect()
+    return {str(r[0]): str(r[1] or "") for r in rows}
+
+
+@traced_cache("load_prompts", ttl=METADATA_CACHE_MAX_AGE_SECONDS)
+def load_prompts(doc_type: str, version: int):
     sql = (
-            f"SELECT field_name, retrieval_prompt, sort_order "
+            f"SELECT field_name, retrieval_prompt, sort_order, value_type, pattern, min_value, max_value, required "
             f"FROM {DOC_PROMPTS_TABLE} WHERE document_type = '{esc(doc_type)}' "
             f"ORDER BY sort_order, field_name"
     )
@@ -242,16 +1083,22 @@ def upsert_doc_type(doc_type: str, description: str) -> None:
     session.sql(sql).collect()
 
 
-def replace_prompts(doc_type: str, prompts_df) -> int:
-    # Build JSON array of prompt objects and delegate to procedure
+def _rule_value(value: Any) -> Any:
+    # Blank editor cells arrive as None, NaN, pd.NA or ''
+    try:
+        if value is None or value != value or str(value).strip() == "":
+            return None
+    except TypeError:  # pd.NA has no truth value
+        return None
+    return value
+
+
+def prompt_rows(prompts_df) -> List[Dict[str, Any]]:
+    # Prompt objects (with their validation rules) for REPLACE_PROMPTS, built from the editor grid.
+    # Every rule is checked here, before anything is written. Raises ValueError for a rule the
+    # validation view could not evaluate.
     if prompts_df is None or getattr(prompts_df, 'empty', True):
-        # Still clear prompts via proc with empty array
-        payload = "[]"
-        sql = (
-            f"CALL {DB_NAME}.{SCHEMA_NAME}.REPLACE_PROMPTS('" + esc(doc_type) + f"', PARSE_JSON('{escape_json_for_sql(payload)}'))"
-        )
-        session.sql(sql).collect()
-        return 0
+        return []
     rows = []
     for _, row in prompts_df.iterrows():
         field_raw = row.get("field_name", "")
@@ -270,16 +1117,96 @@ def replace_prompts(doc_type: str, prompts_df) -> int:
         prompt = str(prompt_raw).strip()
         if field == '' or prompt == '':
             continue
-        rows.append({"field_name": field, "retrieval_prompt": prompt, "sort_order": so_val})
-    import json as _json
-    payload = _json.dumps(rows)
+        value_type = _rule_value(row.get("value_type"))
+        if value_type is not None and str(value_type).strip().lower() not in FIELD_RULE_TYPES:
+            raise ValueError(f"Unknown value_type '{value_type}' for field '{field}'.")
+        pattern = _rule_value(row.get("pattern"))
+        bounds = []
+        for key in ("min_value", "max_value"):
+            bound = _rule_value(row.get(key))
+            try:
+                bounds.append(float(bound) if bound is not None else None)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key} for field '{field}' must be a number.") from None
+        rows.append({
+            "field_name": field,
+            "retrieval_prompt": prompt,
+            "sort_order": so_val,
+            "value_type": str(value_type).strip().lower() if value_type is not None else None,
+            "pattern": str(pattern) if pattern is not None else None,
+            "min_value": bounds[0],
+            "max_value": bounds[1],
+            "required": bool(_rule_value(row.get("required"))),
+        })
+    check_rule_patterns(rows)
+    return rows
+
+
+def check_rule_patterns(rows: List[Dict[str, Any]]) -> None:
+    # Rules run under Snowflake's REGEXP_LIKE (POSIX ERE), so let Snowflake judge the syntax of
+    # every pattern in one statement; only a failed check goes pattern by pattern to name the field
+    patterns = [(r["field_name"], r["pattern"]) for r in rows if r.get("pattern") is not None]
+
+    def check(items: List[Tuple[str, str]]) -> None:
+        probes = ", ".join(f"REGEXP_LIKE('', '{escape_json_for_sql(p)}')" for _, p in items)
+        session.sql(f"SELECT {probes}").collect()
+
+    if not patterns:
+        return
+    try:
+        check(patterns)
+    except Exception as e:
+        for field, pattern in patterns:
+            try:
+                check([(field, pattern)])
+            except Exception as field_error:
+                raise ValueError(f"Invalid pattern for field '{field}': {field_error}") from field_error
+        raise ValueError(f"Invalid pattern: {e}") from e
+
+
+def replace_prompts(doc_type: str, rows: List[Dict[str, Any]]) -> Tuple[int, Dict[str, Any]]:
+    # Delegate to the procedure with rows from prompt_rows; an empty list clears the prompts.
+    # Returns the number of prompts saved and the procedure's field diff against the previous set.
+    payload = json.dumps(rows)
     sql = (
         f"CALL {DB_NAME}.{SCHEMA_NAME}.REPLACE_PROMPTS('" + esc(doc_type) + f"', PARSE_JSON('{escape_json_for_sql(payload)}'))"
     )
-    session.sql(sql).collect()
-    return len(rows)
-@st.cache_data(show_spinner=False, ttl=10)
-def load_records(doc_type: str, approval_filter: str, _buster: int):
+    result = session.sql(sql).collect()
+    return len(rows), ensure_dict(result[0][0] if result else None)
+
+
+@traced_cache("count_outdated_records", ttl=CACHE_MAX_AGE_SECONDS)
+def count_outdated_records(doc_type: str, version: Tuple[int, int, int]) -> int:
+    # Unapproved records extracted with an older, known prompt version of this type
+    sql = f"""
+        SELECT COUNT(*)
+        FROM {RAW_TABLE} r
+        JOIN {DB_NAME}.{SCHEMA_NAME}.PROMPT_SET_HASHES h ON h.document_type = r.document_type
+        JOIN {DB_NAME}.{SCHEMA_NAME}.DOC_TYPE_PROMPT_VERSIONS v
+          ON v.document_type = r.document_type AND v.prompt_hash = r.prompt_hash
+        WHERE r.document_type = '{esc(doc_type)}'
+          AND NOT r.approved
+          AND r.prompt_hash <> h.prompt_hash
+    """
+    rows = session.sql(sql).collect()
+    return int(rows[0][0]) if rows else 0
+
+
+def reextract_changed_fields(doc_type: str) -> str:
+    rows = session.sql(f"CALL {DB_NAME}.{SCHEMA_NAME}.REEXTRACT_CHANGED_FIELDS('{esc(doc_type)}')").collect()
+    return str(rows[0][0]) if rows else ""
+
+
+def approve_records(records: List[Dict[str, Any]]) -> str:
+    """Approve many records with one APPROVE_RECORDS call; ``fields`` overrides extracted values."""
+    payload = json.dumps(records, default=str)
+    rows = session.sql(
+        f"CALL {DB_NAME}.{SCHEMA_NAME}.APPROVE_RECORDS(PARSE_JSON('{escape_json_for_sql(payload)}'))"
+    ).collect()
+    return str(rows[0][0]) if rows else ""
+
+
+def _records_where(doc_type: str, approval_filter: str) -> List[str]:
     where_clauses = []
     if doc_type and doc_type != "All":
         where_clauses.append(f"document_type = '{esc(doc_type)}'")
@@ -292,19 +1219,781 @@ def load_records(doc_type: str, approval_filter: str, _buster: int):
         where_clauses.append(approved_cond_true)
     elif approval_filter == "Not Approved":
         where_clauses.append(approved_cond_false)
+    return where_clauses
+
 
+# Validation verdict for list rows, so the picker need not load validation_json
+VALIDATION_VALID_SQL = (
+    "IFF(r.validation_status = 'DONE', "
+    "TRY_TO_BOOLEAN(COALESCE(r.validation_json:response:valid, r.validation_json:valid)::STRING), NULL) "
+    "AS validation_valid"
+)
+
+
+@traced_cache("load_record_page", ttl=CACHE_MAX_AGE_SECONDS)
+def load_record_page(doc_type: str, approval_filter: str, cursor: Optional[Tuple[str, str]], version: Tuple[int, int], page_size: int = REVIEW_PAGE_SIZE):
+    """One keyset page of the record picker after ``cursor``, plus one row to detect an older page."""
+    where_clauses = _records_where(doc_type, approval_filter)
+    if cursor is not None:
+        ts, fname = cursor
+        where_clauses.append(
+            f"(r.created_at < TO_TIMESTAMP_NTZ('{esc(ts)}') "
+            f"OR (r.created_at = TO_TIMESTAMP_NTZ('{esc(ts)}') AND r.file_name < '{esc(fname)}'))"
+        )
     where_sql = (" WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
     sql = f"""
-        SELECT r.file_name, r.file_url, r.document_type, r.extract_json, r.validation_json, r.created_at, r.approved
+        SELECT r.file_name, r.document_type, r.created_at, r.approved, r.validation_status,
+               {VALIDATION_VALID_SQL}, r.file_url
         FROM {RAW_TABLE} r
         {where_sql}
-        ORDER BY r.created_at DESC
+        ORDER BY r.created_at DESC, r.file_name DESC
+        LIMIT {int(page_size) + 1}
+    """
+    return session.sql(sql).to_pandas()
+
+
+def like_contains(term: str) -> str:
+    # Body of a LIKE ... ESCAPE '!' literal matching ``term`` anywhere in value_norm
+    pattern = term.strip().upper().replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return "%" + pattern.replace("\\", "\\\\").replace("'", "''") + "%"
+
+
+@traced_cache("search_records", ttl=CACHE_MAX_AGE_SECONDS)
+def search_records(
+    term: str,
+    field_name: Optional[str],
+    doc_type: str,
+    approval_filter: str,
+    version: Tuple[int, int],
+    limit: int = SEARCH_MAX_RESULTS,
+):
+    """Records with an extracted value containing ``term``, via RECORD_FIELD_INDEX, newest first."""
+    where_clauses = [f"i.value_norm LIKE '{like_contains(term)}' ESCAPE '!'"]
+    if field_name:
+        where_clauses.append(f"i.field_name = '{esc(field_name)}'")
+    where_clauses.extend(f"r.{clause}" for clause in _records_where(doc_type, approval_filter))
+    sql = f"""
+        SELECT r.file_name, r.document_type, r.created_at, r.approved, r.validation_status,
+               {VALIDATION_VALID_SQL}, r.file_url,
+               i.field_name AS matched_field, i.field_value AS matched_value
+        FROM {FIELD_INDEX_TABLE} i
+        JOIN {RAW_TABLE} r ON r.file_name = i.file_name AND r.created_at = i.created_at
+        WHERE {" AND ".join(where_clauses)}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY r.file_name, r.created_at ORDER BY i.field_name) = 1
+        ORDER BY r.created_at DESC, r.file_name DESC
+        LIMIT {int(limit)}
     """
     return session.sql(sql).to_pandas()
 
 
+@traced_cache("load_record_detail", ttl=CACHE_MAX_AGE_SECONDS)
+def load_record_detail(file_name: str, created_at: str, version: Tuple[int, int]) -> Dict[str, Any]:
+    # Heavy columns for the one selected record only
+    sql = f"""
+        SELECT r.file_url, r.extract_json, r.validation_json, r.field_pages
+        FROM {RAW_TABLE} r
+        WHERE r.file_name = '{esc(file_name)}'
+          AND r.created_at = TO_TIMESTAMP_NTZ('{esc(created_at)}')
+        LIMIT 1
+    """
+    rows = session.sql(sql).collect()
+    return rows[0].as_dict() if rows else {}
+
+
+# --- Pre-classification ---
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def first_pages_extract(data: bytes, pdfium_lock: Any, max_pages: int = PRECLASSIFY_PAGES) -> Tuple[str, Optional[bytes]]:
+    # Text layer of the first pages (scanned PDFs have none), plus those pages as a standalone
+    # PDF when the document is longer; a short document is classified whole at the same cost
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            count = min(max_pages, len(pdf))
+            parts = []
+            for i in range(count):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                parts.append(textpage.get_text_range())
+                textpage.close()
+                page.close()
+            head = None
+            if len(pdf) > count:
+                part = pdfium.PdfDocument.new()
+                try:
+                    part.import_pages(pdf, list(range(count)))
+                    buf = io.BytesIO()
+                    part.save(buf)
+                    head = buf.getvalue()
+                finally:
+                    part.close()
+            return "\n".join(parts), head
+        finally:
+            pdf.close()
+
+
+def preclassify_text(text: str, profiles: Dict[str, str]) -> Optional[str]:
+    """Best-matching document type for page text, or None unless it clears the score and margin."""
+    words = set(_WORD_RE.findall(text.lower()))
+    if not words:
+        return None
+    scores = []
+    for dtype, description in profiles.items():
+        terms = {w for w in _WORD_RE.findall(f"{dtype} {description}".lower()) if len(w) >= 3}
+        if terms:
+            scores.append((len(terms & words) / len(terms), dtype))
+    if not scores:
+        return None
+    scores.sort(reverse=True)
+    best_score, best_type = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else 0.0
+    if best_score >= PRECLASSIFY_MIN_SCORE and best_score - runner_up >= PRECLASSIFY_MIN_MARGIN:
+        return best_type
+    return None
+
+
+def classify_first_pages(file_name: str, head: bytes, doc_types: Iterable[str]) -> Optional[str]:
+    """The procedures' classification AI_EXTRACT, run on a first-pages extract of the file."""
+    types = sorted(doc_types)
+    if not types:
+        return None
+    stage = f"{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}"
+    path = chunk_stage_name(file_name, 1, PRECLASSIFY_PAGES)
+    session.file.put_stream(io.BytesIO(head), f"@{stage}/{path}", auto_compress=False, overwrite=True)  # type: ignore[attr-defined]
+    try:
+        session.sql(f"ALTER STAGE {stage} REFRESH SUBPATH = '{esc(path)}'").collect()
+        rows = session.sql(
+            f"SELECT UPPER(AI_EXTRACT(file => TO_FILE('@{stage}', '{esc(path)}'), "
+            f"responseFormat => c.response_format):response.document_type::VARCHAR) AS document_type "
+            f"FROM {DB_NAME}.{SCHEMA_NAME}.CLASSIFICATION_PROMPT c"
+        ).collect()
+    finally:
+        try:
+            session.sql(f"REMOVE '@{stage}/{esc(path)}'").collect()
+        except Exception:
+            pass
+    label = str(rows[0][0] or "").strip() if rows else ""
+    # NO_MATCH on the first pages alone is not conclusive; the procedure classifies the whole file
+    return label if label in types else None
+
+
+def make_preclassifier(
+    profiles: Dict[str, str],
+    pdfium_lock: Any,
+    classify_pages: Optional[Callable[[str, bytes, Iterable[str]], Optional[str]]] = classify_first_pages,
+) -> Callable[[str, bytes], Optional[str]]:
+    # A confident text match skips AI classification; anything else with more pages than the
+    # extract is classified from the extract, and the rest is left to the procedure
+    def preclassify(file_name: str, data: bytes) -> Optional[str]:
+        if get_file_type(file_name) != "pdf" or not profiles:
+            return None
+        try:
+            text, head = first_pages_extract(data, pdfium_lock)
+            guess = preclassify_text(text, profiles)
+            if guess is None and head is not None and classify_pages is not None:
+                guess = classify_pages(file_name, head, profiles)
+            return guess
+        except Exception:
+            return None
+    return preclassify
+
+
+# --- Page-chunked extraction ---
+def chunk_stage_name(file_name: str, first_page: int, last_page: int) -> str:
+    return f"{CHUNK_PREFIX}{file_name}.p{first_page:04d}-{last_page:04d}.pdf"
+
+
+def process_chunked_file(
+    file_name: str,
+    pages_per_chunk: int = CHUNK_PAGES,
+    min_pages: int = CHUNK_MIN_PAGES,
+    document_type: Optional[str] = None,
+) -> str:
+    # The procedure splits the staged file itself, so each file is uploaded once and no
+    # page parsing happens here; files below min_pages fall through to PROCESS_ONE_FILE
+    stage = f"{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}"
+    session.sql(f"ALTER STAGE {stage} REFRESH SUBPATH = '{esc(file_name)}'").collect()
+    type_arg = f"'{esc(document_type)}'" if document_type else "NULL"
+    rows = session.sql(
+        f"CALL {DB_NAME}.{SCHEMA_NAME}.PROCESS_CHUNKED_FILE("
+        f"'{esc(file_name)}', {int(pages_per_chunk)}, {int(min_pages)}, {type_arg})"
+    ).collect()
+    try:
+        # Chunks are only needed for extraction; the original stays for preview and reuse
+        session.sql(f"REMOVE '@{stage}/{esc(CHUNK_PREFIX + file_name)}.p'").collect()
+    except Exception:
+        pass
+    return str(rows[0][0]) if rows else ""
+
+
+def chunk_count(result: str) -> int:
+    match = re.search(r"\((\d+) chunk", result or "")
+    return int(match.group(1)) if match else 0
+
+
+# --- Upload preprocessing ---
+def downsample_image(data: bytes, max_dpi: int = UPLOAD_MAX_IMAGE_DPI, min_ratio: float = UPLOAD_DOWNSAMPLE_MIN_RATIO) -> Optional[bytes]:
+    """Scale a JPEG/PNG scan down to ``max_dpi`` on an A4 page; None below ``min_ratio`` x that or when nothing is saved."""
+    with Image.open(io.BytesIO(data)) as img:
+        fmt = img.format
+        limit = int(max_dpi * UPLOAD_PAGE_INCHES)
+        if fmt not in ("JPEG", "PNG") or max(img.size) <= limit * max(1.0, min_ratio):
+            return None
+        scale = limit / max(img.size)
+        # JPEG draft mode decodes straight at 1/2, 1/4 or 1/8 scale when that still covers the target
+        img.draft(img.mode, (int(img.width * scale) + 1, int(img.height * scale) + 1))
+        scale = limit / max(img.size)
+        upright = ImageOps.exif_transpose(img)
+        size = (max(1, round(upright.width * scale)), max(1, round(upright.height * scale)))
+        # reducing_gap box-reduces first, which keeps large scans cheap to resize on the upload workers
+        resized = upright.resize(size, Image.BICUBIC, reducing_gap=3.0)
+    buf = io.BytesIO()
+    if fmt == "JPEG":
+        if resized.mode not in ("RGB", "L"):
+            resized = resized.convert("RGB")
+        resized.save(buf, "JPEG", quality=UPLOAD_JPEG_QUALITY, dpi=(max_dpi, max_dpi))
+    else:
+        resized.save(buf, "PNG", dpi=(max_dpi, max_dpi))
+    out = buf.getvalue()
+    return out if len(out) < len(data) else None
+
+
+def strip_pdf_payload(data: bytes, pdfium_lock: Any) -> Optional[bytes]:
+    """Rewrite a PDF without attachments or old incremental revisions; None when nothing is saved."""
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            for i in reversed(range(pdf.count_attachments())):
+                pdf.del_attachment(i)
+            buf = io.BytesIO()
+            pdf.save(buf, flags=pdfium.raw.FPDF_NO_INCREMENTAL)
+        finally:
+            pdf.close()
+    out = buf.getvalue()
+    return out if len(out) < len(data) else None
+
+
+def make_upload_preprocessor(
+    pdfium_lock: Any,
+    max_image_dpi: Optional[int] = UPLOAD_MAX_IMAGE_DPI,
+    strip_pdfs: bool = True,
+    min_image_bytes: int = UPLOAD_DOWNSAMPLE_MIN_BYTES,
+    min_image_ratio: float = UPLOAD_DOWNSAMPLE_MIN_RATIO,
+) -> Callable[[str, bytes], Optional[bytes]]:
+    def preprocess(file_name: str, data: bytes) -> Optional[bytes]:
+        file_type = get_file_type(file_name)
+        try:
+            if file_type == "image" and max_image_dpi and len(data) >= min_image_bytes:
+                return downsample_image(data, max_image_dpi, min_image_ratio)
+            if file_type == "pdf" and strip_pdfs:
+                return strip_pdf_payload(data, pdfium_lock)
+        except Exception:
+            pass  # unreadable locally: stage the original bytes
+        return None
+    return preprocess
+
+
+def pdf_page_count(data: bytes, pdfium_lock: Any) -> int:
+    with pdfium_lock:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def make_page_counter(pdfium_lock: Any) -> Callable[[str, bytes], Optional[int]]:
+    def count_pages(file_name: str, data: bytes) -> Optional[int]:
+        file_type = get_file_type(file_name)
+        if file_type == "image":
+            return 1
+        if file_type != "pdf":
+            return None
+        try:
+            return pdf_page_count(data, pdfium_lock)
+        except Exception:
+            return None  # unreadable locally: PROCESSING_LOG keeps a NULL page count
+    return count_pages
+
+
+# --- Upload pipeline ---
+def read_upload(source: BinaryIO) -> bytes:
+    # Streamlit's UploadedFile is a BytesIO; getvalue() hands back its buffer without copying
+    if isinstance(source, io.BytesIO):
+        return source.getvalue()
+    source.seek(0)
+    return source.read()
+
+
+def upload_to_stage(file_name: str, source: BinaryIO, page_count: Optional[int] = None) -> None:
+    # The file object is streamed as-is (rewound for retries) rather than copied into a new buffer
+    stage_path = f"@{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}/{file_name}"
+    source.seek(0)
+    session.file.put_stream(source, stage_path, auto_compress=False, overwrite=True)  # type: ignore[attr-defined]
+    record_fingerprint(file_name, source, page_count)
+
+
+def record_fingerprint(file_name: str, source: BinaryIO, page_count: Optional[int] = None) -> None:
+    # Processing procedures reuse prior results for byte-identical files via this index;
+    # size and page count feed PROCESSING_LOG
+    digest = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    for block in iter(lambda: source.read(UPLOAD_HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+        size += len(block)
+    session.sql(
+        f"MERGE INTO {FINGERPRINTS_TABLE} t "
+        f"USING (SELECT '{esc(file_name)}' AS file_name, '{digest.hexdigest()}' AS content_hash, {size} AS file_size, "
+        f"{int(page_count) if page_count is not None else 'NULL'}::NUMBER AS page_count) s "
+        f"ON t.file_name = s.file_name "
+        f"WHEN MATCHED THEN UPDATE SET content_hash = s.content_hash, file_size = s.file_size, page_count = s.page_count, uploaded_at = CURRENT_TIMESTAMP() "
+        f"WHEN NOT MATCHED THEN INSERT (file_name, content_hash, file_size, page_count) VALUES (s.file_name, s.content_hash, s.file_size, s.page_count)"
+    ).collect()
+
+
+def process_staged_file(file_name: str, document_type: Optional[str] = None) -> str:
+    # Refresh only this file's directory entry so processing can start before the whole batch is staged
+    session.sql(
+        f"ALTER STAGE {DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME} REFRESH SUBPATH = '{esc(file_name)}'"
+    ).collect()
+    type_arg = f"'{esc(document_type)}'" if document_type else "NULL"
+    rows = session.sql(f"CALL {DB_NAME}.{SCHEMA_NAME}.PROCESS_ONE_FILE('{esc(file_name)}', {type_arg})").collect()
+    return str(rows[0][0]) if rows else ""
+
+
+def process_staged_batch(file_names: List[str], document_types: Optional[Dict[str, str]] = None) -> str:
+    # One set-based PROCESS_BATCH call classifies, extracts and validates every file in the list
+    session.sql(f"ALTER STAGE {DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME} REFRESH").collect()
+    payload = json.dumps(file_names)
+    types_payload = json.dumps(document_types or {})
+    rows = session.sql(
+        f"CALL {DB_NAME}.{SCHEMA_NAME}.PROCESS_BATCH("
+        f"PARSE_JSON('{escape_json_for_sql(payload)}'), PARSE_JSON('{escape_json_for_sql(types_payload)}'))"
+    ).collect()
+    return str(rows[0][0]) if rows else ""
+
+
+def files_written_since_upload(file_names: List[str]) -> List[str]:
+    # Files with a RAW row newer than their fingerprint, i.e. written for the current upload
+    names = ", ".join(f"'{esc(name)}'" for name in file_names)
+    rows = session.sql(
+        f"SELECT DISTINCT f.file_name FROM {FINGERPRINTS_TABLE} f "
+        f"JOIN {RAW_TABLE} r ON r.file_name = f.file_name AND r.created_at >= f.uploaded_at "
+        f"WHERE f.file_name IN ({names})"
+    ).collect()
+    return [str(r[0]) for r in rows]
+
+
+def index_record_fields(file_names: List[str]) -> str:
+    payload = json.dumps(file_names)
+    rows = session.sql(
+        f"CALL {DB_NAME}.{SCHEMA_NAME}.INDEX_RECORD_FIELDS(PARSE_JSON('{escape_json_for_sql(payload)}'))"
+    ).collect()
+    return str(rows[0][0]) if rows else ""
+
+
+def _run_step(row: Dict[str, Any], step: str, max_attempts: int, fn: Callable[..., None], *args: Any) -> bool:
+    # Runs one pipeline step for one file, retrying with exponential backoff.
+    # Worker threads only touch their own status row; the UI is redrawn from the main thread.
+    for attempt in range(1, max_attempts + 1):
+        row["status"] = step
+        row["attempts"] = attempt
+        try:
+            row["result"] = fn(*args) or ""
+            row["error"] = ""
+            return True
+        except Exception as e:
+            row["error"] = str(e)
+            if attempt < max_attempts:
+                row["status"] = f"retrying {step}"
+                time.sleep(RETRY_BACKOFF_SECONDS * (2 ** (attempt - 1)))
+    row["status"] = f"failed ({step})"
+    return False
+
+
+def _upload_job(
+    row: Dict[str, Any],
+    source: BinaryIO,
+    max_attempts: int,
+    preclassify: Optional[Callable[[str, bytes], Optional[str]]] = None,
+    preprocess: Optional[Callable[[str, bytes], Optional[bytes]]] = None,
+    count_pages: Optional[Callable[[str, bytes], Optional[int]]] = None,
+) -> bool:
+    start = time.perf_counter()
+    if preprocess is not None:
+        row["status"] = "preprocessing"
+        original = read_upload(source)
+        smaller = preprocess(row["file"], original)
+        if smaller is not None:
+            row["saved_kb"] = round((len(original) - len(smaller)) / 1024, 1)
+            source = io.BytesIO(smaller)
+    # Each option parses the bytes it needs; with all of them off, files are streamed untouched
+    page_count = count_pages(row["file"], read_upload(source)) if count_pages is not None else None
+    row["pages"] = page_count
+    ok = _run_step(row, "uploading", max_attempts, upload_to_stage, row["file"], source, page_count)
+    if ok and preclassify is not None:
+        row["status"] = "pre-classifying"
+        row["pre_type"] = preclassify(row["file"], read_upload(source)) or ""
+    row["upload_s"] = round(time.perf_counter() - start, 2)
+    if ok:
+        row["status"] = "uploaded"
+    return ok
+
+
+def _chunk_candidate(row: Dict[str, Any], chunking: Optional[Tuple[int, int]]) -> bool:
+    # Without a recorded page count every PDF is a candidate; the procedure checks the length
+    if chunking is None or get_file_type(row["file"]) != "pdf":
+        return False
+    return row["pages"] is None or row["pages"] >= chunking[1]
+
+
+def _process_job(row: Dict[str, Any], max_attempts: int, chunking: Optional[Tuple[int, int]] = None) -> bool:
+    start = time.perf_counter()
+    if _chunk_candidate(row, chunking):
+        pages_per_chunk, min_pages = chunking  # type: ignore[misc]
+        ok = _run_step(row, "processing chunks", max_attempts, process_chunked_file, row["file"], pages_per_chunk, min_pages, row["pre_type"] or None)
+        row["chunks"] = chunk_count(row["result"]) if ok else 0
+    else:
+        ok = _run_step(row, "processing", max_attempts, process_staged_file, row["file"], row["pre_type"] or None)
+    row["process_s"] = round(time.perf_counter() - start, 2)
+    if ok:
+        row["status"] = "done"
+    return ok
+
+
+def _process_batch_job(rows: List[Dict[str, Any]], max_attempts: int, chunking: Optional[Tuple[int, int]] = None) -> bool:
+    # Chunked files have their own procedure; the rest of the batch goes to PROCESS_BATCH
+    chunked_ok = all([_process_job(row, max_attempts, chunking) for row in rows if _chunk_candidate(row, chunking)])
+    rows = [row for row in rows if not _chunk_candidate(row, chunking)]
+    if not rows:
+        return chunked_ok
+    if len(rows) == 1:
+        return _process_job(rows[0], max_attempts) and chunked_ok
+    start = time.perf_counter()
+    for row in rows:
+        row["status"] = "processing (batch)"
+        row["attempts"] = 1
+    try:
+        result = process_staged_batch(
+            [row["file"] for row in rows],
+            {row["file"]: row["pre_type"] for row in rows if row["pre_type"]},
+        )
+    except Exception as e:
+        # Rows PROCESS_BATCH wrote before failing are kept (and indexed, in case it failed
+        # before that); only files without one go through the AI calls again, file by file,
+        # so one bad file does not fail the rest
+        written = set(files_written_since_upload([row["file"] for row in rows]))
+        if written:
+            index_record_fields(sorted(written))
+        missing = []
+        for row in rows:
+            if row["file"] in written:
+                row["process_s"] = round(time.perf_counter() - start, 2)
+                row["status"] = "done"
+                row["result"] = "OK (written before the batch failed)"
+                row["error"] = ""
+            else:
+                row["error"] = str(e)
+                missing.append(row)
+        return all([_process_job(row, max_attempts) for row in missing]) and chunked_ok
+    elapsed = round(time.perf_counter() - start, 2)
+    for row in rows:
+        row["process_s"] = elapsed
+        row["status"] = "done"
+        row["result"] = result
+        row["error"] = ""
+    return chunked_ok
+
+
+def run_upload_pipeline(
+    files: List[Any],
+    upload_workers: int = UPLOAD_WORKERS,
+    process_workers: int = PROCESS_WORKERS,
+    max_attempts: int = MAX_ATTEMPTS,
+    batch_size: int = BATCH_SIZE,
+    preclassify: Optional[Callable[[str, bytes], Optional[str]]] = None,
+    chunking: Optional[Tuple[int, int]] = None,
+    preprocess: Optional[Callable[[str, bytes], Optional[bytes]]] = None,
+    count_pages: Optional[Callable[[str, bytes], Optional[int]]] = None,
+    on_progress: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+) -> List[Dict[str, Any]]:
+    """Stage and process files with bounded upload and processing pools; one status row per file."""
+    # Files go to the processing pool once batch_size of them are staged (or no uploads
+    # remain), so uploads overlap with AI calls. The preclassify, preprocess and count_pages
+    # callables are built on the script thread (make_preclassifier, make_upload_preprocessor,
+    # make_page_counter), so the workers that call them never call into Streamlit.
+    rows = [
+        {"file": f.name, "status": "queued", "attempts": 0, "pre_type": "", "pages": None, "chunks": 0, "saved_kb": 0.0, "upload_s": None, "process_s": None, "result": "", "error": ""}
+        for f in files
+    ]
+
+    def snapshot() -> List[Dict[str, Any]]:
+        # Rows keep a fixed key set, so copying them while workers assign values is safe
+        return [dict(r) for r in rows]
+
+    with ThreadPoolExecutor(max_workers=max(1, upload_workers), thread_name_prefix="upload") as up_pool, \
+            ThreadPoolExecutor(max_workers=max(1, process_workers), thread_name_prefix="process") as proc_pool:
+        pending = {
+            up_pool.submit(bind_perf_trace(_upload_job), row, f, max_attempts, preclassify, preprocess, count_pages): ("upload", [row])
+            for f, row in zip(files, rows)
+        }
+        staged: List[Dict[str, Any]] = []
+        while pending:
+            done, _ = wait(list(pending), timeout=0.5, return_when=FIRST_COMPLETED)
+            for fut in done:
+                kind, job_rows = pending.pop(fut)
+                try:
+                    ok = fut.result()
+                except Exception as e:
+                    for row in job_rows:
+                        row["status"] = f"failed ({kind})"
+                        row["error"] = str(e)
+                    ok = False
+                if kind == "upload" and ok:
+                    staged.extend(job_rows)
+            uploads_left = any(kind == "upload" for kind, _ in pending.values())
+            while staged and (len(staged) >= max(1, batch_size) or not uploads_left):
+                chunk, staged = staged[: max(1, batch_size)], staged[max(1, batch_size):]
+                pending[proc_pool.submit(bind_perf_trace(_process_batch_job), chunk, max_attempts, chunking)] = ("process", chunk)
+            if on_progress is not None:
+                on_progress(snapshot())
+    return snapshot()
+
+
+# --- Validation queue ---
+def start_validation_queue() -> None:
+    # Fire-and-forget: EXECUTE TASK returns immediately and the task drains pending rows
+    try:
+        session.sql(f"EXECUTE TASK {DB_NAME}.{SCHEMA_NAME}.VALIDATE_PENDING_TASK").collect()
+    except Exception as e:
+        # The scheduled run still picks the rows up, but a missing EXECUTE TASK grant should be visible
+        st.warning(f"Could not start validation now ({e}); it will run on the task schedule.")
+
+
+@st.fragment(run_every=VALIDATION_POLL_SECONDS)
+def validation_pending_card(file_name: str, created_at: str, doc_type: str, approved: bool) -> None:
+    st.markdown(
+        """
+        <div class="card" style="margin-bottom:8px;">
+          <div><span class="badge warn">VALIDATION PENDING</span> <span style=\"color:var(--muted); font-size:12px;\">AI validation</span></div>
+          <div style=\"margin-top:6px; font-size:12px; color:#111827;\">Extracted fields are ready to review; the AI validation result will appear here when it completes.</div>
+        </div>
+        """,
+        unsafe_allow_html=True,
+    )
+    rows = session.sql(
+        f"SELECT validation_status FROM {RAW_TABLE} "
+        f"WHERE file_name = '{esc(file_name)}' AND created_at = TO_TIMESTAMP_NTZ('{esc(created_at)}') LIMIT 1"
+    ).collect()
+    if rows and str(rows[0][0] or "").upper() != "PENDING":
+        get_cache_versions().bump(("record", file_name))
+        bump_records(doc_type, ["Approved" if approved else "Not Approved"])
+        st.rerun()
+
+
+# --- Export ---
+def export_columns_sql(fields: Iterable[str]) -> str:
+    # One column per prompt field; arrays are joined with ', ' as in the Review editor
+    columns = []
+    for name in fields:
+        value = f"j['{esc(name)}']"
+        alias = '"' + str(name).replace('"', '""') + '"'
+        columns.append(f", IFF(IS_ARRAY({value}), ARRAY_TO_STRING({value}, ', '), {value}::STRING) AS {alias}")
+    return "".join(columns)
+
+
+def export_approved_sql(doc_type: str, fields: Iterable[str], since: Optional[str] = None) -> str:
+    # Same column layout as the EXPORT_APPROVED stage unload
+    since_sql = f" AND r.approved_at > TO_TIMESTAMP_NTZ('{esc(since)}')" if since else ""
+    return f"""
+        SELECT file_name, document_type, created_at, approved_at{export_columns_sql(fields)}
+        FROM (
+            SELECT r.file_name, r.document_type, r.created_at, r.approved_at,
+                   COALESCE(r.extract_json:response, r.extract_json) AS j
+            FROM {RAW_TABLE} r
+            WHERE r.approved AND r.document_type = '{esc(doc_type)}'{since_sql}
+        )
+    """
+
+
+@traced_cache("load_export_watermark", ttl=CACHE_MAX_AGE_SECONDS)
+def load_export_watermark(export_name: str, doc_type: str, version: int) -> Optional[str]:
+    # Full precision text, so the next run's "approved_at >" bound does not re-read the last row
+    rows = session.sql(
+        f"SELECT TO_VARCHAR(MAX(approved_through), 'YYYY-MM-DD HH24:MI:SS.FF9') FROM {EXPORT_WATERMARKS_TABLE} "
+        f"WHERE export_name = '{esc(export_name)}' AND document_type = '{esc(doc_type)}'"
+    ).collect()
+    return str(rows[0][0]) if rows and rows[0][0] is not None else None
+
+
+def record_export_watermark(export_name: str, doc_type: str, approved_through: str, rows: int, location: str) -> None:
+    session.sql(
+        f"INSERT INTO {EXPORT_WATERMARKS_TABLE} (export_name, document_type, approved_through, rows_exported, location) "
+        f"SELECT '{esc(export_name)}', '{esc(doc_type)}', TO_TIMESTAMP_NTZ('{esc(approved_through)}'), {int(rows)}, '{esc(location)}'"
+    ).collect()
+    get_cache_versions().bump(("export", doc_type))
+
+
+def write_export(sql: str, fmt: str, dest: BinaryIO) -> Tuple[int, Optional[str]]:
+    """Stream a query result into ``dest`` one batch at a time; returns rows and the next watermark."""
+    rows = 0
+    through = None
+    writer = None
+    schema = None
+    try:
+        for batch in session.sql(sql).to_pandas_batches():
+            if batch.empty:
+                continue
+            top = batch["APPROVED_AT"].max()
+            through = top if through is None or top > through else through
+            if fmt == "parquet":
+                if writer is None:
+                    # Fixed schema: a field that is empty in the first batch must not become a null column
+                    schema = pa.schema([
+                        (c, pa.timestamp("ns") if c in ("CREATED_AT", "APPROVED_AT") else pa.string()) for c in batch.columns
+                    ])
+                    writer = pq.ParquetWriter(dest, schema, compression="zstd")
+                writer.write_table(pa.Table.from_pandas(batch, schema=schema, preserve_index=False))
+            else:
+                dest.write(batch.to_csv(index=False, header=rows == 0).encode("utf-8"))
+            rows += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows, (through.isoformat(sep=" ") if through is not None else None)
+
+
+def prepare_export_file(doc_type: str, fields: List[str], fmt: str, since: Optional[str] = None) -> Dict[str, Any]:
+    # Streams into a local temp file; the Export tab hands it to a download button
+    fd, path = tempfile.mkstemp(prefix="export_", suffix=f".{fmt}")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            rows, through = write_export(export_approved_sql(doc_type, fields, since), fmt, fh)
+    except Exception:
+        os.remove(path)
+        raise
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    return {
+        "path": path,
+        "file_name": f"{doc_type}_approved_{stamp}.{fmt}",
+        "document_type": doc_type,
+        "format": fmt,
+        "rows": rows,
+        "through": through,
+        "bytes": os.path.getsize(path),
+    }
+
+
+def discard_export_file() -> None:
+    prepared = st.session_state.pop("export_file", None)
+    if prepared:
+        try:
+            os.remove(prepared["path"])
+        except OSError:
+            pass
+
+
+def on_export_downloaded() -> None:
+    # Download clicks advance the app's watermark; the file is not kept for later reruns
+    prepared = st.session_state.get("export_file")
+    if prepared and prepared["through"]:
+        record_export_watermark(EXPORT_NAME_DOWNLOAD, prepared["document_type"], prepared["through"], prepared["rows"], prepared["file_name"])
+    discard_export_file()
+
+
+def unload_approved(doc_type: str, fmt: str, full: bool = False) -> str:
+    rows = session.sql(
+        f"CALL {DB_NAME}.{SCHEMA_NAME}.EXPORT_APPROVED('{esc(doc_type)}', '{esc(fmt.upper())}', '{EXPORT_NAME_STAGE}', {'TRUE' if full else 'FALSE'})"
+    ).collect()
+    get_cache_versions().bump(("export", doc_type))
+    return str(rows[0][0]) if rows else ""
+
+
+# --- Processing telemetry ---
+def telemetry_window_sql(hours: int) -> str:
+    # PROCESSING_LOG timestamps are CURRENT_TIMESTAMP() stored as NTZ, i.e. session wall time
+    return f"started_at >= DATEADD('hour', -{int(hours)}, CURRENT_TIMESTAMP()::TIMESTAMP_NTZ)"
+
+
+def _latency_percentiles_sql() -> str:
+    return ", ".join(
+        f"PERCENTILE_CONT({q}) WITHIN GROUP (ORDER BY duration_ms) AS p{int(q * 100)}_ms" for q in (0.5, 0.9, 0.99)
+    )
+
+
+@traced_cache("load_stage_latency", ttl=TELEMETRY_CACHE_MAX_AGE_SECONDS)
+def load_stage_latency(hours: int, version: int):
+    # Throughput is files per busy minute: a set-based stage's time is shared by its batch_files
+    sql = f"""
+        SELECT stage AS stage,
+               COALESCE(document_type, 'UNKNOWN') AS document_type,
+               COUNT(*) AS files,
+               {_latency_percentiles_sql()},
+               COUNT(*) / NULLIF(SUM(duration_ms / GREATEST(batch_files, 1)) / 60000, 0) AS files_per_min,
+               AVG(page_count) AS avg_pages,
+               COUNT_IF(outcome = 'ERROR') AS errors
+        FROM {PROCESSING_LOG_TABLE}
+        WHERE {telemetry_window_sql(hours)}
+        GROUP BY 1, 2
+    """
+    df = session.sql(sql).to_pandas()
+    df.rename(columns=str.lower, inplace=True)
+    order = {name: i for i, name in enumerate(TELEMETRY_STAGES)}
+    df["stage_order"] = df["stage"].map(lambda s: order.get(s, len(order)))
+    return df.sort_values(["stage_order", "document_type"]).drop(columns="stage_order").reset_index(drop=True)
+
+
+@traced_cache("load_latency_trend", ttl=TELEMETRY_CACHE_MAX_AGE_SECONDS)
+def load_latency_trend(hours: int, split: str, version: int):
+    # Per stage, or per document type using end-to-end ('total') rows only
+    bucket = "hour" if hours <= 48 else "day"
+    series = "stage" if split == "stage" else "COALESCE(document_type, 'UNKNOWN')"
+    stage_filter = "" if split == "stage" else " AND stage = 'total'"
+    sql = f"""
+        SELECT DATE_TRUNC('{bucket}', started_at) AS period,
+               {series} AS series,
+               COUNT(*) AS files,
+               {_latency_percentiles_sql()}
+        FROM {PROCESSING_LOG_TABLE}
+        WHERE {telemetry_window_sql(hours)}{stage_filter}
+        GROUP BY 1, 2
+        ORDER BY 1
+    """
+    df = session.sql(sql).to_pandas()
+    df.rename(columns=str.lower, inplace=True)
+    return df
+
+
+@traced_cache("load_outcome_counts", ttl=TELEMETRY_CACHE_MAX_AGE_SECONDS)
+def load_outcome_counts(hours: int, version: int):
+    # Processing outcomes come from 'total' rows, validation outcomes from the validate_* stages
+    sql = f"""
+        SELECT COALESCE(document_type, 'UNKNOWN') AS document_type,
+               outcome AS outcome,
+               COUNT(*) AS files
+        FROM {PROCESSING_LOG_TABLE}
+        WHERE {telemetry_window_sql(hours)} AND stage IN ('total', 'validate_rules', 'validate_ai')
+        GROUP BY 1, 2
+    """
+    df = session.sql(sql).to_pandas()
+    df.rename(columns=str.lower, inplace=True)
+    return df
+
+
 # --- Tabs Navigation ---
-tab_prompts, tab_upload, tab_review = st.tabs(["Prompts", "Upload", "Review"])
+@st.fragment(run_every=METADATA_POLL_SECONDS)
+def refresh_shared_caches() -> None:
+    # Runs on this session's script thread with its own Snowpark session; the shared objects
+    # rate-limit themselves, so open sessions take turns rather than all querying
+    get_metadata_poller().maybe_poll(session)
+    get_url_resolver().refresh(session)
+
+
+# Keeps the shared doc type/prompt caches in step with writes made outside this process
+refresh_shared_caches()
+tab_prompts, tab_upload, tab_review, tab_export, tab_telemetry = st.tabs(["Prompts", "Upload", "Review", "Export", "Telemetry"])
 
 
 # --- Help Sidebar ---
@@ -320,9 +2009,14 @@ with st.sidebar:
         - **Upload**: Add PDF/images to process.
           - Select files and click "Upload & Process".
           - Each file is classified, matched to a document type, and extracted using your prompts.
+          - Files upload and process concurrently; tune worker counts and retries under "Pipeline settings".
         - **Review**: Inspect, edit, and approve extracted results.
           - Pick a record, adjust values, then click **Approve & Save**.
           - Approved records are flagged and remain visible for auditing.
+        - **Export**: Download approved records as Parquet/CSV or unload them to a stage.
+          - One column per prompt field; incremental exports only include records approved since the last one.
+        - **Telemetry**: Latency percentiles and throughput per stage and document type.
+          - Every processing and validation call logs per-file stage timings to PROCESSING_LOG.
 
         ---
         **Snowflake resources**
@@ -331,11 +2025,31 @@ with st.sidebar:
         - [Cortex AI – AI Extract overview](https://docs.snowflake.com/en/user-guide/snowflake-cortex)
         """
     )
+    with st.expander("Document cache", expanded=False):
+        cache_stats = get_document_cache().stats()
+        lookups = cache_stats["memory_hits"] + cache_stats["disk_hits"] + cache_stats["misses"]
+        hit_rate = (cache_stats["memory_hits"] + cache_stats["disk_hits"]) / lookups if lookups else 0.0
+        st.caption(
+            f"Hit rate {hit_rate:.0%} · memory {cache_stats['memory_entries']} file(s), "
+            f"{cache_stats['memory_bytes'] / 1048576:.1f} MB · disk {cache_stats['disk_entries']} file(s), "
+            f"{cache_stats['disk_bytes'] / 1048576:.1f} MB"
+        )
+        st.json(cache_stats, expanded=False)
+    show_perf_panel = st.toggle("Performance panel", key="perf_panel", help="Timings for every query, stage transfer, cache lookup and page render in this rerun")
+    perf_slot = st.empty()
+
+
+def close_perf_trace() -> None:
+    # Runs at the end of the script; filled into the sidebar slot once every span is in
+    end_perf_trace(perf_trace)
+    if show_perf_panel:
+        with perf_slot.container():
+            render_perf_panel(perf_trace, st.session_state.get("perf_history", []))
 
 
 with tab_prompts:
     st.subheader("📚 Prompt Manager")
-    dtype_list = list_doc_types(st.session_state.get("_cache_buster", 0))
+    dtype_list = list_doc_types(get_cache_versions().get("doc_types"))
     col_a, col_b = st.columns([1, 2])
     with col_a:
         existing = ["(New)"] + dtype_list
@@ -345,34 +2059,28 @@ with tab_prompts:
             desc = st.text_input("Description", value="")
             active_type = new_type.strip()
         else:
-            desc_row = session.sql(f"SELECT description FROM {DOC_TYPES_TABLE} WHERE document_type = '{esc(sel)}'").collect()
-            desc = desc_row[0][0] if desc_row else ""
+            desc = load_doc_type_profiles(get_cache_versions().get("doc_types")).get(sel, "")
             st.text_input("Description", value=str(desc or ""), key="pm_desc_readonly", disabled=True)
             active_type = sel
     with col_b:
         st.caption("Define fields and retrieval prompts for the selected type.")
-        st.markdown("<div class='card' style='margin-bottom:8px;'><div class='section-title'>Tips</div><div style='font-size:12px; color:var(--muted);'>Use clear field names. Write specific, unambiguous prompts; prefer declarative questions over keywords. The document description is utilized to provide context for the Tier 1 Cortex AI data validation.</div></div>", unsafe_allow_html=True)
+        st.markdown("<div class='card' style='margin-bottom:8px;'><div class='section-title'>Tips</div><div style='font-size:12px; color:var(--muted);'>Use clear field names. Write specific, unambiguous prompts; prefer declarative questions over keywords. The document description is utilized to provide context for the Tier 1 Cortex AI data validation. Optional rules (value_type, pattern, min/max, required) are checked first: records whose rule-checked fields all pass are validated without an AI call.</div></div>", unsafe_allow_html=True)
         rc1, rc2 = st.columns([1,1])
         with rc1:
             refresh_now = st.button("↻ Refresh", help="Reload types and prompts", use_container_width=True, key="pm_refresh")
         with rc2:
             st.empty()
         if refresh_now:
-            _bump_cache()
+            get_cache_versions().bump(("doc_types",), ("prompts", active_type))
         if active_type:
-            data = load_prompts(active_type, st.session_state.get("_cache_buster", 0))
+            data = load_prompts(active_type, get_cache_versions().get("prompts", active_type))
         else:
             data = None
         # Ensure editor has expected columns when empty
-        try:
-            import pandas as pd  # local import to avoid top-level dependency if unused
-        except Exception:
-            pd = None  # type: ignore[assignment]
         if data is None or getattr(data, 'empty', True):
-            if pd is not None:
-                data = pd.DataFrame(columns=["field_name", "retrieval_prompt", "sort_order"])
+            data = pd.DataFrame(columns=["field_name", "retrieval_prompt", "sort_order", "value_type", "pattern", "min_value", "max_value", "required"])
         edited = st.data_editor(
-            data if data is not None else None,
+            data,
             num_rows="dynamic",
             use_container_width=True,
             key=f"pm_grid_{active_type or 'new'}",
@@ -380,6 +2088,11 @@ with tab_prompts:
                 "field_name": st.column_config.TextColumn("field_name"),
                 "retrieval_prompt": st.column_config.TextColumn("retrieval_prompt", width="large"),
                 "sort_order": st.column_config.NumberColumn("sort_order", step=1),
+                "value_type": st.column_config.SelectboxColumn("value_type", options=FIELD_RULE_TYPES, help="Format the extracted value must have"),
+                "pattern": st.column_config.TextColumn("pattern", help="Regular expression the whole value must match"),
+                "min_value": st.column_config.NumberColumn("min_value", help="Smallest allowed numeric value"),
+                "max_value": st.column_config.NumberColumn("max_value", help="Largest allowed numeric value"),
+                "required": st.column_config.CheckboxColumn("required", help="Fail when the value is missing"),
             },
         )
         c1, c2 = st.columns([1,1])
@@ -390,17 +2103,50 @@ with tab_prompts:
                     if not dtype_val:
                         st.error("Document type is required.")
                     else:
+                        # Rules are checked before the type or its prompts are written
+                        new_prompts = prompt_rows(edited)
                         upsert_doc_type(dtype_val, desc if sel == "(New)" else (desc or ""))
-                        inserted = replace_prompts(dtype_val, edited)
-                    _bump_cache()
+                        inserted, diff = replace_prompts(dtype_val, new_prompts)
+                        saved_scopes = [("prompts", dtype_val)]
+                        if sel == "(New)":
+                            saved_scopes.append(("doc_types",))
+                        get_metadata_poller().refresh(session, *saved_scopes)
                     if inserted > 0:
                         st.success(f"Prompts saved ({inserted}).")
+                        changes = [
+                            f"{label}: {', '.join(diff.get(key) or [])}"
+                            for key, label in (("added", "Added"), ("changed", "Changed"), ("removed", "Removed"))
+                            if diff.get(key)
+                        ]
+                        if changes:
+                            st.caption(f"Version {diff.get('version')} · " + " · ".join(changes))
                     else:
                         st.warning("No prompts saved. Ensure 'field_name' and 'retrieval_prompt' are filled.")
                 except Exception as e:
                     st.error(f"Error saving prompts: {e}")
         with c2:
             st.caption("Saving replaces prompts for this type.")
+        if active_type and sel != "(New)":
+            outdated = count_outdated_records(
+                active_type,
+                (get_cache_versions().get("prompts", active_type), *records_version(active_type, "Not Approved")),
+            )
+            if outdated:
+                st.info(f"{outdated} unapproved record(s) were extracted with an older version of these prompts.")
+                if st.button(
+                    f"Re-extract changed fields ({outdated})",
+                    use_container_width=True,
+                    key="pm_reextract",
+                    help="Runs AI_EXTRACT only for added or changed fields and merges the answers into each record.",
+                ):
+                    try:
+                        with st.spinner("Re-extracting changed fields…"):
+                            st.success(reextract_changed_fields(active_type))
+                        bump_records(active_type, ["Not Approved"])
+                        get_cache_versions().bump(("record_type", active_type))
+                        start_validation_queue()
+                    except Exception as e:
+                        st.error(f"Error re-extracting: {e}")
 
 with tab_upload:
     st.subheader("⬆️ Upload Documents")
@@ -414,43 +2160,244 @@ with tab_upload:
     if files:
         names = [f.name for f in files]
         st.markdown(f"<div class='card'><div class='section-title'>Queued files</div><div class='pill'>{len(names)} selected</div><div style='margin-top:8px; font-size:12px; color:var(--muted);'>" + ", ".join(names) + "</div></div>", unsafe_allow_html=True)
+    with st.expander("Pipeline settings", expanded=False):
+        pc1, pc2, pc3, pc4 = st.columns(4)
+        with pc1:
+            upload_workers = st.number_input("Concurrent uploads", min_value=1, max_value=16, value=UPLOAD_WORKERS, step=1, key="pl_upload_workers")
+        with pc2:
+            process_workers = st.number_input("Concurrent processing", min_value=1, max_value=16, value=PROCESS_WORKERS, step=1, key="pl_process_workers")
+        with pc3:
+            max_attempts = st.number_input("Attempts per file", min_value=1, max_value=5, value=MAX_ATTEMPTS, step=1, key="pl_max_attempts")
+        with pc4:
+            batch_size = st.number_input("Files per batch", min_value=1, max_value=100, value=BATCH_SIZE, step=1, key="pl_batch_size", help="Values above 1 process staged files together with the set-based PROCESS_BATCH procedure.")
+        use_preclassify = st.checkbox(
+            "Pre-classify PDFs from their first page",
+            value=False,
+            key="pl_preclassify",
+            help="A confident match of the first-page text against document type names/descriptions skips AI classification. Otherwise longer PDFs are classified by AI_EXTRACT from the first page alone instead of the whole file. Single-page PDFs and NO_MATCH answers are classified as before.",
+        )
+        use_chunking = st.checkbox(
+            "Split large PDFs into page chunks",
+            value=False,
+            key="pl_chunking",
+            help="PDFs with at least the minimum page count are split into page ranges in the warehouse; chunks are extracted in parallel and merged into one record that remembers the page each field came from. PDFs are then processed one per call instead of in batches.",
+        )
+        cc1, cc2 = st.columns(2)
+        with cc1:
+            chunk_pages = st.number_input("Pages per chunk", min_value=1, max_value=100, value=CHUNK_PAGES, step=1, key="pl_chunk_pages", disabled=not use_chunking)
+        with cc2:
+            chunk_min_pages = st.number_input("Only PDFs with at least (pages)", min_value=2, max_value=1000, value=CHUNK_MIN_PAGES, step=1, key="pl_chunk_min_pages", disabled=not use_chunking)
+        pp1, pp2 = st.columns(2)
+        with pp1:
+            use_downsample = st.checkbox(
+                "Downsample oversized JPEG/PNG scans",
+                value=False,
+                key="pl_downsample",
+                help=f"Images of at least {UPLOAD_DOWNSAMPLE_MIN_BYTES // (1024 * 1024)} MB with at least {UPLOAD_DOWNSAMPLE_MIN_RATIO:g}x the DPI limit on an A4 page are resized before staging, which cuts upload bytes, stage storage and AI_EXTRACT input size. Other images are staged as they are, since resizing them costs more time than the smaller upload saves.",
+            )
+            max_image_dpi = st.number_input("Max image DPI", min_value=72, max_value=600, value=UPLOAD_MAX_IMAGE_DPI, step=10, key="pl_max_image_dpi", disabled=not use_downsample)
+        with pp2:
+            strip_pdfs = st.checkbox(
+                "Strip attachments and old revisions from PDFs",
+                value=False,
+                key="pl_strip_pdfs",
+                help="PDFs are rewritten without embedded files or superseded incremental saves. Digital signatures do not survive the rewrite.",
+            )
+        count_pdf_pages = st.checkbox(
+            "Record PDF page counts",
+            value=False,
+            key="pl_count_pages",
+            help="Each PDF is opened locally before staging so PROCESSING_LOG can report per-page latency, and PDFs below the chunking minimum skip the chunked procedure. Chunked files get their page counts from the warehouse either way.",
+        )
+        st.caption("Set both concurrency values and the batch size to 1 to upload and process one file at a time.")
+    last_run = st.session_state.get("upload_last_run")
+    if last_run and not files:
+        st.markdown("<div class='section-title'>Last upload run</div>", unsafe_allow_html=True)
+        st.dataframe(last_run, use_container_width=True, hide_index=True)
     if st.button("Upload & Process", use_container_width=True, disabled=not files):
-        uploaded = 0
-        errors = []
-        filenames = []
-        for f in files or []:
-            try:
-                import io
-                stage_path = f"@{DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME}/{f.name}"
-                byte_stream = io.BytesIO(f.getvalue())
-                session.file.put_stream(byte_stream, stage_path, auto_compress=False, overwrite=True)  # type: ignore[attr-defined]
-                uploaded += 1
-                filenames.append(f.name)
-            except Exception as e:
-                errors.append(f"{f.name}: {e}")
-        try:
-            # Ensure stage directory metadata is current for stream detection
-            session.sql(f"ALTER STAGE {DB_NAME}.{SCHEMA_NAME}.{STAGE_NAME} REFRESH").collect()
-            # Delegate processing to Snowflake stored procedure per file
-            for fname in filenames:
-                session.sql(f"CALL {DB_NAME}.{SCHEMA_NAME}.PROCESS_ONE_FILE('{esc(fname)}')").collect()
-        except Exception as e:
-            errors.append(f"Processing error: {e}")
-        if uploaded and not errors:
-            st.success(f"Uploaded and processed {uploaded} file(s).")
+        progress_bar = st.progress(0.0, text="Starting…")
+        status_table = st.empty()
+        total = len(files or [])
+
+        def _show_progress(rows: List[Dict[str, Any]]) -> None:
+            finished = sum(1 for r in rows if r["status"] == "done" or r["status"].startswith("failed"))
+            progress_bar.progress(finished / total if total else 1.0, text=f"{finished} of {total} file(s) finished")
+            status_table.dataframe(rows, use_container_width=True, hide_index=True)
+
+        results = run_upload_pipeline(
+            list(files or []),
+            upload_workers=int(upload_workers),
+            process_workers=int(process_workers),
+            max_attempts=int(max_attempts),
+            batch_size=int(batch_size),
+            preclassify=(
+                make_preclassifier(load_doc_type_profiles(get_cache_versions().get("doc_types")), get_page_cache().pdfium_lock)
+                if use_preclassify
+                else None
+            ),
+            chunking=(int(chunk_pages), int(chunk_min_pages)) if use_chunking else None,
+            preprocess=(
+                make_upload_preprocessor(get_page_cache().pdfium_lock, int(max_image_dpi) if use_downsample else None, strip_pdfs)
+                if use_downsample or strip_pdfs
+                else None
+            ),
+            count_pages=make_page_counter(get_page_cache().pdfium_lock) if count_pdf_pages else None,
+            on_progress=_show_progress,
+        )
+        _show_progress(results)
+        processed = [r for r in results if r["status"] == "done"]
+        failed = [r for r in results if r["status"] != "done"]
+        st.session_state["upload_last_run"] = results
+        # Re-uploaded names may carry new bytes; drop any cached copy of them
+        doc_cache = get_document_cache()
+        for r in results:
+            doc_cache.invalidate(r["file"])
+        if processed:
+            # New rows are unapproved; their document type is only known server-side
+            bump_records(None, ["Not Approved"])
+            start_validation_queue()
+            get_cache_versions().bump(*[("record", r["file"]) for r in processed], ("telemetry",))
+        if processed and not failed:
+            st.success(f"Uploaded and processed {len(processed)} file(s).")
             # Clear uploader queue by bumping nonce to force a new widget key
             st.session_state["uploader_nonce"] = int(st.session_state.get("uploader_nonce", 0)) + 1
-            _bump_cache()
             st.rerun()
-        elif uploaded:
-            st.warning(f"Uploaded {uploaded} file(s) with some errors:\n" + "\n".join(errors))
+        elif processed:
+            st.warning(
+                f"Processed {len(processed)} file(s); {len(failed)} failed:\n"
+                + "\n".join(f"{r['file']}: {r['error']}" for r in failed)
+            )
         else:
-            st.error("No files uploaded. See errors above.")
-            if errors:
-                st.error("\n".join(errors))
+            st.error("No files processed.")
+            st.error("\n".join(f"{r['file']}: {r['error']}" for r in failed))
+with tab_export:
+    st.subheader("⬇️ Export Approved Records")
+    export_types = list_doc_types(get_cache_versions().get("doc_types"))
+    if not export_types:
+        st.info("No document types yet. Create one in the Prompts tab.")
+    else:
+        ec1, ec2, ec3 = st.columns([2, 1, 1])
+        with ec1:
+            export_type = st.selectbox("Document Type", export_types, key="ex_dtype")
+        with ec2:
+            export_format = st.radio("Format", ["Parquet", "CSV"], horizontal=True, key="ex_format").lower()
+        with ec3:
+            export_target = st.radio("Destination", ["Download", "Stage"], horizontal=True, key="ex_target")
+        export_name = EXPORT_NAME_DOWNLOAD if export_target == "Download" else EXPORT_NAME_STAGE
+        watermark = load_export_watermark(export_name, export_type, get_cache_versions().get("export", export_type))
+        incremental = st.checkbox(
+            "Only records approved since the last export",
+            value=watermark is not None,
+            disabled=watermark is None,
+            key=f"ex_incremental::{export_name}::{export_type}",
+        )
+        if watermark:
+            st.caption(f"Last {export_target.lower()} export of {export_type} covered approvals through {watermark}.")
+        else:
+            st.caption(f"No earlier {export_target.lower()} export of {export_type}; the first one includes every approved record.")
+        export_fields = load_prompts(export_type, get_cache_versions().get("prompts", export_type))["field_name"].tolist()
+        st.caption(f"Columns: file_name, document_type, created_at, approved_at and {len(export_fields)} field(s) from the prompt set.")
+        if export_target == "Download":
+            if st.button("Prepare file", key="ex_prepare"):
+                discard_export_file()
+                try:
+                    with st.spinner("Streaming approved records…"):
+                        st.session_state["export_file"] = prepare_export_file(
+                            export_type, export_fields, export_format, watermark if incremental else None
+                        )
+                except Exception as e:
+                    st.error(f"Export failed: {e}")
+            prepared = st.session_state.get("export_file")
+            if prepared and prepared["document_type"] == export_type and prepared["format"] == export_format:
+                if not prepared["rows"]:
+                    st.info("No approved records to export.")
+                else:
+                    with open(prepared["path"], "rb") as fh:
+                        st.download_button(
+                            f"Download {prepared['rows']} record(s) ({prepared['bytes'] / 1048576:.1f} MB)",
+                            data=fh,
+                            file_name=prepared["file_name"],
+                            mime="application/vnd.apache.parquet" if export_format == "parquet" else "text/csv",
+                            on_click=on_export_downloaded,
+                            key="ex_download",
+                            use_container_width=True,
+                        )
+        else:
+            st.caption(f"Files are written to @{EXPORT_STAGE_NAME}/{export_type}/<timestamp>/ by EXPORT_APPROVED; the nightly task EXPORT_APPROVED_NIGHTLY does the same for every type once resumed.")
+            if st.button(f"Unload to @{EXPORT_STAGE_NAME}", key="ex_unload", use_container_width=True):
+                try:
+                    with st.spinner("Unloading…"):
+                        st.success(unload_approved(export_type, export_format, full=not incremental))
+                except Exception as e:
+                    st.error(f"Unload failed: {e}")
+
+with tab_telemetry:
+    st.subheader("📈 Processing Telemetry")
+    tc1, tc2 = st.columns([3, 1])
+    with tc1:
+        window_label = st.selectbox("Window", list(TELEMETRY_WINDOWS), key="tm_window")
+    with tc2:
+        st.write("")
+        if st.button("Refresh", key="tm_refresh", use_container_width=True):
+            get_cache_versions().bump(("telemetry",))
+    window_hours = TELEMETRY_WINDOWS[window_label]
+    telemetry_version = get_cache_versions().get("telemetry")
+    try:
+        latency = load_stage_latency(window_hours, telemetry_version)
+    except Exception as e:
+        st.error(f"Could not read PROCESSING_LOG: {e}")
+        latency = None
+    if latency is not None and latency.empty:
+        st.info("No processing runs logged in this window. Stage timings appear here once files are processed.")
+    elif latency is not None:
+        totals = latency[latency["stage"] == "total"]
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Files processed", int(totals["files"].sum()))
+        m2.metric("Errors", int(totals["errors"].sum()))
+        if not totals.empty:
+            slowest = totals.loc[totals["p90_ms"].idxmax()]
+            m3.metric("Slowest type (p90)", f"{slowest['p90_ms'] / 1000:.1f} s", slowest["document_type"], delta_color="off")
+
+        st.markdown("<div class='section-title'>Latency by stage and document type</div>", unsafe_allow_html=True)
+        st.dataframe(
+            latency,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.0f"),
+                "p90_ms": st.column_config.NumberColumn("p90 (ms)", format="%.0f"),
+                "p99_ms": st.column_config.NumberColumn("p99 (ms)", format="%.0f"),
+                "files_per_min": st.column_config.NumberColumn("files / busy min", format="%.1f"),
+                "avg_pages": st.column_config.NumberColumn("avg pages", format="%.1f"),
+            },
+        )
+        st.caption(
+            "Stages: reuse, classify, extract and write inside the processing procedures; total is the whole call; "
+            "validate_rules and validate_ai are VALIDATE_PENDING passes. Set-based stages share their time across "
+            "the files in the batch when computing files per busy minute."
+        )
+
+        st.markdown("<div class='section-title'>Over time</div>", unsafe_allow_html=True)
+        split_label = st.radio("Split by", ["Stage", "Document type"], horizontal=True, key="tm_split")
+        trend = load_latency_trend(window_hours, split_label.lower().replace(" ", "_"), telemetry_version)
+        if not trend.empty:
+            percentile = st.radio("Latency percentile", ["p50", "p90", "p99"], index=1, horizontal=True, key="tm_percentile")
+            st.caption(f"{percentile} latency (ms) per {'hour' if window_hours <= 48 else 'day'}")
+            st.line_chart(trend.pivot_table(index="period", columns="series", values=f"{percentile}_ms"))
+            st.caption("Files per period")
+            st.bar_chart(trend.pivot_table(index="period", columns="series", values="files", aggfunc="sum"))
+
+        outcomes = load_outcome_counts(window_hours, telemetry_version)
+        if not outcomes.empty:
+            st.markdown("<div class='section-title'>Outcomes</div>", unsafe_allow_html=True)
+            st.dataframe(
+                outcomes.pivot_table(index="document_type", columns="outcome", values="files", aggfunc="sum", fill_value=0),
+                use_container_width=True,
+            )
+
 with tab_review:
     # Filters inline on Review tab
-    dtypes = list_doc_types(st.session_state.get("_cache_buster", 0))
+    dtypes = list_doc_types(get_cache_versions().get("doc_types"))
     dtype_options = ["All"] + dtypes + (["NO_MATCH"] if "NO_MATCH" not in dtypes else [])
     fc1, fc2 = st.columns([2,1])
     with fc1:
@@ -458,17 +2405,155 @@ with tab_review:
     with fc2:
         approval_filter = st.selectbox("Approval Status", ["All", "Approved", "Not Approved"], index=0, key="filter_approval")
 
-    # Review
-    records_df = load_records(doc_type, approval_filter, st.session_state.get("_cache_buster", 0))
-    if records_df is None or records_df.empty:
-        st.info("No records found.")
-        st.stop()
+    sc1, sc2 = st.columns([2, 1])
+    with sc1:
+        search_term = st.text_input(
+            "Search extracted values",
+            key="review_search",
+            placeholder="Parcel number, license number, applicant name…",
+        ).strip()
+    with sc2:
+        search_fields = []
+        if doc_type not in ("All", "NO_MATCH"):
+            prompts_df = load_prompts(doc_type, get_cache_versions().get("prompts", doc_type))
+            if prompts_df is not None and not prompts_df.empty:
+                search_fields = [str(f) for f in prompts_df["field_name"]]
+        search_field = st.selectbox("In field", ["Any field"] + search_fields, key="review_search_field")
+    search_field = None if search_field == "Any field" else search_field
+
+    if search_term:
+        records_df = search_records(search_term, search_field, doc_type, approval_filter, records_version(doc_type, approval_filter))
+        if records_df is None or records_df.empty:
+            st.info("No records match the search.")
+            close_perf_trace()  # st.stop() skips the end of the script
+            st.stop()
+        st.caption(
+            f"{len(records_df)} matching record(s)"
+            + (f" (first {SEARCH_MAX_RESULTS} shown; refine the search)" if len(records_df) >= SEARCH_MAX_RESULTS else "")
+        )
+        list_key = f"search::{search_term}::{search_field}::{(doc_type, approval_filter)}"
+    else:
+        # Review: keyset pagination, cursor stack reset whenever the filters change
+        page_filter = (doc_type, approval_filter)
+        if st.session_state.get("review_page_filter") != page_filter:
+            st.session_state["review_page_filter"] = page_filter
+            st.session_state["review_cursors"] = [None]
+        cursors = st.session_state["review_cursors"]
+        page_df = load_record_page(doc_type, approval_filter, cursors[-1], records_version(doc_type, approval_filter))
+        if page_df is None or page_df.empty:
+            if len(cursors) > 1:
+                # Page emptied underneath us (e.g. approvals moved rows out of the filter)
+                st.session_state["review_cursors"] = [None]
+                st.rerun()
+            st.info("No records found.")
+            close_perf_trace()  # st.stop() skips the end of the script
+            st.stop()
+        has_older = len(page_df) > REVIEW_PAGE_SIZE
+        records_df = page_df.iloc[:REVIEW_PAGE_SIZE]
+        pg1, pg2, pg3 = st.columns([1, 4, 1])
+        with pg1:
+            if st.button("◀ Newer", key="review_newer", disabled=len(cursors) <= 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with pg2:
+            first = (len(cursors) - 1) * REVIEW_PAGE_SIZE + 1
+            st.caption(f"Records {first}–{first + len(records_df) - 1}" + (" (more available)" if has_older else ""))
+        with pg3:
+            if st.button("Older ▶", key="review_older", disabled=not has_older, use_container_width=True):
+                last = records_df.iloc[-1]
+                cursors.append((str(last["CREATED_AT"]), str(last["FILE_NAME"])))
+                st.rerun()
+        list_key = f"page::{page_filter}::{len(cursors)}"
+
+    with st.expander("Bulk approve", expanded=False):
+        st.caption("Approve several records from this page in one write. Field overrides, if any, are applied to the selected records whose document type has that field.")
+        preselect = st.checkbox("Preselect unapproved records with a VALID result", value=True, key="bulk_preselect")
+        bulk_df = records_df[["FILE_NAME", "DOCUMENT_TYPE", "CREATED_AT", "APPROVED", "VALIDATION_VALID"]].copy()
+        bulk_df.insert(
+            0,
+            "Approve",
+            [
+                bool(preselect and not a and str(v).lower() == "true")
+                for a, v in zip(bulk_df["APPROVED"], bulk_df["VALIDATION_VALID"])
+            ],
+        )
+        # Keyed on the page and its records version so selections reset once rows change
+        bulk_key = f"bulk_editor::{list_key}::{records_version(doc_type, approval_filter)}::{preselect}"
+        bulk_edited = st.data_editor(
+            bulk_df,
+            key=bulk_key,
+            hide_index=True,
+            use_container_width=True,
+            disabled=[c for c in bulk_df.columns if c != "Approve"],
+            column_config={"Approve": st.column_config.CheckboxColumn("Approve", default=False)},
+        )
+        overrides_df = st.data_editor(
+            pd.DataFrame({"Field Name": pd.Series(dtype="str"), "Value": pd.Series(dtype="str")}),
+            key=f"bulk_overrides::{bulk_key}",
+            num_rows="dynamic",
+            use_container_width=True,
+        )
+        chosen = bulk_edited[bulk_edited["Approve"]]
+        if st.button(f"✅ Approve selected ({len(chosen)})", disabled=chosen.empty, use_container_width=True, key="bulk_approve"):
+            overrides = {
+                str(r["Field Name"]).strip(): r["Value"]
+                for _, r in overrides_df.iterrows()
+                if str(r.get("Field Name") or "").strip()
+            }
+            type_fields = {
+                dt: set(load_prompts(dt, get_cache_versions().get("prompts", dt))["field_name"].astype(str))
+                for dt in set(chosen["DOCUMENT_TYPE"].astype(str))
+            }
+            unknown = sorted(k for k in overrides if not any(k in fields for fields in type_fields.values()))
+            items = []
+            for _, r in chosen.iterrows():
+                item = {"file_name": r["FILE_NAME"], "created_at": str(r["CREATED_AT"])}
+                fields = {k: v for k, v in overrides.items() if k in type_fields[str(r["DOCUMENT_TYPE"])]}
+                if fields:
+                    item["fields"] = fields
+                items.append(item)
+            if unknown:
+                st.error(f"Not a field of the selected document types: {', '.join(unknown)}")
+            else:
+                try:
+                    with st.spinner(f"Approving {len(items)} record(s)…"):
+                        result = approve_records(items)
+                    # Refresh only the lists and records this approval can change
+                    for dt in set(chosen["DOCUMENT_TYPE"].astype(str)):
+                        bump_records(dt, ["Approved", "Not Approved"])
+                    get_cache_versions().bump(*[("record", str(f)) for f in chosen["FILE_NAME"]])
+                    st.session_state["bulk_approve_result"] = result
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error approving records: {e}")
+        if st.session_state.get("bulk_approve_result"):
+            st.caption(st.session_state.pop("bulk_approve_result"))
+
     st.subheader("Record Detail")
+    # First occurrence wins for repeated file names (newest row), matching the previous behaviour
+    rows_by_name: Dict[str, Any] = {}
+    for _, r in records_df.iterrows():
+        rows_by_name.setdefault(r.get("FILE_NAME"), r)
+    # Links for the whole list in at most one query; RAW.file_url is reused while it has lifetime left
+    page_urls = get_url_resolver().resolve(session, rows_by_name, known={n: r.get("FILE_URL") for n, r in rows_by_name.items()})
     selected = st.selectbox(
         "Select a record by file name",
-        options=[r.get("FILE_NAME") for _, r in records_df.iterrows()],
+        options=list(rows_by_name),
+        format_func=(
+            (lambda n: f"{n} · {rows_by_name[n]['MATCHED_FIELD']}: {rows_by_name[n]['MATCHED_VALUE']}")
+            if search_term
+            else str
+        ),
     )
-    detail = records_df[records_df["FILE_NAME"] == selected].iloc[0]
+    page_row = rows_by_name[selected]
+    detail = {
+        **page_row.to_dict(),
+        **load_record_detail(
+            selected,
+            str(page_row.get("CREATED_AT")),
+            (get_cache_versions().get("record", selected), get_cache_versions().get("record_type", str(page_row.get("DOCUMENT_TYPE") or ""))),
+        ),
+    }
 
     approved = bool(detail.get("APPROVED"))
     dtype = str(detail.get("DOCUMENT_TYPE") or "").upper()
@@ -476,20 +2561,24 @@ with tab_review:
     when_str = when.strftime('%Y-%m-%d %H:%M') if hasattr(when, 'strftime') else str(when)
     status_html = '<span class="badge ok">APPROVED</span>' if approved else '<span class="badge warn">NOT APPROVED</span>'
     # Validation card
-    v = ensure_dict(detail.get("VALIDATION_JSON"))
-    v_resp = ensure_dict(v.get("response", v))
-    v_valid = str(v_resp.get("valid", "")).lower() in ("true", "yes", "1")
-    v_notes = v_resp.get("notes") or v_resp.get("message") or ""
-    val_badge = '<span class="badge ok">VALID</span>' if v_valid else '<span class="badge warn">REVIEW</span>'
-    st.markdown(
-        f"""
-        <div class="card" style="margin-bottom:8px;">
-          <div>{val_badge} <span style=\"color:var(--muted); font-size:12px;\">AI validation</span></div>
-          <div style=\"margin-top:6px; font-size:12px; color:#111827;\">{esc(v_notes)}</div>
-        </div>
-        """,
-        unsafe_allow_html=True,
-    )
+    if str(detail.get("VALIDATION_STATUS") or "").upper() == "PENDING":
+        validation_pending_card(str(selected), str(detail.get("CREATED_AT")), str(detail.get("DOCUMENT_TYPE") or ""), approved)
+    else:
+        v = ensure_dict(detail.get("VALIDATION_JSON"))
+        v_resp = ensure_dict(v.get("response", v))
+        v_valid = str(v_resp.get("valid", "")).lower() in ("true", "yes", "1")
+        v_notes = v_resp.get("notes") or v_resp.get("message") or ""
+        v_source = "Rule validation" if v_resp.get("source") == "rules" else "AI validation"
+        val_badge = '<span class="badge ok">VALID</span>' if v_valid else '<span class="badge warn">REVIEW</span>'
+        st.markdown(
+            f"""
+            <div class="card" style="margin-bottom:8px;">
+              <div>{val_badge} <span style=\"color:var(--muted); font-size:12px;\">{v_source}</span></div>
+              <div style=\"margin-top:6px; font-size:12px; color:#111827;\">{esc(v_notes)}</div>
+            </div>
+            """,
+            unsafe_allow_html=True,
+        )
     st.markdown(
         f"""
         <div class="card">
@@ -515,10 +2604,34 @@ with tab_review:
         else:
             # Generic editor for any document type
             # Convert dict to table for editing
-            import pandas as pd
             items = sorted(list(resp.items()), key=lambda kv: kv[0])
             df = pd.DataFrame(items, columns=["Field Name", "Extracted Value"])
-            edited_df = st.data_editor(df, num_rows="dynamic", use_container_width=True, key="generic_editor")
+            # Chunked extractions remember which page each answer came from
+            field_pages = {k: v for k, v in ensure_dict(detail.get("FIELD_PAGES")).items() if k in resp}
+            if field_pages:
+                df["Source page"] = [field_pages.get(k) for k, _ in items]
+            edited_df = st.data_editor(
+                df,
+                num_rows="dynamic",
+                use_container_width=True,
+                key="generic_editor",
+                disabled=["Source page"] if field_pages else False,
+            )
+            if field_pages and get_file_type(selected) == "pdf":
+                jump_key = f"jump_field::{selected}"
+
+                def _jump_to_field_page(key: str = jump_key, pages: Dict[str, Any] = field_pages, name: str = selected) -> None:
+                    field = st.session_state.get(key)
+                    if field in pages:
+                        show_preview_page(name, pages[field])
+
+                st.selectbox(
+                    "Show the page a field was found on",
+                    ["—"] + sorted(field_pages),
+                    key=jump_key,
+                    format_func=lambda f: f if f == "—" else f"{f} (page {field_pages[f]})",
+                    on_change=_jump_to_field_page,
+                )
             submitted = st.button("✅ Approve & Save", use_container_width=True)
             if submitted:
                 try:
@@ -535,9 +2648,9 @@ with tab_review:
                     session.sql(
                         f"CALL {DB_NAME}.{SCHEMA_NAME}.APPROVE_RECORD('{esc(file_name)}', PARSE_JSON('{escape_json_for_sql(payload)}'))"
                     ).collect()
-                    # Refresh caches so approval state is visible immediately
-                    _bump_cache()
-                    load_records.clear()
+                    # Refresh only the lists and record this approval can change
+                    bump_records(str(detail.get("DOCUMENT_TYPE") or ""), ["Approved", "Not Approved"])
+                    get_cache_versions().bump(("record", file_name))
                     # Force a rerun to refresh widgets
                     st.rerun()
                 except Exception as e:
@@ -546,13 +2659,17 @@ with tab_review:
     with cols[1]:
         st.markdown("### 📄 Original Document Preview")
         file_name = detail.get("FILE_NAME")
-        url = get_presigned_url(session, file_name)
-        data = fetch_stage_file(session, file_name)
+        url = page_urls.get(str(file_name))
+        data, doc_key = fetch_stage_file(session, file_name)
         ftype = get_file_type(file_name)
         container_class = "card"
         st.markdown(f"<div class='{container_class}'>", unsafe_allow_html=True)
         if ftype == "pdf":
-            render_document_preview(file_name, url, data, scale=1.5)
+            render_document_preview(file_name, url, data, doc_key, scale=1.5)
         else:
-            render_document_preview(file_name, url, data, scale=2.0)
-        st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+            render_document_preview(file_name, url, data, doc_key, scale=2.0)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+
+# --- Performance panel ---
+close_perf_trace()
@@ -0,0 +1,506 @@
+"""In-memory stand-in for the Snowpark session used by ``app/streamlit_main.py``.
+
+It recognises the statements the app issues (by pattern, not by parsing SQL) and serves
+them from Python structures. Every call sleeps for a configurable latency so benchmarks
+can model warehouse round trips and AI_EXTRACT/AI_COMPLETE time.
+"""
+import bisect
+import io
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+_LITERAL = r"'((?:[^']|'')*)'"
+
+
+def _unquote(value: str) -> str:
+    return value.replace("''", "'")
+
+
+def _literals(sql: str) -> List[str]:
+    return [_unquote(m) for m in re.findall(_LITERAL, sql)]
+
+
+class FakeRow(tuple):
+    """Tuple with Snowpark ``Row``-style access by position, column name or attribute."""
+
+    def __new__(cls, fields: Sequence[str], values: Sequence[Any]) -> "FakeRow":
+        row = super().__new__(cls, values)
+        row._fields = [f.upper() for f in fields]
+        return row
+
+    def __getitem__(self, key: Any) -> Any:  # type: ignore[override]
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._fields.index(key.upper()))
+        return tuple.__getitem__(self, key)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except ValueError:
+            raise AttributeError(name)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._fields, self))
+
+
+class FakeDataFrame:
+    # Rows per to_pandas_batches() batch, standing in for the connector's result chunks
+    batch_rows = 8192
+
+    def __init__(self, columns: Sequence[str], rows: Iterable[Sequence[Any]] = (), quoted: Sequence[str] = ()) -> None:
+        # Unquoted identifiers come back upper-cased, quoted ones (export field columns) as written
+        self.columns = [c.upper() for c in columns] + list(quoted)
+        self.rows = [tuple(r) for r in rows]
+
+    def collect(self) -> List[FakeRow]:
+        return [FakeRow(self.columns, r) for r in self.rows]
+
+    def to_pandas(self):
+        import pandas as pd
+
+        return pd.DataFrame(self.rows, columns=self.columns)
+
+    def to_pandas_batches(self):
+        import pandas as pd
+
+        for i in range(0, len(self.rows), self.batch_rows):
+            yield pd.DataFrame(self.rows[i:i + self.batch_rows], columns=self.columns)
+
+
+class FakeFileOperation:
+    def __init__(self, session: "FakeSession") -> None:
+        self._session = session
+
+    def put_stream(self, input_stream: Any, stage_location: str, auto_compress: bool = True, overwrite: bool = False) -> None:
+        data = input_stream.read()
+        time.sleep(self._session.put_latency_s + self._session._transfer_wait(len(data)))
+        with self._session._lock:
+            self._session.stage[stage_location.rsplit("/", 1)[-1]] = data
+
+    def get_stream(self, stage_location: str, decompress: bool = False) -> io.BytesIO:
+        time.sleep(self._session.get_latency_s)
+        with self._session._lock:
+            data = self._session.stage[stage_location.rsplit("/", 1)[-1]]
+        return io.BytesIO(data)
+
+
+class FakeSession:
+    """Snowpark-compatible subset: ``sql().collect()/to_pandas()`` and ``file.put_stream/get_stream``.
+
+    An AI_EXTRACT call costs ``ai_latency_s`` plus ``ai_page_latency_s`` per page of the
+    document it reads; a file without a type hint is read twice (classification, then
+    extraction). ``ai_parallelism`` models how many rows of a set-based statement
+    (PROCESS_BATCH files, PROCESS_CHUNKED_FILE chunks) the warehouse runs concurrently.
+    ``put_bytes_per_s`` is the app's upload link, shared by concurrent uploads (0 = latency only).
+    Processing a file in ``failing_files`` raises; PROCESS_BATCH writes the rest of its batch
+    first, like a batch that failed after its reuse or write stage.
+    """
+
+    def __init__(
+        self,
+        sql_latency_s: float = 0.005,
+        ai_latency_s: float = 0.2,
+        put_latency_s: float = 0.02,
+        get_latency_s: float = 0.02,
+        ai_parallelism: int = 8,
+        ai_page_latency_s: float = 0.0,
+        put_bytes_per_s: float = 0.0,
+    ) -> None:
+        self.sql_latency_s = sql_latency_s
+        self.ai_latency_s = ai_latency_s
+        self.put_latency_s = put_latency_s
+        self.get_latency_s = get_latency_s
+        self.ai_parallelism = max(1, ai_parallelism)
+        self.ai_page_latency_s = ai_page_latency_s
+        self.put_bytes_per_s = put_bytes_per_s
+        self._link_free_at = 0.0
+        self._page_counts: Dict[str, int] = {}
+        self.file = FakeFileOperation(self)
+        self.stage: Dict[str, bytes] = {}
+        self.doc_types: Dict[str, str] = {}
+        self.prompts: Dict[str, List[Tuple[str, str, int]]] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.uploaded_at: Dict[str, datetime] = {}
+        self.failing_files: set = set()
+        self.export_watermarks: List[Dict[str, Any]] = []
+        # RAW rows kept sorted ascending by (created_at, file_name) for keyset pages
+        self._raw_keys: List[Tuple[datetime, str]] = []
+        self._raw: List[Dict[str, Any]] = []
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    # --- Seeding ---
+    def add_doc_type(self, doc_type: str, description: str, fields: Sequence[Tuple[str, str]]) -> None:
+        self.doc_types[doc_type] = description
+        self.prompts[doc_type] = [(name, prompt, i + 1) for i, (name, prompt) in enumerate(fields)]
+
+    @staticmethod
+    def _make_record(
+        file_name: str,
+        document_type: str,
+        extract: Dict[str, Any],
+        created_at: datetime,
+        approved: bool = False,
+        validation_status: str = "DONE",
+        field_pages: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Any]:
+        return {
+            "FILE_NAME": file_name,
+            "FILE_URL": f"https://example.invalid/stage/{file_name}",
+            "DOCUMENT_TYPE": document_type,
+            "EXTRACT_JSON": json.dumps({"response": extract}),
+            "VALIDATION_JSON": json.dumps({"valid": True, "notes": "ok"}) if validation_status == "DONE" else None,
+            "VALIDATION_STATUS": validation_status,
+            "APPROVED": approved,
+            "APPROVED_AT": created_at if approved else None,
+            "CREATED_AT": created_at,
+            "FIELD_PAGES": json.dumps(field_pages) if field_pages else None,
+        }
+
+    def add_record(self, file_name: str, document_type: str, extract: Dict[str, Any], created_at: datetime, **kwargs: Any) -> None:
+        key = (created_at, file_name)
+        idx = bisect.bisect_left(self._raw_keys, key)
+        self._raw_keys.insert(idx, key)
+        self._raw.insert(idx, self._make_record(file_name, document_type, extract, created_at, **kwargs))
+
+    def seed_records(self, count: int, file_names: Sequence[str], start: Optional[datetime] = None) -> None:
+        """Replace RAW with ``count`` records cycling through types and the given stage files."""
+        self._raw_keys, self._raw = [], []
+        start = start or datetime(2025, 1, 1)
+        types = sorted(self.prompts) or ["NO_MATCH"]
+        # created_at increases with i, so appending keeps the (created_at, file_name) order
+        for i in range(count):
+            dtype = types[i % len(types)]
+            extract = {name: f"{name} value {i}" for name, _, _ in self.prompts.get(dtype, [])}
+            created = start + timedelta(seconds=i)
+            name = file_names[i % len(file_names)] if file_names else f"doc_{i}.pdf"
+            self._raw_keys.append((created, name))
+            self._raw.append(self._make_record(name, dtype, extract, created, approved=(i % 3 == 0)))
+
+    @property
+    def raw_count(self) -> int:
+        return len(self._raw)
+
+    # --- Snowpark surface ---
+    def sql(self, query: str) -> FakeDataFrame:
+        time.sleep(self.sql_latency_s)
+        with self._lock:
+            self.statements += 1
+        q = " ".join(query.split())
+        upper = q.upper()
+        if upper.startswith("CALL "):
+            return self._call(q, upper)
+        if "GET_PRESIGNED_URL" in upper:
+            return self._presign(q)
+        if "RECORD_FIELD_INDEX" in upper:
+            return self._search(q)
+        if "EXPORT_WATERMARKS" in upper:
+            return self._watermark(q, upper)
+        if upper.startswith("SELECT FILE_NAME, DOCUMENT_TYPE, CREATED_AT, APPROVED_AT"):
+            return self._export(q)
+        if upper.startswith("SELECT R.FILE_NAME, R.DOCUMENT_TYPE, R.CREATED_AT"):
+            return self._record_page(q)
+        if upper.startswith("SELECT R.FILE_URL, R.EXTRACT_JSON, R.VALIDATION_JSON"):
+            return self._record_detail(q)
+        if upper.startswith("SELECT VALIDATION_STATUS"):
+            return FakeDataFrame(["VALIDATION_STATUS"], [["DONE"]])
+        if upper.startswith("SELECT DOCUMENT_TYPE, DESCRIPTION FROM"):
+            return FakeDataFrame(["DOCUMENT_TYPE", "DESCRIPTION"], sorted(self.doc_types.items()))
+        if upper.startswith("SELECT DOCUMENT_TYPE FROM"):
+            return FakeDataFrame(["DOCUMENT_TYPE"], [[t] for t in sorted(self.doc_types)])
+        if upper.startswith("SELECT DESCRIPTION FROM"):
+            dtype = _literals(q)[0]
+            return FakeDataFrame(["DESCRIPTION"], [[self.doc_types[dtype]]] if dtype in self.doc_types else [])
+        if upper.startswith("SELECT FIELD_NAME, RETRIEVAL_PROMPT, SORT_ORDER"):
+            dtype = _literals(q)[0]
+            return FakeDataFrame(
+                ["FIELD_NAME", "RETRIEVAL_PROMPT", "SORT_ORDER", "VALUE_TYPE", "PATTERN", "MIN_VALUE", "MAX_VALUE", "REQUIRED"],
+                [(*p, None, None, None, None, False) for p in self.prompts.get(dtype, [])],
+            )
+        if upper.startswith("SELECT UPPER(AI_EXTRACT("):
+            # First-page classification from the Upload tab's pre-classifier
+            time.sleep(self._ai_waves([1]))
+            return FakeDataFrame(["DOCUMENT_TYPE"], [[sorted(self.prompts)[0] if self.prompts else "NO_MATCH"]])
+        if upper.startswith("SELECT REGEXP_LIKE("):
+            # Rule pattern check: Python's re stands in for Snowflake's POSIX ERE syntax check
+            for pattern in _literals(q)[1::2]:
+                try:
+                    re.compile(pattern.replace("\\\\", "\\"))
+                except re.error as e:
+                    raise RuntimeError(f"Invalid regular expression: '{pattern}', {e}") from e
+            return FakeDataFrame([f"C{i}" for i in range(upper.count("REGEXP_LIKE("))], [[False] * upper.count("REGEXP_LIKE(")])
+        if "HASH_AGG" in upper:
+            return self._metadata_markers()
+        if "PROCESSING_LOG" in upper:
+            # Procedures write the log server-side; the fake never runs them, so it stays empty
+            return FakeDataFrame(re.findall(r"\bAS (\w+)", q, re.IGNORECASE))
+        if upper.startswith("SELECT DISTINCT F.FILE_NAME"):
+            return self._written_since_upload(_literals(q))
+        if upper.startswith("SELECT COUNT(*)"):
+            return FakeDataFrame(["COUNT(*)"], [[0]])
+        if upper.startswith("MERGE INTO") and "FILE_FINGERPRINTS" in upper:
+            lits = _literals(q)
+            with self._lock:
+                self.fingerprints[lits[0]] = lits[1]
+                self.uploaded_at[lits[0]] = datetime.now()
+            return FakeDataFrame(["number of rows inserted"], [[1]])
+        # ALTER STAGE ... REFRESH, EXECUTE TASK and anything else the benchmarks do not model
+        return FakeDataFrame(["status"], [["Statement executed successfully."]])
+
+    # --- Transfer and AI cost model ---
+    def _transfer_wait(self, nbytes: int) -> float:
+        # Uploads queue for the one link: each waits for the bytes already in flight, then its own
+        if not self.put_bytes_per_s:
+            return 0.0
+        with self._lock:
+            now = time.perf_counter()
+            self._link_free_at = max(now, self._link_free_at) + nbytes / self.put_bytes_per_s
+            return self._link_free_at - now
+
+    def _page_count(self, file_name: str) -> int:
+        with self._lock:
+            data = self.stage.get(file_name.rsplit("/", 1)[-1])
+            cached = self._page_counts.get(file_name)
+        if cached is not None:
+            return cached
+        count = 1
+        if data is not None and file_name.lower().endswith(".pdf"):
+            import pypdfium2 as pdfium
+
+            pdf = pdfium.PdfDocument(data)
+            count = len(pdf)
+            pdf.close()
+        with self._lock:
+            self._page_counts[file_name] = count
+        return count
+
+    def _ai_waves(self, page_counts: Sequence[int]) -> float:
+        # Rows run ai_parallelism at a time; a wave lasts as long as its largest document
+        total = 0.0
+        for i in range(0, len(page_counts), self.ai_parallelism):
+            total += self.ai_latency_s + max(page_counts[i:i + self.ai_parallelism]) * self.ai_page_latency_s
+        return total
+
+    # --- Statement handlers ---
+    def _record_page(self, q: str) -> FakeDataFrame:
+        limit = int(re.search(r"LIMIT (\d+)", q, re.IGNORECASE).group(1))
+        dtype = re.search(r"document_type = " + _LITERAL, q)
+        want_type = _unquote(dtype.group(1)) if dtype else None
+        want_approved = True if "approved = TRUE" in q else False if "approved = FALSE" in q else None
+        cursor = re.search(r"r\.created_at < TO_TIMESTAMP_NTZ\(" + _LITERAL + r"\).*?r\.file_name < " + _LITERAL, q)
+        end = len(self._raw)
+        if cursor:
+            end = bisect.bisect_left(self._raw_keys, (datetime.fromisoformat(_unquote(cursor.group(1))), _unquote(cursor.group(2))))
+        out = []
+        for i in range(end - 1, -1, -1):
+            row = self._raw[i]
+            if want_type is not None and row["DOCUMENT_TYPE"] != want_type:
+                continue
+            if want_approved is not None and row["APPROVED"] != want_approved:
+                continue
+            valid = json.loads(row["VALIDATION_JSON"]).get("valid") if row["VALIDATION_STATUS"] == "DONE" else None
+            out.append([row["FILE_NAME"], row["DOCUMENT_TYPE"], row["CREATED_AT"], row["APPROVED"], row["VALIDATION_STATUS"], valid, row["FILE_URL"]])
+            if len(out) >= limit:
+                break
+        return FakeDataFrame(["FILE_NAME", "DOCUMENT_TYPE", "CREATED_AT", "APPROVED", "VALIDATION_STATUS", "VALIDATION_VALID", "FILE_URL"], out)
+
+    def _search(self, q: str) -> FakeDataFrame:
+        # Scans RAW instead of keeping an index; the SQL side reads RECORD_FIELD_INDEX
+        limit = int(re.search(r"LIMIT (\d+)", q, re.IGNORECASE).group(1))
+        pattern = _unquote(re.search(r"value_norm LIKE " + _LITERAL, q).group(1)).strip("%")
+        term = re.sub(r"!(.)", r"\1", pattern)
+        field = re.search(r"i\.field_name = " + _LITERAL, q)
+        want_field = _unquote(field.group(1)) if field else None
+        dtype = re.search(r"r\.document_type = " + _LITERAL, q)
+        want_type = _unquote(dtype.group(1)) if dtype else None
+        want_approved = True if "approved = TRUE" in q else False if "approved = FALSE" in q else None
+        out = []
+        for row in reversed(self._raw):
+            if want_type is not None and row["DOCUMENT_TYPE"] != want_type:
+                continue
+            if want_approved is not None and row["APPROVED"] != want_approved:
+                continue
+            extract = json.loads(row["EXTRACT_JSON"])
+            for name, value in sorted(extract.get("response", extract).items()):
+                text = ", ".join(map(str, value)) if isinstance(value, list) else str(value)
+                if (want_field is None or name == want_field) and term in text.strip().upper():
+                    valid = json.loads(row["VALIDATION_JSON"]).get("valid") if row["VALIDATION_STATUS"] == "DONE" else None
+                    out.append([row["FILE_NAME"], row["DOCUMENT_TYPE"], row["CREATED_AT"], row["APPROVED"], row["VALIDATION_STATUS"], valid, row["FILE_URL"], name, text])
+                    break
+            if len(out) >= limit:
+                break
+        return FakeDataFrame(
+            ["FILE_NAME", "DOCUMENT_TYPE", "CREATED_AT", "APPROVED", "VALIDATION_STATUS", "VALIDATION_VALID", "FILE_URL", "MATCHED_FIELD", "MATCHED_VALUE"],
+            out,
+        )
+
+    @staticmethod
+    def _presign(q: str) -> FakeDataFrame:
+        # S3-style query string, so the app can read the expiry back
+        expires = re.search(r", (\d+)\) AS URL", q, re.IGNORECASE)
+        signed_at = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        suffix = f"?X-Amz-Date={signed_at}&X-Amz-Expires={expires.group(1) if expires else 3600}"
+        names = json.loads(_literals(q)[-1]) if "FLATTEN" in q.upper() else [_literals(q)[-1]]
+        return FakeDataFrame(["FILE_NAME", "URL"], [[n, f"https://example.invalid/stage/{n}{suffix}"] for n in names])
+
+    def _metadata_markers(self) -> FakeDataFrame:
+        # Python hashes stand in for HASH_AGG; created_at is not tracked
+        with self._lock:
+            rows = [["doc_types", None, len(self.doc_types), None, hash(tuple(sorted(self.doc_types.items())))]]
+            rows += [["prompts", dtype, len(p), None, hash(tuple(p))] for dtype, p in self.prompts.items()]
+        return FakeDataFrame(["SCOPE", "DOCUMENT_TYPE", "ROW_COUNT", "CHANGED_AT", "DIGEST"], rows)
+
+    def _written_since_upload(self, file_names: Sequence[str]) -> FakeDataFrame:
+        with self._lock:
+            written = {
+                r["FILE_NAME"] for r in self._raw
+                if r["FILE_NAME"] in self.uploaded_at and r["CREATED_AT"] >= self.uploaded_at[r["FILE_NAME"]]
+            }
+        return FakeDataFrame(["FILE_NAME"], [[n] for n in file_names if n in written])
+
+    def _record_detail(self, q: str) -> FakeDataFrame:
+        file_name, created = _literals(q)[:2]
+        key = (datetime.fromisoformat(created), file_name)
+        idx = bisect.bisect_left(self._raw_keys, key)
+        rows = []
+        if idx < len(self._raw_keys) and self._raw_keys[idx] == key:
+            row = self._raw[idx]
+            rows.append([row["FILE_URL"], row["EXTRACT_JSON"], row["VALIDATION_JSON"], row["FIELD_PAGES"]])
+        return FakeDataFrame(["FILE_URL", "EXTRACT_JSON", "VALIDATION_JSON", "FIELD_PAGES"], rows)
+
+    def _process(self, file_names: Sequence[str], hints: Dict[str, str], chunk_pages: Sequence[int] = ()) -> None:
+        types = sorted(self.prompts)
+        with self._lock:
+            now = datetime.now()
+            for i, name in enumerate(file_names):
+                dtype = hints.get(name) or (types[i % len(types)] if types else "NO_MATCH")
+                fields = [field for field, _, _ in self.prompts.get(dtype, [])]
+                extract = {field: f"{field} of {name}" for field in fields}
+                # Chunked files: spread the answers over the chunks' first pages
+                pages = {field: chunk_pages[j % len(chunk_pages)] for j, field in enumerate(fields)} if chunk_pages else None
+                self.add_record(name, dtype, extract, now + timedelta(microseconds=i), validation_status="PENDING", field_pages=pages)
+
+    def _approve(self, items: List[Dict[str, Any]]) -> FakeDataFrame:
+        approved = 0
+        with self._lock:
+            for item in items:
+                key = (datetime.fromisoformat(item["created_at"]), item["file_name"])
+                idx = bisect.bisect_left(self._raw_keys, key)
+                if idx < len(self._raw_keys) and self._raw_keys[idx] == key:
+                    row = self._raw[idx]
+                    known = {f for f, _, _ in self.prompts.get(row["DOCUMENT_TYPE"], [])}
+                    fields = {k: v for k, v in (item.get("fields") or {}).items() if k in known}
+                    if fields:
+                        extract = json.loads(row["EXTRACT_JSON"])
+                        row["EXTRACT_JSON"] = json.dumps({**extract.get("response", extract), **fields})
+                    row["APPROVED"] = True
+                    row["APPROVED_AT"] = datetime.now()
+                    approved += 1
+        return FakeDataFrame(["APPROVE_RECORDS"], [[f"OK (approved {approved} record(s))"]])
+
+    def _approved_since(self, doc_type: str, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                r for r in self._raw
+                if r["APPROVED"] and r["DOCUMENT_TYPE"] == doc_type and (since is None or r["APPROVED_AT"] > since)
+            ]
+
+    def _last_watermark(self, export_name: str, doc_type: str) -> Optional[datetime]:
+        with self._lock:
+            marks = [w["approved_through"] for w in self.export_watermarks if (w["export_name"], w["document_type"]) == (export_name, doc_type)]
+        return max(marks) if marks else None
+
+    def _watermark(self, q: str, upper: str) -> FakeDataFrame:
+        import pandas as pd
+
+        lits = _literals(q)
+        if upper.startswith("INSERT"):
+            with self._lock:
+                self.export_watermarks.append({
+                    "export_name": lits[0], "document_type": lits[1],
+                    "approved_through": pd.Timestamp(lits[2]).to_pydatetime(), "location": lits[3],
+                })
+            return FakeDataFrame(["number of rows inserted"], [[1]])
+        # The SELECT's first literal is the TO_VARCHAR format
+        mark = self._last_watermark(lits[1], lits[2])
+        return FakeDataFrame(["WATERMARK"], [[mark.isoformat(sep=" ", timespec="microseconds") + "000" if mark else None]])
+
+    def _export(self, q: str) -> FakeDataFrame:
+        import pandas as pd
+
+        doc_type = _unquote(re.search(r"r\.document_type = " + _LITERAL, q).group(1))
+        since = re.search(r"approved_at > TO_TIMESTAMP_NTZ\(" + _LITERAL, q)
+        fields = [f.replace('""', '"') for f in re.findall(r'AS "((?:[^"]|"")*)"', q)]
+        out = []
+        for r in self._approved_since(doc_type, pd.Timestamp(since.group(1)).to_pydatetime() if since else None):
+            values = json.loads(r["EXTRACT_JSON"])
+            values = values.get("response", values)
+            row = [r["FILE_NAME"], r["DOCUMENT_TYPE"], r["CREATED_AT"], r["APPROVED_AT"]]
+            for f in fields:
+                v = values.get(f)
+                row.append(", ".join(map(str, v)) if isinstance(v, list) else None if v is None else str(v))
+            out.append(row)
+        return FakeDataFrame(["FILE_NAME", "DOCUMENT_TYPE", "CREATED_AT", "APPROVED_AT"], out, quoted=fields)
+
+    def _call(self, q: str, upper: str) -> FakeDataFrame:
+        if ".PROCESS_ONE_FILE(" in upper:
+            lits = _literals(q)
+            pages = [self._page_count(lits[0])]
+            classify = self._ai_waves(pages) if len(lits) < 2 else 0.0
+            time.sleep(classify + self._ai_waves(pages))
+            if lits[0] in self.failing_files:
+                raise RuntimeError(f"AI_EXTRACT failed for {lits[0]}")
+            self._process([lits[0]], {lits[0]: lits[1]} if len(lits) > 1 else {})
+            return FakeDataFrame(["PROCESS_ONE_FILE"], [["OK"]])
+        if ".PROCESS_BATCH(" in upper:
+            lits = _literals(q)
+            names = json.loads(lits[0])
+            hints = json.loads(lits[1]) if len(lits) > 1 else {}
+            unhinted = [self._page_count(n) for n in names if n not in hints]
+            classify = self._ai_waves(unhinted) if unhinted else 0.0
+            time.sleep(classify + self._ai_waves([self._page_count(n) for n in names]))
+            failed = [n for n in names if n in self.failing_files]
+            self._process([n for n in names if n not in failed], hints)
+            if failed:
+                raise RuntimeError(f"AI_EXTRACT failed for {failed[0]}")
+            return FakeDataFrame(["PROCESS_BATCH"], [[f"OK (processed {len(names)} file(s), reused 0)"]])
+        if ".PROCESS_CHUNKED_FILE(" in upper:
+            lits = _literals(q)
+            per_chunk, min_pages = map(int, re.search(r"PROCESS_CHUNKED_FILE\(" + _LITERAL + r", (\d+), (\d+)", q).groups()[1:])
+            total = self._page_count(lits[0])
+            hints = {lits[0]: lits[1]} if len(lits) > 1 else {}
+            if total < max(1, min_pages):
+                time.sleep((0.0 if hints else self._ai_waves([total])) + self._ai_waves([total]))
+                self._process([lits[0]], hints)
+                return FakeDataFrame(["PROCESS_CHUNKED_FILE"], [["OK"]])
+            # The split stays inside the warehouse (no upload bandwidth), then classification of
+            # the first chunk (unless pre-classified) and parallel chunk waves
+            firsts = list(range(1, total + 1, max(1, per_chunk)))
+            pages = [min(first + per_chunk - 1, total) - first + 1 for first in firsts]
+            split = self.put_latency_s * len(pages)
+            classify = 0.0 if hints else self._ai_waves(pages[:1])
+            time.sleep(split + classify + self._ai_waves(pages))
+            self._process([lits[0]], hints, firsts)
+            return FakeDataFrame(["PROCESS_CHUNKED_FILE"], [[f"OK ({len(pages)} chunk(s))"]])
+        if ".APPROVE_RECORDS(" in upper:
+            return self._approve(json.loads(_literals(q)[0]))
+        if ".EXPORT_APPROVED(" in upper:
+            doc_type, fmt, export_name = _literals(q)[:3]
+            rows = self._approved_since(doc_type, None if upper.rstrip(")").endswith("TRUE") else self._last_watermark(export_name, doc_type))
+            if not rows:
+                return FakeDataFrame(["EXPORT_APPROVED"], [["OK (exported 0 record(s))"]])
+            path = f"@EXPORT_STAGE/{doc_type}/{datetime.now():%Y%m%d_%H%M%S}/"
+            with self._lock:
+                self.export_watermarks.append({
+                    "export_name": export_name, "document_type": doc_type,
+                    "approved_through": max(r["APPROVED_AT"] for r in rows), "location": path,
+                })
+            return FakeDataFrame(["EXPORT_APPROVED"], [[f"OK (exported {len(rows)} record(s) to {path})"]])
+        if ".REPLACE_PROMPTS(" in upper:
+            return FakeDataFrame(["REPLACE_PROMPTS"], [[json.dumps({"version": 1, "added": [], "changed": [], "removed": []})]])
+        return FakeDataFrame(["STATUS"], [["OK"]])
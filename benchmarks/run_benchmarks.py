@@ -0,0 +1,433 @@
+"""Benchmarks for the app's hot paths against the in-memory FakeSession.
+
+The app script is imported in Streamlit's bare mode (no server), with
+``get_active_session()`` returning a FakeSession. Widgets return their defaults, so the
+module-level UI runs once on import and the benchmarks then call the app's own functions.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sql-latency-ms 40 --ai-latency-ms 800 --json bench.jsonl
+"""
+import argparse
+import importlib.util
+import io
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import types
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP_PATH = os.path.join(ROOT, "app", "streamlit_main.py")
+DOCS_DIR = os.path.join(ROOT, "extraction_documents")
+
+sys.path.insert(0, HERE)
+from fake_session import FakeSession  # noqa: E402
+
+# Field lists mirror the PERMIT / CONTRACTOR seeds in sql_scripts/demo_setup.sql
+SEED_TYPES = {
+    "PERMIT": ("Building Permit Request", [
+        "applicant_name", "company_name", "phone", "email", "project_address", "parcel_number",
+        "permit_types", "work_description", "estimated_cost", "contractor_license", "owner_name",
+        "affirmation", "has_signature", "signed_date", "approved_by", "has_seal",
+    ]),
+    "CONTRACTOR": ("Contractor License Application", [
+        "applicant_name", "business_name", "business_address", "city", "state", "zip", "phone",
+        "email", "license_types", "fein_ssn", "insurance_provider", "policy_number", "wc_yes",
+        "bonded", "years_experience", "reference_1", "reference_2", "reference_3", "affirmation",
+        "has_signature", "signed_date", "approved_by", "approved_date",
+    ]),
+}
+
+
+class UploadedFile(io.BytesIO):
+    """Minimal stand-in for Streamlit's UploadedFile: a named BytesIO."""
+
+    def __init__(self, name: str, data: bytes) -> None:
+        super().__init__(data)
+        self.name = name
+
+
+def summarize(name: str, samples: List[float], items_per_sample: int = 1, **extra: Any) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    total = sum(samples)
+    return {
+        "benchmark": name,
+        "runs": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p95_ms": p95 * 1000,
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "throughput_per_s": (len(samples) * items_per_sample / total) if total else float("inf"),
+        **extra,
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def load_documents() -> Dict[str, bytes]:
+    docs = {}
+    for name in sorted(os.listdir(DOCS_DIR)):
+        if name.lower().endswith(".pdf"):
+            with open(os.path.join(DOCS_DIR, name), "rb") as fh:
+                docs[name] = fh.read()
+    return docs
+
+
+def load_app(session: FakeSession) -> types.ModuleType:
+    """Import the Streamlit script with ``get_active_session`` returning ``session``."""
+    try:
+        import snowflake.snowpark.context as context  # type: ignore[import-not-found]
+    except ImportError:
+        context = types.ModuleType("snowflake.snowpark.context")
+        sys.modules.setdefault("snowflake", types.ModuleType("snowflake"))
+        sys.modules.setdefault("snowflake.snowpark", types.ModuleType("snowflake.snowpark"))
+        sys.modules["snowflake.snowpark.context"] = context
+    context.get_active_session = lambda: session  # type: ignore[attr-defined]
+
+    # Bare mode warns about the missing ScriptRunContext on every st.* call
+    logging.disable(logging.WARNING)
+    spec = importlib.util.spec_from_file_location("streamlit_main", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore[union-attr]
+    return module
+
+
+# --- Benchmarks ---
+def bench_extract_response_fields(app: types.ModuleType, repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for field_count in (16, 64):
+        payload = {"response": {f"field_{i}": (["a", "b", "c"] if i % 4 == 0 else f"value {i}") for i in range(field_count)}}
+        as_text = json.dumps(payload)
+        batch = 1000
+        for label, value in (("dict", payload), ("json", as_text)):
+            samples = timed(lambda: [app.extract_response_fields(value) for _ in range(batch)], repeat)
+            results.append(summarize(f"extract_response_fields[{label},{field_count} fields]", samples, batch, batch=batch))
+    return results
+
+
+def bench_record_loading(app: types.ModuleType, session: FakeSession, sizes: List[int], repeat: int, docs: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    results = []
+    versions = app.get_cache_versions()
+    for size in sizes:
+        session.seed_records(size, list(docs))
+
+        def cold_first_page() -> None:
+            versions.bump(("records", "*", "All"))
+            app.load_record_page("All", "All", None, app.records_version("All", "All"))
+
+        results.append(summarize(f"load_record_page[cold,{size} rows]", timed(cold_first_page, repeat), rows=size))
+
+        warm_version = app.records_version("All", "All")
+        app.load_record_page("All", "All", None, warm_version)
+        results.append(summarize(
+            f"load_record_page[warm,{size} rows]",
+            timed(lambda: app.load_record_page("All", "All", None, warm_version), repeat),
+            rows=size,
+        ))
+
+        def page_through(pages: int = 10) -> None:
+            versions.bump(("records", "*", "Not Approved"))
+            version = app.records_version("All", "Not Approved")
+            cursor = None
+            for _ in range(pages):
+                page = app.load_record_page("All", "Not Approved", cursor, version)
+                if len(page) <= app.REVIEW_PAGE_SIZE:
+                    break
+                last = page.iloc[app.REVIEW_PAGE_SIZE - 1]
+                cursor = (str(last["CREATED_AT"]), str(last["FILE_NAME"]))
+
+        results.append(summarize(f"load_record_page[10 pages,{size} rows]", timed(page_through, repeat), 10, rows=size))
+
+        first = app.load_record_page("All", "All", None, app.records_version("All", "All")).iloc[0]
+
+        def cold_detail() -> None:
+            versions.bump(("record", str(first["FILE_NAME"])))
+            app.load_record_detail(
+                str(first["FILE_NAME"]),
+                str(first["CREATED_AT"]),
+                (versions.get("record", str(first["FILE_NAME"])), versions.get("record_type", str(first["DOCUMENT_TYPE"]))),
+            )
+
+        results.append(summarize(f"load_record_detail[cold,{size} rows]", timed(cold_detail, repeat), rows=size))
+    return results
+
+
+def bench_render_preview(app: types.ModuleType, docs: Dict[str, bytes], repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for name, data in docs.items():
+        def reset() -> None:
+            app.get_page_cache.clear()
+
+        results.append(summarize(
+            f"render_document_preview[cold,{name}]",
+            timed(lambda: app.render_document_preview(name, None, data, name, scale=1.5), repeat, setup=reset),
+            bytes=len(data),
+        ))
+        app.render_document_preview(name, None, data, name, scale=1.5)
+        results.append(summarize(
+            f"render_document_preview[warm,{name}]",
+            timed(lambda: app.render_document_preview(name, None, data, name, scale=1.5), repeat),
+            bytes=len(data),
+        ))
+    return results
+
+
+def bench_presigned_urls(app: types.ModuleType, session: FakeSession, repeat: int) -> List[Dict[str, Any]]:
+    # One Review page of links: signed one query per record (the old per-selection lookup)
+    # versus one query for the page, and a rerun served from the resolver's cache
+    names = [f"doc_{i:03d}.pdf" for i in range(app.REVIEW_PAGE_SIZE)]
+    results = []
+    resolvers: List[Any] = []
+
+    def fresh() -> None:
+        resolvers.append(app.PresignedUrlResolver())
+
+    def count_statements(label: str, fn: Callable[[], Any], setup: Optional[Callable[[], None]]) -> None:
+        before = session.statements
+        samples = timed(fn, repeat, setup=setup)
+        results.append(summarize(label, samples, len(names), statements=(session.statements - before) // repeat))
+
+    count_statements("presigned_urls[per record,cold]", lambda: [resolvers[-1].resolve(session, [n]) for n in names], fresh)
+    count_statements("presigned_urls[page,cold]", lambda: resolvers[-1].resolve(session, names), fresh)
+    count_statements("presigned_urls[page,warm]", lambda: resolvers[-1].resolve(session, names), None)
+    return results
+
+
+def bench_export(app: types.ModuleType, session: FakeSession, sizes: List[int], repeat: int, docs: Dict[str, bytes]) -> List[Dict[str, Any]]:
+    results = []
+    doc_type = sorted(SEED_TYPES)[0]
+    fields = [name for name, _, _ in session.prompts[doc_type]]
+    for size in sizes:
+        session.seed_records(size, list(docs))
+        for fmt in ("parquet", "csv"):
+            exported: List[Dict[str, Any]] = []
+
+            def full() -> None:
+                exported.append(app.prepare_export_file(doc_type, fields, fmt))
+                os.remove(exported[-1]["path"])
+
+            samples = timed(full, repeat)
+            results.append(summarize(f"export[{fmt},full,{size} rows]", samples, exported[-1]["rows"], rows=exported[-1]["rows"], bytes=exported[-1]["bytes"]))
+        # Incremental: 1% of the type's records approved after the last export's watermark
+        since = exported[-1]["through"]
+        pending = [r for r in session._raw if r["DOCUMENT_TYPE"] == doc_type and not r["APPROVED"]]
+        app.approve_records([{"file_name": r["FILE_NAME"], "created_at": r["CREATED_AT"].isoformat()} for r in pending[: max(1, size // 100)]])
+
+        def incremental() -> None:
+            exported.append(app.prepare_export_file(doc_type, fields, "parquet", since))
+            os.remove(exported[-1]["path"])
+
+        samples = timed(incremental, repeat)
+        results.append(summarize(f"export[parquet,incremental,{size} rows]", samples, exported[-1]["rows"], rows=exported[-1]["rows"], bytes=exported[-1]["bytes"]))
+    return results
+
+
+def make_multipage_pdf(docs: Dict[str, bytes], pages: int) -> bytes:
+    """Concatenate the sample PDFs' pages until the document has ``pages`` pages."""
+    import pypdfium2 as pdfium
+
+    sources = [pdfium.PdfDocument(data) for data in docs.values()]
+    out = pdfium.PdfDocument.new()
+    try:
+        while len(out) < pages:
+            for src in sources:
+                if len(out) >= pages:
+                    break
+                out.import_pages(src, [0])
+        buf = io.BytesIO()
+        out.save(buf)
+        return buf.getvalue()
+    finally:
+        out.close()
+        for src in sources:
+            src.close()
+
+
+def bench_chunked_upload(app: types.ModuleType, docs: Dict[str, bytes], pages: int, file_count: int, repeat: int) -> List[Dict[str, Any]]:
+    # Chunking leaves the uploaded bytes unchanged, so the processing stage is reported on its own
+    # next to the end-to-end time. The shorter document sits below CHUNK_MIN_PAGES.
+    modes = [
+        ("whole file", None),
+        (f"chunked {app.CHUNK_PAGES} pages", (app.CHUNK_PAGES, app.CHUNK_MIN_PAGES)),
+        ("chunked 5 pages", (5, app.CHUNK_MIN_PAGES)),
+    ]
+    results = []
+    for doc_pages in (max(1, app.CHUNK_MIN_PAGES // 2), pages):
+        data = make_multipage_pdf(docs, doc_pages)
+        files = [UploadedFile(f"large_{doc_pages}p_{i:03d}.pdf", data) for i in range(file_count)]
+        for label, chunking in modes:
+            process_s: List[float] = []
+
+            def run() -> None:
+                rows = app.run_upload_pipeline(files, upload_workers=4, process_workers=4, max_attempts=1, chunking=chunking)
+                process_s.extend(r["process_s"] for r in rows if r["process_s"] is not None)
+
+            samples = timed(run, repeat)
+            results.append(summarize(f"upload_pipeline[{label},{file_count}x{doc_pages} pages]", samples, file_count, bytes=len(data)))
+            results.append(summarize(f"process_stage[{label},{doc_pages} pages]", process_s, min_pages=app.CHUNK_MIN_PAGES))
+    return results
+
+
+def make_scan_images(docs: Dict[str, bytes], dpi: int) -> Dict[str, bytes]:
+    """Render the sample PDFs' first pages as JPEG scans at ``dpi``."""
+    import pypdfium2 as pdfium
+
+    images = {}
+    for name, data in docs.items():
+        pdf = pdfium.PdfDocument(data)
+        try:
+            buf = io.BytesIO()
+            pdf[0].render(scale=dpi / 72).to_pil().save(buf, "JPEG", quality=92)
+            images[name.rsplit(".", 1)[0] + ".jpg"] = buf.getvalue()
+        finally:
+            pdf.close()
+    return images
+
+
+def bench_upload_preprocessing(app: types.ModuleType, session: FakeSession, docs: Dict[str, bytes], scan_dpi: int, file_count: int, repeat: int) -> List[Dict[str, Any]]:
+    images = list(make_scan_images(docs, scan_dpi).items())
+    files = [UploadedFile(f"scan_{i:03d}_{images[i % len(images)][0]}", images[i % len(images)][1]) for i in range(file_count)]
+    lock = app.get_page_cache().pdfium_lock
+    # The app's thresholds (UPLOAD_DOWNSAMPLE_MIN_BYTES, UPLOAD_DOWNSAMPLE_MIN_RATIO) against
+    # re-encoding every scan, to show where the CPU spent outweighs the upload time saved
+    min_mb = app.UPLOAD_DOWNSAMPLE_MIN_BYTES / (1024 * 1024)
+    threshold = f">={min_mb:g} MB and >={app.UPLOAD_DOWNSAMPLE_MIN_RATIO:g}x"
+    modes = [
+        ("original", None, 0, 0.0),
+        (f"downsampled 200 dpi, {threshold}", 200, app.UPLOAD_DOWNSAMPLE_MIN_BYTES, app.UPLOAD_DOWNSAMPLE_MIN_RATIO),
+        (f"downsampled 150 dpi, {threshold}", 150, app.UPLOAD_DOWNSAMPLE_MIN_BYTES, app.UPLOAD_DOWNSAMPLE_MIN_RATIO),
+        ("downsampled 200 dpi, every scan", 200, 0, 0.0),
+        ("downsampled 150 dpi, every scan", 150, 0, 0.0),
+    ]
+    results = []
+    for label, max_dpi, min_bytes, min_ratio in modes:
+        preprocess = app.make_upload_preprocessor(lock, max_dpi, False, min_bytes, min_ratio) if max_dpi else None
+        samples = timed(lambda: app.run_upload_pipeline(files, upload_workers=4, process_workers=4, max_attempts=1, preprocess=preprocess), repeat)
+        staged = sum(len(session.stage[f.name]) for f in files)
+        results.append(summarize(
+            f"upload_pipeline[{label},{file_count} scans @{scan_dpi} dpi]", samples, file_count,
+            staged_bytes=staged, min_image_bytes=min_bytes, min_image_ratio=min_ratio,
+        ))
+    return results
+
+
+def bench_upload_pipeline(app: types.ModuleType, session: FakeSession, docs: Dict[str, bytes], file_count: int, repeat: int) -> List[Dict[str, Any]]:
+    sources = list(docs.items())
+    files = [
+        UploadedFile(f"bench_{i:04d}_{sources[i % len(sources)][0]}", sources[i % len(sources)][1])
+        for i in range(file_count)
+    ]
+    modes = [
+        ("serial", dict(upload_workers=1, process_workers=1, batch_size=1)),
+        ("pipelined 4x4", dict(upload_workers=4, process_workers=4, batch_size=1)),
+        ("pipelined 8x8", dict(upload_workers=8, process_workers=8, batch_size=1)),
+        ("batched 4x2, 8/batch", dict(upload_workers=4, process_workers=2, batch_size=8)),
+    ]
+    results = []
+    for label, kwargs in modes:
+        failures: List[int] = []
+
+        def run() -> None:
+            rows = app.run_upload_pipeline(files, max_attempts=1, **kwargs)
+            failures.append(sum(1 for r in rows if r["status"] != "done"))
+
+        samples = timed(run, repeat)
+        results.append(summarize(f"upload_pipeline[{label},{file_count} files]", samples, file_count, failed=sum(failures)))
+    return results
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    width = max(len(r["benchmark"]) for r in results)
+    header = f"{'benchmark':<{width}}  {'runs':>4}  {'mean ms':>10}  {'p50 ms':>10}  {'p95 ms':>10}  {'items/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['benchmark']:<{width}}  {r['runs']:>4}  {r['mean_ms']:>10.2f}  {r['p50_ms']:>10.2f}  "
+            f"{r['p95_ms']:>10.2f}  {r['throughput_per_s']:>10.1f}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sql-latency-ms", type=float, default=5.0, help="Latency added to every session.sql() call")
+    parser.add_argument("--ai-latency-ms", type=float, default=200.0, help="Latency of one PROCESS_ONE_FILE (AI_EXTRACT) call")
+    parser.add_argument("--ai-page-latency-ms", type=float, default=25.0, help="Extra AI_EXTRACT latency per document page")
+    parser.add_argument("--stage-latency-ms", type=float, default=20.0, help="Latency of put_stream/get_stream")
+    parser.add_argument("--stage-mbps", type=float, default=100.0, help="Upload bandwidth of put_stream in megabits per second (0 = unlimited)")
+    parser.add_argument("--ai-parallelism", type=int, default=8, help="Rows of a PROCESS_BATCH processed concurrently")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="RAW row counts for record loading")
+    parser.add_argument("--upload-files", type=int, default=24, help="Files per upload pipeline run")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per benchmark")
+    parser.add_argument("--chunk-doc-pages", type=int, default=40, help="Pages per synthetic PDF in the chunked upload benchmark")
+    parser.add_argument("--scan-dpi", type=int, default=400, help="Resolution of the synthetic JPEG scans in the preprocessing benchmark")
+    parser.add_argument("--only", default="", help="Comma-separated subset: parse,records,urls,render,upload,chunked,preprocess,export")
+    parser.add_argument("--json", dest="json_path", help="Append results as JSON lines to this file")
+    args = parser.parse_args(argv)
+
+    session = FakeSession(
+        sql_latency_s=args.sql_latency_ms / 1000,
+        ai_latency_s=args.ai_latency_ms / 1000,
+        put_latency_s=args.stage_latency_ms / 1000,
+        get_latency_s=args.stage_latency_ms / 1000,
+        ai_parallelism=args.ai_parallelism,
+        ai_page_latency_s=args.ai_page_latency_ms / 1000,
+        put_bytes_per_s=args.stage_mbps * 1_000_000 / 8,
+    )
+    for dtype, (description, fields) in SEED_TYPES.items():
+        session.add_doc_type(dtype, description, [(f, f.replace("_", " ").capitalize()) for f in fields])
+    docs = load_documents()
+    session.stage.update(docs)
+    # The script renders the Review tab on import, so it needs at least one record
+    session.seed_records(10, list(docs))
+
+    app = load_app(session)
+    selected = {s.strip() for s in args.only.split(",") if s.strip()} or {"parse", "records", "urls", "render", "upload", "chunked", "preprocess", "export"}
+    results: List[Dict[str, Any]] = []
+    if "parse" in selected:
+        results += bench_extract_response_fields(app, args.repeat)
+    if "records" in selected:
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+        results += bench_record_loading(app, session, sizes, args.repeat, docs)
+    if "urls" in selected:
+        results += bench_presigned_urls(app, session, args.repeat)
+    if "export" in selected:
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+        results += bench_export(app, session, sizes, args.repeat, docs)
+    if "render" in selected:
+        results += bench_render_preview(app, docs, args.repeat)
+    if "upload" in selected:
+        results += bench_upload_pipeline(app, session, docs, args.upload_files, max(1, min(args.repeat, 3)))
+    if "chunked" in selected:
+        results += bench_chunked_upload(app, docs, args.chunk_doc_pages, 4, max(1, min(args.repeat, 3)))
+    if "preprocess" in selected:
+        results += bench_upload_preprocessing(app, session, docs, args.scan_dpi, 12, max(1, min(args.repeat, 3)))
+
+    print_table(results)
+    if args.json_path:
+        stamp = datetime.now().isoformat(timespec="seconds")
+        with open(args.json_path, "a", encoding="utf-8") as fh:
+            for r in results:
+                fh.write(json.dumps({"run_at": stamp, **r}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
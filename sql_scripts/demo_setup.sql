@@ -13,6 +13,9 @@ CREATE OR REPLACE API INTEGRATION git_sfc_gh_nrinard_api_integration
     API_ALLOWED_PREFIXES = ('https://github.com/sfc-gh-nrinard')
     ENABLED = TRUE;
 
+-- Lets SYSADMIN resume and run the tasks created below (VALIDATE_PENDING_TASK and the app's EXECUTE TASK)
+GRANT EXECUTE TASK ON ACCOUNT TO ROLE SYSADMIN;
+
 use role sysadmin;
 -- Create Git repository integration for the public demo repository
 CREATE OR REPLACE GIT REPOSITORY AI_EXTRACT_PUBLIC
@@ -34,6 +37,12 @@ COMMENT = 'Internal stage for data files'
 
  CREATE OR REPLACE STREAM DOCS_ROUTER_STREAM ON STAGE DOCS_ROUTER_STAGE;
 
+-- Columnar exports of approved records (kept apart from DOCS_ROUTER_STAGE, whose stream feeds processing)
+CREATE OR REPLACE STAGE EXPORT_STAGE
+COMMENT = 'Parquet/CSV unloads written by EXPORT_APPROVED'
+  DIRECTORY = (ENABLE = TRUE)
+  ENCRYPTION = (TYPE = 'SNOWFLAKE_SSE');
+
 -- Single RAW table capturing classification and extracted JSON
 CREATE OR REPLACE TABLE RAW (
   file_name          VARCHAR,
@@ -41,11 +50,81 @@ CREATE OR REPLACE TABLE RAW (
   document_type      VARCHAR,       -- dynamic, from DOC_TYPES or 'NO_MATCH'
   extract_json       VARIANT,       -- raw AI_EXTRACT result
   validation_json    VARIANT,       -- tier-1 AI_COMPLETE validation result
+  validation_status  VARCHAR DEFAULT 'PENDING',  -- PENDING until VALIDATE_PENDING runs; DONE or SKIPPED
+  validated_at       TIMESTAMP_NTZ,
   approved           BOOLEAN DEFAULT FALSE,
   approved_at        TIMESTAMP_NTZ,
+  content_hash       VARCHAR,       -- SHA-256 of the staged bytes (from FILE_FINGERPRINTS)
+  prompt_hash        VARCHAR,       -- PROMPT_SET_HASHES value the extraction was produced with
+  field_pages        VARIANT,       -- chunked extraction only: {field: first page of the chunk that answered it}
   created_at         TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
 
+-- Inserts into RAW arm VALIDATE_PENDING_TASK (validation runs asynchronously from extraction)
+CREATE OR REPLACE STREAM RAW_VALIDATION_STREAM ON TABLE RAW APPEND_ONLY = TRUE;
+
+-- One row per VALIDATE_PENDING run
+CREATE OR REPLACE TABLE VALIDATION_RUNS (
+  started_at         TIMESTAMP_NTZ,
+  new_rows           NUMBER(38,0),
+  validated          NUMBER(38,0),
+  rule_validated     NUMBER(38,0),  -- of validated, records passed by rules without AI_COMPLETE
+  finished_at        TIMESTAMP_NTZ
+);
+
+-- Content fingerprints recorded by the app at upload time (one row per staged file)
+CREATE OR REPLACE TABLE FILE_FINGERPRINTS (
+  file_name          VARCHAR,
+  content_hash       VARCHAR,
+  file_size          NUMBER(38,0),
+  page_count         NUMBER(38,0),  -- 1 for images; NULL when the app could not open the file
+  uploaded_at        TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- Per-file, per-stage timings written by the processing procedures and VALIDATE_PENDING
+-- (through LOG_PROCESSING_STAGES). Set-based stages run for several files at once: each file
+-- gets the stage's wall time, and batch_files says how many files shared it. Stage 'total'
+-- spans the whole procedure call. Failures inside DRAIN_INGEST_QUEUE's per-file retry
+-- transactions are rolled back with them; INGEST_QUEUE.last_error keeps those.
+CREATE OR REPLACE TABLE PROCESSING_LOG (
+  run_id             VARCHAR,        -- one procedure call
+  procedure_name     VARCHAR,
+  file_name          VARCHAR,
+  document_type      VARCHAR,
+  stage              VARCHAR,        -- reuse, split, classify, extract, write, total, validate_rules, validate_ai
+  started_at         TIMESTAMP_NTZ,
+  finished_at        TIMESTAMP_NTZ,
+  duration_ms        NUMBER(38,0),
+  batch_files        NUMBER(38,0),
+  page_count         NUMBER(38,0),   -- from FILE_FINGERPRINTS (app uploads) or the chunk list
+  field_count        NUMBER(38,0),   -- prompts configured for the document type
+  file_size          NUMBER(38,0),   -- bytes
+  outcome            VARCHAR,        -- OK, REUSED, NO_MATCH, NO_PROMPTS, VALID, INVALID, SKIPPED or ERROR
+  error              VARCHAR
+);
+
+-- Per-file working rows of one PROCESS_BATCH call (keyed by run_id): each stage is a set-based
+-- statement over these rows, so extract results never pass through scripting variables.
+-- Rows are deleted when the call ends.
+CREATE OR REPLACE TRANSIENT TABLE PROCESS_BATCH_WORK (
+  run_id             VARCHAR,
+  file_name          VARCHAR,
+  document_type      VARCHAR,
+  classified         BOOLEAN,        -- FALSE when the app passed a pre-classified type
+  outcome            VARCHAR,        -- OK, NO_MATCH or NO_PROMPTS
+  extract_json       VARIANT
+);
+
+-- Stage files taken off DOCS_ROUTER_STREAM by PROCESS_RAW and not yet processed. Files of a
+-- failed batch stay here (with last_error) and are picked up again by the next call.
+CREATE OR REPLACE TRANSIENT TABLE PROCESS_RAW_WORK (
+  file_name          VARCHAR,
+  queued_at          TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+  claimed_by         VARCHAR,        -- run id of the PROCESS_RAW call that last tried the file
+  claimed_at         TIMESTAMP_NTZ,
+  last_error         VARCHAR
+);
+
 -- Dynamic document types registry
 CREATE OR REPLACE TABLE DOC_TYPES (
   document_type   VARCHAR,
@@ -53,37 +132,349 @@ CREATE OR REPLACE TABLE DOC_TYPES (
   created_at      TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
 
--- Prompts per document type (drives AI_EXTRACT responseFormat)
+-- Prompts per document type (drives AI_EXTRACT responseFormat).
+-- The optional rule columns drive the deterministic pre-validation in VALIDATE_PENDING: a record
+-- whose every rule-checked field passes is marked valid without an AI_COMPLETE call. Rules are not
+-- part of PROMPT_SET_HASHES, so editing them never invalidates extractions.
 CREATE OR REPLACE TABLE DOC_TYPE_PROMPTS (
   document_type     VARCHAR,
   field_name        VARCHAR,
   retrieval_prompt  VARCHAR,
   sort_order        NUMBER(38,0) DEFAULT 0,
+  value_type        VARCHAR,        -- NULL/'string', 'number', 'integer', 'boolean', 'date', 'email', 'phone', 'zip'
+  pattern           VARCHAR,        -- regular expression the whole value must match
+  min_value         NUMBER(38,4),   -- numeric range, inclusive
+  max_value         NUMBER(38,4),
+  required          BOOLEAN DEFAULT FALSE,
+  created_at        TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- Every distinct prompt set saved per document type, with the per-field diff against the
+-- previous version. RAW.prompt_hash points at the version a record was extracted with.
+CREATE OR REPLACE TABLE DOC_TYPE_PROMPT_VERSIONS (
+  document_type     VARCHAR,
+  version           NUMBER(38,0),
+  prompt_hash       VARCHAR,       -- same value PROMPT_SET_HASHES reports for this prompt set
+  prompts           VARIANT,       -- [[field_name, retrieval_prompt], ...] in sort order
+  diff              VARIANT,       -- {"added": [...], "changed": [...], "removed": [...]}
   created_at        TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
 );
 
+-- Flattened extracted values for search, one row per (record, field). Kept in step with
+-- RAW.extract_json by INDEX_RECORD_FIELDS, which every procedure writing extract_json calls.
+-- On Enterprise Edition, large backlogs can add:
+--   ALTER TABLE RECORD_FIELD_INDEX ADD SEARCH OPTIMIZATION ON SUBSTRING(value_norm);
+CREATE OR REPLACE TABLE RECORD_FIELD_INDEX (
+  file_name         VARCHAR,
+  created_at        TIMESTAMP_NTZ,  -- RAW.created_at of the indexed row
+  document_type     VARCHAR,
+  field_name        VARCHAR,
+  field_value       VARCHAR,        -- arrays joined with ', ' as in the Review editor
+  value_norm        VARCHAR         -- UPPER(TRIM(field_value)); searches match on this
+);
+
+-- One row per export run. The next incremental run for the same (export_name, document_type)
+-- only reads records approved after MAX(approved_through), so nightly exports skip older rows.
+CREATE OR REPLACE TABLE EXPORT_WATERMARKS (
+  export_name       VARCHAR,        -- 'stage' for EXPORT_APPROVED unloads, 'app_download' for app downloads
+  document_type     VARCHAR,
+  approved_through  TIMESTAMP_NTZ,  -- greatest RAW.approved_at included in the run
+  rows_exported     NUMBER(38,0),
+  location          VARCHAR,        -- stage path or downloaded file name
+  exported_at       TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- Fingerprint of the inputs that determine a result: the prompt set per document type,
+-- and the list of known types for NO_MATCH classifications.
+-- A prior RAW row is reusable for identical bytes only while its prompt_hash still matches.
+CREATE OR REPLACE VIEW PROMPT_SET_HASHES AS
+SELECT document_type,
+       SHA2(TO_JSON(ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name))) AS prompt_hash
+FROM DOC_TYPE_PROMPTS
+GROUP BY document_type
+UNION ALL
+SELECT 'NO_MATCH',
+       SHA2(COALESCE(LISTAGG(document_type, ', ') WITHIN GROUP (ORDER BY document_type), ''))
+FROM DOC_TYPES;
+
+-- Latest result per content hash that is still valid for the current prompt set, i.e. one
+-- that REUSE_PRIOR_RESULTS may copy for a file with the same bytes
+CREATE OR REPLACE VIEW REUSABLE_RESULTS AS
+SELECT r.content_hash,
+       r.document_type,
+       r.extract_json,
+       r.validation_json,
+       r.validation_status,
+       r.validated_at,
+       r.prompt_hash,
+       r.field_pages
+FROM RAW r
+JOIN PROMPT_SET_HASHES h
+  ON h.document_type = r.document_type
+ AND h.prompt_hash = r.prompt_hash
+WHERE r.content_hash IS NOT NULL
+QUALIFY ROW_NUMBER() OVER (PARTITION BY r.content_hash ORDER BY r.created_at DESC) = 1;
+
+-- AI_EXTRACT responseFormat of the classification pass, over the current DOC_TYPES list
+CREATE OR REPLACE VIEW CLASSIFICATION_PROMPT AS
+SELECT ARRAY_CONSTRUCT(ARRAY_CONSTRUCT(
+         'document_type',
+         'Select the best matching document type from this list: '
+           || COALESCE(LISTAGG(document_type, ', ') WITHIN GROUP (ORDER BY document_type), '')
+           || '. If none match, return NO_MATCH. Return only the label.'
+       )) AS response_format
+FROM DOC_TYPES;
+
+-- Deterministic rule checks for records awaiting validation: one row per PENDING record whose
+-- document type declares at least one rule. failures lists {field, rule, value} for every broken
+-- rule; an empty array means VALIDATE_PENDING can mark the record valid without AI_COMPLETE.
+-- Values of 'None', 'NULL' and 'N/A' count as missing, so they only fail 'required' rules.
+CREATE OR REPLACE VIEW VALIDATION_RULE_RESULTS AS
+SELECT file_name,
+       created_at,
+       COUNT(*) AS checked,
+       ARRAY_AGG(IFF(failed_rule IS NULL, NULL,
+                     OBJECT_CONSTRUCT('field', field_name, 'rule', failed_rule, 'value', val))) AS failures
+FROM (
+  SELECT r.file_name,
+         r.created_at,
+         p.field_name,
+         GET(COALESCE(r.extract_json:response, r.extract_json), p.field_name) AS x,
+         TRIM(IFF(IS_ARRAY(x), ARRAY_TO_STRING(x, ', '), x::STRING)) AS val,
+         TRY_TO_DOUBLE(REGEXP_REPLACE(val, '[$, ]', '')) AS num,
+         CASE
+           WHEN val IS NULL OR val = '' OR UPPER(val) IN ('NONE', 'NULL', 'N/A') THEN IFF(p.required, 'required', NULL)
+           WHEN p.value_type = 'number' AND num IS NULL THEN 'number'
+           WHEN p.value_type = 'integer' AND (num IS NULL OR num <> ROUND(num)) THEN 'integer'
+           WHEN p.value_type = 'boolean' AND TRY_TO_BOOLEAN(val) IS NULL THEN 'boolean'
+           WHEN p.value_type = 'date'
+                AND COALESCE(TRY_TO_DATE(val), TRY_TO_DATE(val, 'MM/DD/YYYY'), TRY_TO_DATE(val, 'MM-DD-YYYY'),
+                             TRY_TO_DATE(val, 'MMMM DD, YYYY'), TRY_TO_DATE(val, 'MON DD, YYYY')) IS NULL THEN 'date'
+           WHEN p.value_type = 'email' AND NOT REGEXP_LIKE(val, '[^@ ]+@[^@ ]+[.][A-Za-z]{2,}') THEN 'email'
+           WHEN p.value_type = 'phone'
+                AND NOT (REGEXP_LIKE(val, '[0-9()+. -]+') AND REGEXP_LIKE(REGEXP_REPLACE(val, '[^0-9]', ''), '1?[0-9]{10}')) THEN 'phone'
+           WHEN p.value_type = 'zip' AND NOT REGEXP_LIKE(val, '[0-9]{5}(-[0-9]{4})?') THEN 'zip'
+           WHEN p.pattern IS NOT NULL AND NOT REGEXP_LIKE(val, p.pattern) THEN 'pattern'
+           WHEN p.min_value IS NOT NULL AND (num IS NULL OR num < p.min_value) THEN 'min'
+           WHEN p.max_value IS NOT NULL AND (num IS NULL OR num > p.max_value) THEN 'max'
+         END AS failed_rule
+  FROM RAW r
+  JOIN DOC_TYPE_PROMPTS p ON p.document_type = r.document_type
+  WHERE r.validation_status = 'PENDING'
+    AND (COALESCE(p.value_type, 'string') <> 'string'
+         OR p.pattern IS NOT NULL
+         OR p.min_value IS NOT NULL
+         OR p.max_value IS NOT NULL
+         OR p.required)
+)
+GROUP BY file_name, created_at;
 
 
 
-CREATE OR REPLACE PROCEDURE PROCESS_RAW()
+-- Rebuilds RECORD_FIELD_INDEX rows for every RAW row of the given file names
+CREATE OR REPLACE PROCEDURE INDEX_RECORD_FIELDS(p_file_names VARIANT)
 RETURNS STRING
 LANGUAGE SQL
 AS $$
+BEGIN
+  IF (p_file_names IS NULL OR ARRAY_SIZE(p_file_names) = 0) THEN
+    RETURN 'OK (indexed 0 value(s))';
+  END IF;
+
+  -- IN over the flattened list lets both statements prune on file_name; ARRAY_CONTAINS would
+  -- evaluate the array against every row
+  DELETE FROM RECORD_FIELD_INDEX
+  WHERE file_name IN (SELECT value::STRING FROM TABLE(FLATTEN(input => :p_file_names)));
+
+  INSERT INTO RECORD_FIELD_INDEX (file_name, created_at, document_type, field_name, field_value, value_norm)
+  SELECT file_name, created_at, document_type, field_name, field_value, UPPER(TRIM(field_value))
+  FROM (
+    SELECT r.file_name,
+           r.created_at,
+           r.document_type,
+           f.key AS field_name,
+           IFF(IS_ARRAY(f.value), ARRAY_TO_STRING(f.value, ', '), f.value::STRING) AS field_value
+    FROM RAW r,
+         LATERAL FLATTEN(input => COALESCE(r.extract_json:response, r.extract_json)) f
+    WHERE r.file_name IN (SELECT value::STRING FROM TABLE(FLATTEN(input => :p_file_names)))
+  )
+  WHERE field_value IS NOT NULL
+    AND TRIM(field_value) <> '';
+  RETURN CONCAT('OK (indexed ', SQLROWCOUNT, ' value(s))');
+END;
+$$;
+
+-- Reuse step shared by PROCESS_ONE_FILE, PROCESS_BATCH and PROCESS_CHUNKED_FILE: copies the
+-- REUSABLE_RESULTS row of every listed file whose bytes were processed before, indexes it,
+-- and returns those files. They need no AI calls.
+CREATE OR REPLACE PROCEDURE REUSE_PRIOR_RESULTS(p_file_names ARRAY)
+RETURNS ARRAY
+LANGUAGE SQL
+AS $$
 DECLARE
-  v_count NUMBER := 0;
-  v_file_name STRING;
-  c CURSOR FOR
-    SELECT RELATIVE_PATH AS file_name
-    FROM DOCS_ROUTER_STREAM
-    WHERE METADATA$ACTION = 'INSERT';
+  v_reused ARRAY;
 BEGIN
-  FOR rec IN c DO
-    v_file_name := rec.file_name;
-    CALL PROCESS_ONE_FILE(:v_file_name);
-    v_count := v_count + 1;
-  END FOR;
+  SELECT ARRAY_AGG(f.file_name) INTO :v_reused
+  FROM FILE_FINGERPRINTS f
+  JOIN REUSABLE_RESULTS u ON u.content_hash = f.content_hash
+  WHERE f.file_name IN (SELECT value::STRING FROM TABLE(FLATTEN(input => :p_file_names)));
+  IF (v_reused IS NULL OR ARRAY_SIZE(v_reused) = 0) THEN
+    RETURN ARRAY_CONSTRUCT();
+  END IF;
+
+  INSERT INTO RAW (file_name, file_url, document_type, extract_json, validation_json, validation_status, validated_at, content_hash, prompt_hash, field_pages)
+  SELECT f.file_name,
+         GET_PRESIGNED_URL('@DOCS_ROUTER_STAGE', f.file_name),
+         u.document_type,
+         u.extract_json,
+         u.validation_json,
+         u.validation_status,
+         u.validated_at,
+         u.content_hash,
+         u.prompt_hash,
+         u.field_pages
+  FROM FILE_FINGERPRINTS f
+  JOIN REUSABLE_RESULTS u ON u.content_hash = f.content_hash
+  WHERE f.file_name IN (SELECT value::STRING FROM TABLE(FLATTEN(input => :v_reused)));
 
-  RETURN CONCAT('OK (processed ', v_count, ' file(s))');
+  CALL INDEX_RECORD_FIELDS(:v_reused);
+  RETURN v_reused;
+END;
+$$;
+
+
+-- Writes PROCESSING_LOG rows for one procedure call. p_stages is an array of
+-- {"stage", "started_at", "finished_at", "files": [...], "outcome", "outcomes": {file: outcome}, "error"};
+-- p_types / p_pages optionally map file_name -> document type / page count where RAW and
+-- FILE_FINGERPRINTS do not know them (failed runs, chunked files). Never fails the caller.
+CREATE OR REPLACE PROCEDURE LOG_PROCESSING_STAGES(p_run_id VARCHAR, p_procedure VARCHAR, p_stages ARRAY, p_types VARIANT DEFAULT NULL, p_pages VARIANT DEFAULT NULL)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+BEGIN
+  INSERT INTO PROCESSING_LOG (run_id, procedure_name, file_name, document_type, stage, started_at, finished_at,
+                              duration_ms, batch_files, page_count, field_count, file_size, outcome, error)
+  WITH stage_files AS (
+    SELECT s.value AS st, f.value::STRING AS file_name
+    FROM TABLE(FLATTEN(input => :p_stages)) s,
+         LATERAL FLATTEN(input => s.value:files) f
+  ),
+  latest AS (
+    SELECT r.file_name, r.document_type
+    FROM RAW r
+    WHERE r.file_name IN (SELECT file_name FROM stage_files)
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY r.file_name ORDER BY r.created_at DESC) = 1
+  ),
+  typed AS (
+    SELECT x.st, x.file_name, COALESCE(GET(:p_types, x.file_name)::STRING, l.document_type) AS document_type
+    FROM stage_files x
+    LEFT JOIN latest l ON l.file_name = x.file_name
+  )
+  SELECT :p_run_id,
+         :p_procedure,
+         t.file_name,
+         t.document_type,
+         t.st:stage::STRING,
+         t.st:started_at::TIMESTAMP_NTZ,
+         t.st:finished_at::TIMESTAMP_NTZ,
+         DATEDIFF('millisecond', t.st:started_at::TIMESTAMP_NTZ, t.st:finished_at::TIMESTAMP_NTZ),
+         ARRAY_SIZE(t.st:files),
+         COALESCE(GET(:p_pages, t.file_name)::NUMBER, fp.page_count),
+         COALESCE(pc.field_count, 0),
+         COALESCE(fp.file_size, d.size),
+         COALESCE(GET(t.st:outcomes, t.file_name)::STRING, t.st:outcome::STRING, 'OK'),
+         t.st:error::STRING
+  FROM typed t
+  LEFT JOIN FILE_FINGERPRINTS fp ON fp.file_name = t.file_name
+  LEFT JOIN (
+    SELECT document_type, COUNT(*) AS field_count
+    FROM DOC_TYPE_PROMPTS
+    GROUP BY document_type
+  ) pc ON pc.document_type = t.document_type
+  LEFT JOIN DIRECTORY(@DOCS_ROUTER_STAGE) d ON d.relative_path = t.file_name;
+  RETURN CONCAT('OK (logged ', SQLROWCOUNT, ' row(s))');
+EXCEPTION
+  WHEN OTHER THEN
+    RETURN CONCAT('LOG FAILED: ', SQLERRM);
+END;
+$$;
+
+-- Manual catch-up for files on DOCS_ROUTER_STAGE: takes the stream's new files into
+-- PROCESS_RAW_WORK and hands them to PROCESS_BATCH p_batch_size at a time, so one bad file
+-- only fails its own batch.
+CREATE OR REPLACE PROCEDURE PROCESS_RAW(p_batch_size NUMBER DEFAULT 10)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_run_id STRING := UUID_STRING();
+  v_claimed TIMESTAMP_NTZ;
+  v_batch VARIANT;
+  v_written VARIANT;
+  v_result STRING;
+  v_error STRING;
+  v_queued NUMBER;
+  v_batches NUMBER := 0;
+  v_done NUMBER := 0;
+  v_failed NUMBER := 0;
+BEGIN
+  -- Reading the stream in a DML statement advances its offset, so each file is taken once
+  INSERT INTO PROCESS_RAW_WORK (file_name)
+  SELECT DISTINCT s.RELATIVE_PATH
+  FROM DOCS_ROUTER_STREAM s
+  WHERE s.METADATA$ACTION = 'INSERT'
+    AND NOT STARTSWITH(s.RELATIVE_PATH, '_chunks/')  -- page chunks of PROCESS_CHUNKED_FILE
+    AND NOT EXISTS (SELECT 1 FROM PROCESS_RAW_WORK w WHERE w.file_name = s.RELATIVE_PATH);
+
+  SELECT COUNT(*) INTO :v_queued FROM PROCESS_RAW_WORK;
+  IF (v_queued = 0) THEN
+    RETURN 'OK (processed 0 file(s))';
+  END IF;
+
+  LOOP
+    -- Each file is tried at most once per call
+    v_claimed := CURRENT_TIMESTAMP();
+    UPDATE PROCESS_RAW_WORK
+    SET claimed_by = :v_run_id, claimed_at = :v_claimed
+    WHERE file_name IN (
+      SELECT file_name
+      FROM PROCESS_RAW_WORK
+      WHERE claimed_by IS DISTINCT FROM :v_run_id
+      ORDER BY queued_at, file_name
+      LIMIT :p_batch_size
+    );
+    IF (SQLROWCOUNT = 0) THEN
+      BREAK;
+    END IF;
+    v_batches := v_batches + 1;
+    SELECT ARRAY_AGG(file_name) INTO :v_batch
+    FROM PROCESS_RAW_WORK
+    WHERE claimed_by = :v_run_id AND claimed_at = :v_claimed;
+
+    BEGIN
+      CALL PROCESS_BATCH(:v_batch) INTO :v_result;
+      DELETE FROM PROCESS_RAW_WORK WHERE claimed_by = :v_run_id AND claimed_at = :v_claimed;
+      v_done := v_done + SQLROWCOUNT;
+    EXCEPTION
+      WHEN OTHER THEN
+        -- Files PROCESS_BATCH wrote before failing are done; the rest wait for the next call
+        v_error := SQLERRM;
+        SELECT ARRAY_AGG(DISTINCT w.file_name) INTO :v_written
+        FROM PROCESS_RAW_WORK w
+        JOIN RAW r ON r.file_name = w.file_name AND r.created_at >= :v_claimed
+        WHERE w.claimed_by = :v_run_id AND w.claimed_at = :v_claimed;
+        CALL INDEX_RECORD_FIELDS(:v_written);
+        DELETE FROM PROCESS_RAW_WORK w
+        WHERE w.claimed_by = :v_run_id AND w.claimed_at = :v_claimed
+          AND EXISTS (SELECT 1 FROM RAW r WHERE r.file_name = w.file_name AND r.created_at >= :v_claimed);
+        v_done := v_done + SQLROWCOUNT;
+        UPDATE PROCESS_RAW_WORK
+        SET last_error = :v_error
+        WHERE claimed_by = :v_run_id AND claimed_at = :v_claimed;
+        v_failed := v_failed + SQLROWCOUNT;
+    END;
+  END LOOP;
+  RETURN CONCAT('OK (processed ', v_done, ' file(s) in ', v_batches, ' batch(es), ', v_failed, ' left in PROCESS_RAW_WORK)');
 END;
 $$;
 
@@ -91,7 +482,8 @@ CREATE WAREHOUSE IF NOT EXISTS AI_EXTRACT_XS_WH
   WAREHOUSE_SIZE = 'XSMALL'
   COMMENT = 'Snowpark warehouse for ingestion';
 
--- (Optional) A task can be added later to automate processing when new files arrive
+-- Files dropped onto DOCS_ROUTER_STAGE by other systems are processed by the ingestion tasks
+-- (INGEST_ENQUEUE_TASK / INGEST_DRAIN_TASK below), which are enabled at the end of this script
 
 -- ========================================================================
 -- COPY DATA FROM GIT TO INTERNAL STAGE
@@ -119,7 +511,7 @@ SELECT 'PERMIT', 'Building Permit Request' UNION ALL
 SELECT 'CONTRACTOR', 'Contractor License Application';
 
 -- ========================================================================
--- CRUD Procedures for App (Types, Prompts, Single-file processing, Approve)
+-- CRUD Procedures for App (Types, Prompts, Single-file and batch processing, Approve)
 -- ========================================================================
 
 CREATE OR REPLACE PROCEDURE UPSERT_DOC_TYPE(p_doc_type VARCHAR, p_description VARCHAR)
@@ -135,120 +527,809 @@ BEGIN
 END;
 $$;
 
+-- Returns the field diff against the previous prompt set as a JSON string:
+-- {"version": n, "added": [...], "changed": [...], "removed": [...]}
 CREATE OR REPLACE PROCEDURE REPLACE_PROMPTS(p_doc_type VARCHAR, p_prompts VARIANT)
 RETURNS STRING
 LANGUAGE SQL
 AS $$
+DECLARE
+  v_old VARIANT;
+  v_new VARIANT;
+  v_diff VARIANT;
+  v_latest_hash STRING;
+  v_version NUMBER;
 BEGIN
+  SELECT ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) INTO :v_old
+  FROM DOC_TYPE_PROMPTS
+  WHERE document_type = :p_doc_type;
+
   DELETE FROM DOC_TYPE_PROMPTS WHERE document_type = :p_doc_type;
-  INSERT INTO DOC_TYPE_PROMPTS (document_type, field_name, retrieval_prompt, sort_order)
+  INSERT INTO DOC_TYPE_PROMPTS (document_type, field_name, retrieval_prompt, sort_order,
+                                value_type, pattern, min_value, max_value, required)
   SELECT :p_doc_type,
          TRIM((value:field_name)::STRING),
          (value:retrieval_prompt)::STRING,
-         TRY_TO_NUMBER((value:sort_order)::STRING)
+         TRY_TO_NUMBER((value:sort_order)::STRING),
+         NULLIF(LOWER(TRIM((value:value_type)::STRING)), ''),
+         NULLIF(TRIM((value:pattern)::STRING), ''),
+         TRY_TO_NUMBER((value:min_value)::STRING, 38, 4),
+         TRY_TO_NUMBER((value:max_value)::STRING, 38, 4),
+         COALESCE(TRY_TO_BOOLEAN((value:required)::STRING), FALSE)
   FROM TABLE(FLATTEN(input => :p_prompts))
   WHERE TRIM((value:field_name)::STRING) IS NOT NULL
     AND TRIM((value:field_name)::STRING) <> ''
     AND (value:retrieval_prompt) IS NOT NULL;
-  RETURN 'OK';
+
+  SELECT ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) INTO :v_new
+  FROM DOC_TYPE_PROMPTS
+  WHERE document_type = :p_doc_type;
+
+  SELECT OBJECT_CONSTRUCT(
+           'added',   ARRAY_AGG(CASE WHEN o.f IS NULL THEN n.f END),
+           'changed', ARRAY_AGG(CASE WHEN o.f IS NOT NULL AND n.f IS NOT NULL AND o.p IS DISTINCT FROM n.p THEN n.f END),
+           'removed', ARRAY_AGG(CASE WHEN n.f IS NULL THEN o.f END)
+         ) INTO :v_diff
+  FROM (SELECT value[0]::STRING AS f, value[1]::STRING AS p FROM TABLE(FLATTEN(input => :v_old))) o
+  FULL OUTER JOIN (SELECT value[0]::STRING AS f, value[1]::STRING AS p FROM TABLE(FLATTEN(input => :v_new))) n
+    ON o.f = n.f;
+
+  SELECT MAX_BY(prompt_hash, version), COALESCE(MAX(version), 0) INTO :v_latest_hash, :v_version
+  FROM DOC_TYPE_PROMPT_VERSIONS
+  WHERE document_type = :p_doc_type;
+
+  -- Only a changed prompt set starts a new version
+  IF (v_new IS NOT NULL AND SHA2(TO_JSON(v_new)) IS DISTINCT FROM v_latest_hash) THEN
+    v_version := v_version + 1;
+    INSERT INTO DOC_TYPE_PROMPT_VERSIONS (document_type, version, prompt_hash, prompts, diff)
+    SELECT :p_doc_type, :v_version, SHA2(TO_JSON(:v_new)), :v_new, :v_diff;
+  END IF;
+
+  RETURN TO_JSON(OBJECT_INSERT(v_diff, 'version', v_version));
 END;
 $$;
 
-CREATE OR REPLACE PROCEDURE PROCESS_ONE_FILE(p_file_name VARCHAR)
+-- p_document_type: optional type already determined by the caller (e.g. the app's local
+-- first-page pre-classification). When given, the classification AI_EXTRACT pass is skipped.
+-- Classification, extraction and the RAW write run as separate statements so each stage's
+-- time lands in PROCESSING_LOG.
+CREATE OR REPLACE PROCEDURE PROCESS_ONE_FILE(p_file_name VARCHAR, p_document_type VARCHAR DEFAULT NULL)
 RETURNS STRING
 LANGUAGE SQL
 AS $$
+DECLARE
+  v_run_id STRING := UUID_STRING();
+  v_files ARRAY;
+  v_log ARRAY := ARRAY_CONSTRUCT();
+  v_stage STRING := 'reuse';
+  v_begun TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_started TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_content_hash STRING;
+  v_reused ARRAY;
+  v_document_type STRING;
+  v_extract VARIANT;
+  v_field_count NUMBER;
+  v_outcome STRING;
+  v_log_result STRING;
 BEGIN
-  INSERT INTO RAW (file_name, file_url, document_type, extract_json)
-  WITH input AS (
-    SELECT :p_file_name AS file_name
-  ),
-  types_list AS (
-    SELECT LISTAGG(document_type, ', ') WITHIN GROUP (ORDER BY document_type) AS type_list
-    FROM DOC_TYPES
-  ),
-  classified AS (
-    SELECT i.file_name,
-           GET_PRESIGNED_URL('@DOCS_ROUTER_STAGE', i.file_name) AS file_url,
-           UPPER(
+  v_files := ARRAY_CONSTRUCT(p_file_name);
+  SELECT MAX(content_hash) INTO :v_content_hash
+  FROM FILE_FINGERPRINTS
+  WHERE file_name = :p_file_name;
+
+  -- Identical bytes already processed with the current prompt set: reuse that result, no AI calls
+  IF (v_content_hash IS NOT NULL) THEN
+    CALL REUSE_PRIOR_RESULTS(:v_files) INTO :v_reused;
+    IF (ARRAY_SIZE(v_reused) > 0) THEN
+      v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'reuse', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'REUSED'));
+      v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'REUSED'));
+      CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_ONE_FILE', :v_log) INTO :v_log_result;
+      RETURN 'OK (reused prior result)';
+    END IF;
+  END IF;
+
+  v_stage := 'classify';
+  v_started := CURRENT_TIMESTAMP();
+  IF (p_document_type IS NOT NULL AND TRIM(p_document_type) <> '') THEN
+    v_document_type := UPPER(TRIM(p_document_type));
+  ELSE
+    SELECT UPPER(
              AI_EXTRACT(
-               file => TO_FILE('@DOCS_ROUTER_STAGE', i.file_name),
-               responseFormat => [[
-                 'document_type',
-                 'Select the best matching document type from this list: ' || COALESCE((SELECT type_list FROM types_list), '') || '. If none match, return NO_MATCH. Return only the label.'
-               ]]
+               file => TO_FILE('@DOCS_ROUTER_STAGE', :p_file_name),
+               responseFormat => c.response_format
              ):response.document_type::VARCHAR
-           ) AS document_type
-    FROM input i
-  ),
-  prompts AS (
-    SELECT document_type,
-           ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) AS rf,
-           ARRAY_AGG(field_name) WITHIN GROUP (ORDER BY sort_order, field_name) AS fields
-    FROM DOC_TYPE_PROMPTS
-    GROUP BY document_type
-  )
-  SELECT c.file_name,
-         c.file_url,
-         c.document_type,
-         IFF(
-           c.document_type = 'NO_MATCH',
+           ) INTO :v_document_type
+    FROM CLASSIFICATION_PROMPT c;
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'classify', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files));
+  END IF;
+
+  v_stage := 'extract';
+  v_started := CURRENT_TIMESTAMP();
+  SELECT IFF(
+           :v_document_type = 'NO_MATCH',
            OBJECT_CONSTRUCT(),
            IFF(
              p.rf IS NULL OR ARRAY_SIZE(p.rf) = 0,
              OBJECT_CONSTRUCT('warning','NO_PROMPTS_CONFIGURED'),
              AI_EXTRACT(
-               file => TO_FILE('@DOCS_ROUTER_STAGE', c.file_name),
+               file => TO_FILE('@DOCS_ROUTER_STAGE', :p_file_name),
                responseFormat => p.rf
              )
            )
-         ) AS extract_json
-  FROM classified c
-  LEFT JOIN prompts p
-    ON p.document_type = c.document_type;
+         ),
+         COALESCE(ARRAY_SIZE(p.rf), 0)
+  INTO :v_extract, :v_field_count
+  FROM (
+    SELECT ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) AS rf
+    FROM DOC_TYPE_PROMPTS
+    WHERE document_type = :v_document_type
+  ) p;
+  v_outcome := IFF(v_document_type = 'NO_MATCH', 'NO_MATCH', IFF(v_field_count = 0, 'NO_PROMPTS', 'OK'));
+  IF (v_outcome = 'OK') THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'extract', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files));
+  END IF;
 
-  -- Tier-1 validation
-  UPDATE RAW t
-  SET validation_json = v.vjson
+  -- Validation is left PENDING for VALIDATE_PENDING so the record is reviewable right away
+  v_stage := 'write';
+  v_started := CURRENT_TIMESTAMP();
+  INSERT INTO RAW (file_name, file_url, document_type, extract_json, validation_json, validation_status, content_hash, prompt_hash)
+  SELECT :p_file_name,
+         GET_PRESIGNED_URL('@DOCS_ROUTER_STAGE', :p_file_name),
+         :v_document_type,
+         :v_extract,
+         IFF(
+           :v_outcome = 'OK',
+           NULL,
+           OBJECT_CONSTRUCT('status','skipped','reason','no document type or prompts')
+         ) AS validation_json,
+         IFF(validation_json IS NULL, 'PENDING', 'SKIPPED'),
+         :v_content_hash,
+         (SELECT MAX(prompt_hash) FROM PROMPT_SET_HASHES WHERE document_type = :v_document_type);
+
+  CALL INDEX_RECORD_FIELDS(ARRAY_CONSTRUCT(:p_file_name));
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'write', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', v_outcome));
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', v_outcome));
+  CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_ONE_FILE', :v_log) INTO :v_log_result;
+  RETURN 'OK';
+EXCEPTION
+  WHEN OTHER THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', v_stage, 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'ERROR', 'error', SQLERRM));
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'ERROR', 'error', SQLERRM));
+    CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_ONE_FILE', :v_log, OBJECT_CONSTRUCT(:p_file_name, :v_document_type)) INTO :v_log_result;
+    RAISE;
+END;
+$$;
+
+-- Set-based variant of PROCESS_ONE_FILE: classifies and extracts a list of files with one
+-- statement per stage, so the warehouse can fan the AI calls out across rows and each stage's
+-- time lands in PROCESSING_LOG. The type list and prompt aggregates are computed once per
+-- batch instead of once per file; answers are carried between stages in PROCESS_BATCH_WORK.
+-- p_document_types: optional object of file_name -> pre-classified type; those files skip
+-- the classification AI_EXTRACT pass.
+CREATE OR REPLACE PROCEDURE PROCESS_BATCH(p_file_names VARIANT, p_document_types VARIANT DEFAULT NULL)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_run_id STRING := UUID_STRING();
+  v_log ARRAY := ARRAY_CONSTRUCT();
+  v_stage STRING := 'reuse';
+  v_stage_files ARRAY;
+  v_begun TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_started TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_inputs ARRAY;
+  v_pending VARIANT;
+  v_reused_files ARRAY;
+  v_classified ARRAY;
+  v_types VARIANT;
+  v_extracted_files ARRAY;
+  v_outcomes VARIANT;
+  v_count NUMBER := 0;
+  v_reused NUMBER := 0;
+  v_log_result STRING;
+BEGIN
+  IF (p_file_names IS NULL OR ARRAY_SIZE(p_file_names) = 0) THEN
+    RETURN 'OK (processed 0 file(s))';
+  END IF;
+
+  SELECT ARRAY_AGG(DISTINCT TRIM(value::STRING)) INTO :v_inputs
+  FROM TABLE(FLATTEN(input => :p_file_names))
+  WHERE TRIM(value::STRING) <> '';
+  v_stage_files := v_inputs;
+
+  -- Files with a reusable prior result (same bytes, same prompt set) are copied without AI calls
+  CALL REUSE_PRIOR_RESULTS(:v_inputs) INTO :v_reused_files;
+  v_reused := ARRAY_SIZE(v_reused_files);
+  v_pending := ARRAY_EXCEPT(v_inputs, v_reused_files);
+  IF (v_reused > 0) THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'reuse', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_reused_files, 'outcome', 'REUSED'));
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_reused_files, 'outcome', 'REUSED'));
+  END IF;
+
+  IF (ARRAY_SIZE(v_pending) = 0) THEN
+    CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_BATCH', :v_log) INTO :v_log_result;
+    RETURN CONCAT('OK (processed 0 file(s), reused ', v_reused, ')');
+  END IF;
+
+  v_stage := 'classify';
+  v_stage_files := v_pending;
+  v_started := CURRENT_TIMESTAMP();
+  INSERT INTO PROCESS_BATCH_WORK (run_id, file_name, document_type, classified)
+  SELECT :v_run_id,
+         i.value::STRING,
+         IFF(
+           GET(:p_document_types, i.value::STRING) IS NOT NULL,
+           UPPER(TRIM(GET(:p_document_types, i.value::STRING)::VARCHAR)),
+           UPPER(
+             AI_EXTRACT(
+               file => TO_FILE('@DOCS_ROUTER_STAGE', i.value::STRING),
+               responseFormat => c.response_format
+             ):response.document_type::VARCHAR
+           )
+         ),
+         GET(:p_document_types, i.value::STRING) IS NULL
+  FROM TABLE(FLATTEN(input => :v_pending)) i
+  CROSS JOIN CLASSIFICATION_PROMPT c;
+  SELECT ARRAY_AGG(IFF(classified, file_name, NULL)) INTO :v_classified
+  FROM PROCESS_BATCH_WORK
+  WHERE run_id = :v_run_id;
+  IF (ARRAY_SIZE(v_classified) > 0) THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'classify', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_classified));
+  END IF;
+
+  v_stage := 'extract';
+  v_started := CURRENT_TIMESTAMP();
+  UPDATE PROCESS_BATCH_WORK w
+  SET outcome = e.outcome,
+      extract_json = e.extract_json
   FROM (
-    SELECT s.file_name,
+    SELECT c.file_name,
+           IFF(c.document_type = 'NO_MATCH', 'NO_MATCH', IFF(p.rf IS NULL OR ARRAY_SIZE(p.rf) = 0, 'NO_PROMPTS', 'OK')) AS outcome,
            IFF(
-             s.document_type = 'NO_MATCH' OR s.fields IS NULL OR ARRAY_SIZE(s.fields) = 0,
-             OBJECT_CONSTRUCT('status','skipped','reason','no document type or prompts'),
-             AI_COMPLETE(
-               model => 'mistral-large',
-               prompt => CONCAT(
-                 'You are a strict validator for extracted document data. Given a document type description, the list of fields requested, and the extracted JSON, answer ONLY with a compact JSON object with keys \"valid\" (boolean) and \"notes\" (string). Be conservative when fields conflict with the description or the prompts. Do not add extra keys.\n\nInput as JSON:\n',
-                 TO_JSON(OBJECT_CONSTRUCT(
-                   'document_type', s.document_type,
-                   'description', COALESCE(s.description, ''),
-                   'fields', s.fields,
-                   'extracted', s.extract_json
-                 ))
-               ),
-               model_parameters => OBJECT_CONSTRUCT('temperature', 0),
-               response_format => OBJECT_CONSTRUCT(
-                 'type','json',
-                 'schema', PARSE_JSON('{"type":"object","properties":{"valid":{"type":"boolean"},"notes":{"type":"string"}},"required":["valid","notes"]}')
+             c.document_type = 'NO_MATCH',
+             OBJECT_CONSTRUCT(),
+             IFF(
+               p.rf IS NULL OR ARRAY_SIZE(p.rf) = 0,
+               OBJECT_CONSTRUCT('warning','NO_PROMPTS_CONFIGURED'),
+               AI_EXTRACT(
+                 file => TO_FILE('@DOCS_ROUTER_STAGE', c.file_name),
+                 responseFormat => p.rf
                )
              )
-           ) AS vjson
+           ) AS extract_json
+    FROM PROCESS_BATCH_WORK c
+    LEFT JOIN (
+      SELECT document_type,
+             ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) AS rf
+      FROM DOC_TYPE_PROMPTS
+      GROUP BY document_type
+    ) p ON p.document_type = c.document_type
+    WHERE c.run_id = :v_run_id
+  ) e
+  WHERE w.run_id = :v_run_id
+    AND w.file_name = e.file_name;
+  -- Only the per-file type and outcome labels come back into variables, for PROCESSING_LOG
+  SELECT ARRAY_AGG(IFF(outcome = 'OK', file_name, NULL)),
+         OBJECT_AGG(file_name, outcome::VARIANT),
+         OBJECT_AGG(file_name, document_type::VARIANT)
+  INTO :v_extracted_files, :v_outcomes, :v_types
+  FROM PROCESS_BATCH_WORK
+  WHERE run_id = :v_run_id;
+  IF (ARRAY_SIZE(v_extracted_files) > 0) THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'extract', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_extracted_files));
+  END IF;
+
+  -- Tier-1 validation is left to VALIDATE_PENDING
+  v_stage := 'write';
+  v_started := CURRENT_TIMESTAMP();
+  INSERT INTO RAW (file_name, file_url, document_type, extract_json, validation_json, validation_status, content_hash, prompt_hash)
+  SELECT w.file_name,
+         GET_PRESIGNED_URL('@DOCS_ROUTER_STAGE', w.file_name),
+         w.document_type,
+         w.extract_json,
+         IFF(
+           w.outcome = 'OK',
+           NULL,
+           OBJECT_CONSTRUCT('status','skipped','reason','no document type or prompts')
+         ) AS validation_json,
+         IFF(validation_json IS NULL, 'PENDING', 'SKIPPED'),
+         f.content_hash,
+         h.prompt_hash
+  FROM PROCESS_BATCH_WORK w
+  LEFT JOIN FILE_FINGERPRINTS f ON f.file_name = w.file_name
+  LEFT JOIN PROMPT_SET_HASHES h ON h.document_type = w.document_type
+  WHERE w.run_id = :v_run_id;
+
+  v_count := SQLROWCOUNT;
+  DELETE FROM PROCESS_BATCH_WORK WHERE run_id = :v_run_id;
+  CALL INDEX_RECORD_FIELDS(:v_pending);
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'write', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_pending, 'outcomes', v_outcomes));
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_pending, 'outcomes', v_outcomes));
+  CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_BATCH', :v_log, :v_types) INTO :v_log_result;
+  RETURN CONCAT('OK (processed ', v_count, ' file(s), reused ', v_reused, ')');
+EXCEPTION
+  WHEN OTHER THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', v_stage, 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_stage_files, 'outcome', 'ERROR', 'error', SQLERRM));
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_stage_files, 'outcome', 'ERROR', 'error', SQLERRM));
+    DELETE FROM PROCESS_BATCH_WORK WHERE run_id = :v_run_id;
+    CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_BATCH', :v_log, :v_types) INTO :v_log_result;
+    RAISE;
+END;
+$$;
+
+-- Splits a staged PDF into standalone PDFs of p_pages_per_chunk pages under _chunks/, for
+-- PROCESS_CHUNKED_FILE. Splitting in the warehouse means the app uploads each file once.
+-- Returns [{"path", "first_page", "last_page"}, ...], or [] below p_min_pages pages.
+CREATE OR REPLACE PROCEDURE SPLIT_PDF_PAGES(p_file_name VARCHAR, p_pages_per_chunk NUMBER, p_min_pages NUMBER)
+RETURNS VARIANT
+LANGUAGE PYTHON
+RUNTIME_VERSION = '3.11'
+PACKAGES = ('snowflake-snowpark-python', 'pypdfium2')
+HANDLER = 'split'
+AS $$
+import io
+
+import pypdfium2 as pdfium
+
+
+def split(session, file_name, pages_per_chunk, min_pages):
+    stage = "@DOCS_ROUTER_STAGE"
+    stream = session.file.get_stream(f"{stage}/{file_name}", decompress=False)
+    src = pdfium.PdfDocument(stream.read())
+    stream.close()
+    chunks = []
+    try:
+        total = len(src)
+        if total < max(1, int(min_pages)):
+            return chunks
+        step = max(1, int(pages_per_chunk))
+        for start in range(0, total, step):
+            end = min(start + step, total)
+            part = pdfium.PdfDocument.new()
+            try:
+                part.import_pages(src, list(range(start, end)))
+                buf = io.BytesIO()
+                part.save(buf)
+            finally:
+                part.close()
+            path = f"_chunks/{file_name}.p{start + 1:04d}-{end:04d}.pdf"
+            buf.seek(0)
+            session.file.put_stream(buf, f"{stage}/{path}", auto_compress=False, overwrite=True)
+            chunks.append({"path": path, "first_page": start + 1, "last_page": end})
+    finally:
+        src.close()
+    session.sql("ALTER STAGE DOCS_ROUTER_STAGE REFRESH SUBPATH = '_chunks/'").collect()
+    return chunks
+$$;
+
+-- Chunked variant of PROCESS_ONE_FILE for large PDFs. SPLIT_PDF_PAGES stages the file's page
+-- ranges under _chunks/; files below p_min_pages pages go to PROCESS_ONE_FILE instead.
+-- The first chunk is classified (unless p_document_type is given), AI_EXTRACT runs once per
+-- chunk in a single set-based statement, and each field keeps its first non-empty answer in
+-- page order. field_pages records the first page of the chunk each answer came from.
+CREATE OR REPLACE PROCEDURE PROCESS_CHUNKED_FILE(p_file_name VARCHAR, p_pages_per_chunk NUMBER DEFAULT 10, p_min_pages NUMBER DEFAULT 20, p_document_type VARCHAR DEFAULT NULL)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_run_id STRING := UUID_STRING();
+  v_files ARRAY;
+  v_pages VARIANT;
+  v_chunks VARIANT;
+  v_result STRING;
+  v_log ARRAY := ARRAY_CONSTRUCT();
+  v_stage STRING := 'reuse';
+  v_begun TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_started TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_content_hash STRING;
+  v_reused ARRAY;
+  v_first_chunk STRING;
+  v_document_type STRING;
+  v_response VARIANT;
+  v_field_pages VARIANT;
+  v_field_count NUMBER;
+  v_outcome STRING;
+  v_log_result STRING;
+BEGIN
+  v_files := ARRAY_CONSTRUCT(p_file_name);
+
+  SELECT MAX(content_hash) INTO :v_content_hash
+  FROM FILE_FINGERPRINTS
+  WHERE file_name = :p_file_name;
+
+  -- Identical bytes already processed with the current prompt set: reuse that result, no AI calls
+  IF (v_content_hash IS NOT NULL) THEN
+    CALL REUSE_PRIOR_RESULTS(:v_files) INTO :v_reused;
+    IF (ARRAY_SIZE(v_reused) > 0) THEN
+      v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'reuse', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'REUSED'));
+      v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'REUSED'));
+      CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_CHUNKED_FILE', :v_log, NULL, :v_pages) INTO :v_log_result;
+      RETURN 'OK (reused prior result)';
+    END IF;
+  END IF;
+
+  v_stage := 'split';
+  v_started := CURRENT_TIMESTAMP();
+  CALL SPLIT_PDF_PAGES(:p_file_name, :p_pages_per_chunk, :p_min_pages) INTO :v_chunks;
+  IF (ARRAY_SIZE(v_chunks) = 0) THEN
+    -- Too short to chunk; PROCESS_ONE_FILE logs its own stages
+    CALL PROCESS_ONE_FILE(:p_file_name, :p_document_type) INTO :v_result;
+    RETURN v_result;
+  END IF;
+  SELECT OBJECT_CONSTRUCT(:p_file_name, MAX(c.value:last_page::NUMBER)) INTO :v_pages
+  FROM TABLE(FLATTEN(input => :v_chunks)) c;
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'split', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files));
+
+  v_stage := 'classify';
+  v_started := CURRENT_TIMESTAMP();
+  IF (p_document_type IS NOT NULL AND TRIM(p_document_type) <> '') THEN
+    v_document_type := UPPER(TRIM(p_document_type));
+  ELSE
+    SELECT c.value:path::STRING INTO :v_first_chunk
+    FROM TABLE(FLATTEN(input => :v_chunks)) c
+    ORDER BY c.value:first_page::NUMBER
+    LIMIT 1;
+
+    SELECT UPPER(
+             AI_EXTRACT(
+               file => TO_FILE('@DOCS_ROUTER_STAGE', :v_first_chunk),
+               responseFormat => c.response_format
+             ):response.document_type::VARCHAR
+           ) INTO :v_document_type
+    FROM CLASSIFICATION_PROMPT c;
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'classify', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files));
+  END IF;
+
+  v_stage := 'extract';
+  v_started := CURRENT_TIMESTAMP();
+  SELECT m.response, m.field_pages, COALESCE(ARRAY_SIZE(p.rf), 0)
+  INTO :v_response, :v_field_pages, :v_field_count
+  FROM (
+    WITH prompts AS (
+      SELECT ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) AS rf
+      FROM DOC_TYPE_PROMPTS
+      WHERE document_type = :v_document_type
+    ),
+    extracted AS (
+      SELECT c.value:first_page::NUMBER AS first_page,
+             AI_EXTRACT(
+               file => TO_FILE('@DOCS_ROUTER_STAGE', c.value:path::STRING),
+               responseFormat => p.rf
+             ):response AS answers
+      FROM TABLE(FLATTEN(input => :v_chunks)) c, prompts p
+      WHERE :v_document_type <> 'NO_MATCH'
+        AND p.rf IS NOT NULL
+        AND ARRAY_SIZE(p.rf) > 0
+    ),
+    ranked AS (
+      -- Per field: non-empty answers first, then the earliest page
+      SELECT a.key AS field_name,
+             a.value,
+             e.first_page,
+             IS_NULL_VALUE(a.value)
+               OR (IS_ARRAY(a.value) AND ARRAY_SIZE(a.value) = 0)
+               OR (IS_VARCHAR(a.value) AND UPPER(TRIM(a.value::STRING)) IN ('', 'NONE', 'NULL', 'N/A')) AS is_empty
+      FROM extracted e,
+           LATERAL FLATTEN(input => e.answers) a
+      QUALIFY ROW_NUMBER() OVER (PARTITION BY a.key ORDER BY is_empty, e.first_page) = 1
+    )
+    SELECT OBJECT_AGG(field_name, value) AS response,
+           OBJECT_AGG(IFF(is_empty, NULL, field_name), first_page) AS field_pages
+    FROM ranked
+  ) m
+  CROSS JOIN (
+    SELECT ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) AS rf
+    FROM DOC_TYPE_PROMPTS
+    WHERE document_type = :v_document_type
+  ) p;
+  v_outcome := IFF(v_document_type = 'NO_MATCH', 'NO_MATCH', IFF(v_field_count = 0, 'NO_PROMPTS', 'OK'));
+  IF (v_outcome = 'OK') THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'extract', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files));
+  END IF;
+
+  -- Tier-1 validation is left to VALIDATE_PENDING
+  v_stage := 'write';
+  v_started := CURRENT_TIMESTAMP();
+  INSERT INTO RAW (file_name, file_url, document_type, extract_json, validation_json, validation_status, content_hash, prompt_hash, field_pages)
+  SELECT :p_file_name,
+         GET_PRESIGNED_URL('@DOCS_ROUTER_STAGE', :p_file_name),
+         :v_document_type,
+         IFF(
+           :v_outcome = 'NO_MATCH',
+           OBJECT_CONSTRUCT(),
+           IFF(
+             :v_outcome = 'NO_PROMPTS',
+             OBJECT_CONSTRUCT('warning','NO_PROMPTS_CONFIGURED'),
+             OBJECT_CONSTRUCT('response', COALESCE(:v_response, OBJECT_CONSTRUCT()))
+           )
+         ),
+         IFF(
+           :v_outcome = 'OK',
+           NULL,
+           OBJECT_CONSTRUCT('status','skipped','reason','no document type or prompts')
+         ) AS validation_json,
+         IFF(validation_json IS NULL, 'PENDING', 'SKIPPED'),
+         :v_content_hash,
+         (SELECT MAX(prompt_hash) FROM PROMPT_SET_HASHES WHERE document_type = :v_document_type),
+         :v_field_pages;
+
+  CALL INDEX_RECORD_FIELDS(ARRAY_CONSTRUCT(:p_file_name));
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'write', 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', v_outcome));
+  v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', v_outcome));
+  CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_CHUNKED_FILE', :v_log, NULL, :v_pages) INTO :v_log_result;
+  RETURN CONCAT('OK (', ARRAY_SIZE(v_chunks), ' chunk(s))');
+EXCEPTION
+  WHEN OTHER THEN
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', v_stage, 'started_at', v_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'ERROR', 'error', SQLERRM));
+    v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'total', 'started_at', v_begun, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'ERROR', 'error', SQLERRM));
+    CALL LOG_PROCESSING_STAGES(:v_run_id, 'PROCESS_CHUNKED_FILE', :v_log, OBJECT_CONSTRUCT(:p_file_name, :v_document_type), :v_pages) INTO :v_log_result;
+    RAISE;
+END;
+$$;
+
+-- Tier-1 validation queue: drains RAW rows with validation_status = 'PENDING' in batches
+-- of p_batch_size. Up to p_batch_size records passing every rule in VALIDATION_RULE_RESULTS
+-- are marked valid directly per loop; the rest get one set-based AI_COMPLETE UPDATE per batch, with any rule failures
+-- passed along as context. Each pass is logged to PROCESSING_LOG as validate_rules /
+-- validate_ai with one row per record.
+CREATE OR REPLACE PROCEDURE VALIDATE_PENDING(p_batch_size NUMBER DEFAULT 50)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_started TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_batch NUMBER := 0;
+  v_rules NUMBER := 0;
+  v_total NUMBER := 0;
+  v_rules_total NUMBER := 0;
+  v_run_id STRING := UUID_STRING();
+  v_log ARRAY := ARRAY_CONSTRUCT();
+  v_pass_started TIMESTAMP_NTZ;
+  v_files ARRAY;
+  v_outcomes OBJECT;
+  v_log_result STRING;
+BEGIN
+  -- Consume the trigger stream first, so rows inserted while draining re-arm the task
+  INSERT INTO VALIDATION_RUNS (started_at, new_rows)
+  SELECT :v_started, COUNT(*) FROM RAW_VALIDATION_STREAM;
+
+  LOOP
+    -- Deterministic pass: no LLM call for records whose rule-checked fields are all clean
+    v_pass_started := CURRENT_TIMESTAMP();
+    UPDATE RAW t
+    SET validation_json = OBJECT_CONSTRUCT(
+          'valid', TRUE,
+          'notes', CONCAT('All ', v.checked, ' rule-checked field(s) passed.'),
+          'source', 'rules'),
+        validation_status = 'DONE',
+        validated_at = CURRENT_TIMESTAMP()
+    FROM (
+      SELECT file_name, created_at, checked
+      FROM VALIDATION_RULE_RESULTS
+      WHERE ARRAY_SIZE(failures) = 0
+      QUALIFY ROW_NUMBER() OVER (ORDER BY created_at, file_name) <= :p_batch_size
+    ) v
+    WHERE t.file_name = v.file_name
+      AND t.created_at = v.created_at
+      AND t.validation_status = 'PENDING';
+    v_rules := SQLROWCOUNT;
+    v_rules_total := v_rules_total + v_rules;
+    IF (v_rules > 0) THEN
+      SELECT ARRAY_AGG(DISTINCT file_name) INTO :v_files
+      FROM RAW
+      WHERE validated_at >= :v_pass_started
+        AND validation_json:source::STRING = 'rules';
+      v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'validate_rules', 'started_at', v_pass_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcome', 'VALID'));
+    END IF;
+
+    v_pass_started := CURRENT_TIMESTAMP();
+    UPDATE RAW t
+    SET validation_json = v.vjson,
+        validation_status = 'DONE',
+        validated_at = CURRENT_TIMESTAMP()
     FROM (
-      SELECT r.file_name, r.document_type, r.extract_json, d.description, p.fields
+      SELECT s.file_name,
+             s.created_at,
+             IFF(
+               s.document_type = 'NO_MATCH' OR s.fields IS NULL OR ARRAY_SIZE(s.fields) = 0,
+               OBJECT_CONSTRUCT('status','skipped','reason','no document type or prompts'),
+               AI_COMPLETE(
+                 model => 'mistral-large',
+                 prompt => CONCAT(
+                   'You are a strict validator for extracted document data. Given a document type description, the list of fields requested, the extracted JSON, and any fields that failed deterministic format checks (rule_failures), answer ONLY with a compact JSON object with keys \"valid\" (boolean) and \"notes\" (string). Be conservative when fields conflict with the description or the prompts. Do not add extra keys.\n\nInput as JSON:\n',
+                   TO_JSON(OBJECT_CONSTRUCT(
+                     'document_type', s.document_type,
+                     'description', COALESCE(s.description, ''),
+                     'fields', s.fields,
+                     'extracted', s.extract_json,
+                     'rule_failures', COALESCE(s.rule_failures, ARRAY_CONSTRUCT())
+                   ))
+                 ),
+                 model_parameters => OBJECT_CONSTRUCT('temperature', 0),
+                 response_format => OBJECT_CONSTRUCT(
+                   'type','json',
+                   'schema', PARSE_JSON('{"type":"object","properties":{"valid":{"type":"boolean"},"notes":{"type":"string"}},"required":["valid","notes"]}')
+                 )
+               )
+             ) AS vjson
+      FROM (
+        SELECT r.file_name, r.created_at, r.document_type, r.extract_json, d.description, p.fields,
+               rr.failures AS rule_failures
+        FROM RAW r
+        LEFT JOIN DOC_TYPES d ON d.document_type = r.document_type
+        LEFT JOIN VALIDATION_RULE_RESULTS rr ON rr.file_name = r.file_name AND rr.created_at = r.created_at
+        LEFT JOIN (
+          SELECT document_type,
+                 ARRAY_AGG(field_name) WITHIN GROUP (ORDER BY sort_order, field_name) AS fields
+          FROM DOC_TYPE_PROMPTS
+          GROUP BY document_type
+        ) p ON p.document_type = r.document_type
+        WHERE r.validation_status = 'PENDING'
+        QUALIFY ROW_NUMBER() OVER (ORDER BY r.created_at, r.file_name) <= :p_batch_size
+      ) s
+    ) v
+    WHERE t.file_name = v.file_name
+      AND t.created_at = v.created_at
+      AND t.validation_status = 'PENDING';
+    v_batch := SQLROWCOUNT;
+    IF (v_batch > 0) THEN
+      SELECT ARRAY_AGG(file_name),
+             OBJECT_AGG(file_name, outcome::VARIANT)
+      INTO :v_files, :v_outcomes
+      FROM (
+        SELECT file_name,
+               IFF(validation_json:status::STRING = 'skipped', 'SKIPPED',
+                   IFF(validation_json:valid::BOOLEAN, 'VALID', 'INVALID')) AS outcome
+        FROM RAW
+        WHERE validated_at >= :v_pass_started
+          AND validation_status = 'DONE'
+          AND validation_json:source IS NULL
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY file_name ORDER BY created_at DESC) = 1
+      );
+      v_log := ARRAY_APPEND(v_log, OBJECT_CONSTRUCT('stage', 'validate_ai', 'started_at', v_pass_started, 'finished_at', CURRENT_TIMESTAMP(), 'files', v_files, 'outcomes', v_outcomes));
+    END IF;
+    v_total := v_total + v_rules + v_batch;
+    IF (v_rules + v_batch = 0) THEN
+      BREAK;
+    END IF;
+  END LOOP;
+
+  UPDATE VALIDATION_RUNS
+  SET validated = :v_total,
+      rule_validated = :v_rules_total,
+      finished_at = CURRENT_TIMESTAMP()
+  WHERE started_at = :v_started;
+
+  CALL LOG_PROCESSING_STAGES(:v_run_id, 'VALIDATE_PENDING', :v_log) INTO :v_log_result;
+  RETURN CONCAT('OK (validated ', v_total, ' record(s), ', v_rules_total, ' by rules)');
+END;
+$$;
+
+-- Runs the validation queue whenever new RAW rows exist; the app also starts it
+-- with EXECUTE TASK right after an upload so results do not wait for the schedule.
+CREATE OR REPLACE TASK VALIDATE_PENDING_TASK
+  WAREHOUSE = AI_EXTRACT_XS_WH
+  SCHEDULE = '1 MINUTE'
+  WHEN SYSTEM$STREAM_HAS_DATA('RAW_VALIDATION_STREAM')
+AS
+  CALL VALIDATE_PENDING(50);
+
+ALTER TASK VALIDATE_PENDING_TASK RESUME;
+
+-- Brings records of one document type up to its current prompt set without full reprocessing.
+-- For each record whose prompt version is known, AI_EXTRACT runs only for fields that were
+-- added or whose prompt changed since that version. The answers are merged into extract_json,
+-- and fields removed from the prompt set are dropped. Approved records are left alone unless
+-- p_include_approved is TRUE. Updated records go back to the validation queue.
+CREATE OR REPLACE PROCEDURE REEXTRACT_CHANGED_FIELDS(p_doc_type VARCHAR, p_include_approved BOOLEAN DEFAULT FALSE)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_prompts VARIANT;
+  v_hash STRING;
+  v_count NUMBER := 0;
+  v_files VARIANT;
+BEGIN
+  SELECT ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) INTO :v_prompts
+  FROM DOC_TYPE_PROMPTS
+  WHERE document_type = :p_doc_type;
+
+  IF (v_prompts IS NULL) THEN
+    RETURN 'OK (no prompts configured)';
+  END IF;
+  v_hash := SHA2(TO_JSON(v_prompts));
+
+  -- Chunked records: fields answered again from the whole file lose their chunk source page
+  UPDATE RAW t
+  SET field_pages = p.pages
+  FROM (
+    SELECT r.file_name,
+           r.created_at,
+           OBJECT_AGG(
+             IFF(ARRAY_CONTAINS(f.key::VARIANT, TRANSFORM(ARRAY_EXCEPT(:v_prompts, v.prompts), p ARRAY -> p[0])), NULL, f.key),
+             f.value
+           ) AS pages
+    FROM RAW r,
+         LATERAL FLATTEN(input => r.field_pages) f,
+         DOC_TYPE_PROMPT_VERSIONS v
+    WHERE v.document_type = r.document_type
+      AND v.prompt_hash = r.prompt_hash
+      AND r.document_type = :p_doc_type
+      AND r.prompt_hash <> :v_hash
+      AND (:p_include_approved OR NOT r.approved)
+    GROUP BY r.file_name, r.created_at
+  ) p
+  WHERE t.file_name = p.file_name
+    AND t.created_at = p.created_at;
+
+  UPDATE RAW t
+  SET extract_json = m.merged_json,
+      prompt_hash = :v_hash,
+      validation_json = NULL,
+      validation_status = 'PENDING',
+      validated_at = NULL
+  FROM (
+    WITH targets AS (
+      SELECT r.file_name,
+             r.created_at,
+             COALESCE(r.extract_json:response, r.extract_json) AS answers,
+             ARRAY_EXCEPT(:v_prompts, v.prompts) AS rf,
+             ARRAY_EXCEPT(
+               TRANSFORM(v.prompts, p ARRAY -> p[0]),
+               TRANSFORM(:v_prompts, p ARRAY -> p[0])
+             ) AS removed
       FROM RAW r
-      LEFT JOIN DOC_TYPES d ON d.document_type = r.document_type
-      LEFT JOIN (
-        SELECT document_type,
-               ARRAY_AGG(field_name) WITHIN GROUP (ORDER BY sort_order, field_name) AS fields
-        FROM DOC_TYPE_PROMPTS
-        GROUP BY document_type
-      ) p ON p.document_type = r.document_type
-      WHERE r.file_name = :p_file_name
-    ) s
-  ) v
-  WHERE t.file_name = v.file_name;
+      JOIN DOC_TYPE_PROMPT_VERSIONS v
+        ON v.document_type = r.document_type
+       AND v.prompt_hash = r.prompt_hash
+      WHERE r.document_type = :p_doc_type
+        AND r.prompt_hash <> :v_hash
+        AND (:p_include_approved OR NOT r.approved)
+    ),
+    extracted AS (
+      SELECT tg.*,
+             IFF(
+               ARRAY_SIZE(tg.rf) = 0,
+               OBJECT_CONSTRUCT(),
+               AI_EXTRACT(
+                 file => TO_FILE('@DOCS_ROUTER_STAGE', tg.file_name),
+                 responseFormat => tg.rf
+               ):response
+             ) AS fresh
+      FROM targets tg
+    )
+    -- Fresh answers win, untouched answers are kept, removed fields are dropped
+    SELECT e.file_name,
+           e.created_at,
+           OBJECT_CONSTRUCT('response', OBJECT_AGG(
+             IFF(
+               src.index = 1
+               OR (NOT ARRAY_CONTAINS(f.key::VARIANT, e.removed)
+                   AND NOT ARRAY_CONTAINS(f.key::VARIANT, OBJECT_KEYS(e.fresh))),
+               f.key,
+               NULL
+             ),
+             f.value
+           )) AS merged_json
+    FROM extracted e,
+         LATERAL FLATTEN(input => ARRAY_CONSTRUCT(e.answers, e.fresh)) src,
+         LATERAL FLATTEN(input => src.value, OUTER => TRUE) f
+    GROUP BY e.file_name, e.created_at
+  ) m
+  WHERE t.file_name = m.file_name
+    AND t.created_at = m.created_at;
 
-  RETURN 'OK';
+  v_count := SQLROWCOUNT;
+
+  -- Re-extracted rows are back in the validation queue with the current prompt hash
+  SELECT ARRAY_AGG(DISTINCT file_name) INTO :v_files
+  FROM RAW
+  WHERE document_type = :p_doc_type
+    AND prompt_hash = :v_hash
+    AND validation_status = 'PENDING';
+  CALL INDEX_RECORD_FIELDS(:v_files);
+  RETURN CONCAT('OK (re-extracted ', v_count, ' record(s))');
 END;
 $$;
 
@@ -262,10 +1343,463 @@ BEGIN
       approved = TRUE,
       approved_at = CURRENT_TIMESTAMP()
   WHERE file_name = :p_file_name;
+  CALL INDEX_RECORD_FIELDS(ARRAY_CONSTRUCT(:p_file_name));
   RETURN 'OK';
 END;
 $$;
 
+-- Bulk approval: one MERGE for many records. p_records is an array of
+-- {"file_name", "created_at", "fields"}; the optional "fields" object overrides individual
+-- extracted values (other fields keep their extracted value) before the row is approved.
+-- Only fields configured in DOC_TYPE_PROMPTS for the record's document type are overridden.
+-- A missing created_at means the file's latest record; each record is merged at most once.
+CREATE OR REPLACE PROCEDURE APPROVE_RECORDS(p_records VARIANT)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_rows NUMBER := 0;
+  v_files VARIANT;
+BEGIN
+  MERGE INTO RAW t
+  USING (
+    WITH items AS (
+      SELECT f.index AS idx,
+             f.value:file_name::STRING AS file_name,
+             TRY_TO_TIMESTAMP_NTZ(f.value:created_at::STRING) AS created_at,
+             f.value:fields AS fields
+      FROM TABLE(FLATTEN(input => :p_records)) f
+    ),
+    latest AS (
+      SELECT file_name, MAX(created_at) AS created_at
+      FROM RAW
+      WHERE file_name IN (SELECT file_name FROM items WHERE created_at IS NULL)
+      GROUP BY file_name
+    ),
+    -- One request per record: explicit timestamps win over a resolved NULL, then the last item
+    req AS (
+      SELECT i.file_name, COALESCE(i.created_at, l.created_at) AS created_at, i.fields
+      FROM items i
+      LEFT JOIN latest l ON l.file_name = i.file_name
+      QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY i.file_name, COALESCE(i.created_at, l.created_at)
+        ORDER BY IFF(i.created_at IS NULL, 1, 0), i.idx DESC
+      ) = 1
+    ),
+    targets AS (
+      SELECT r.file_name, r.created_at, r.document_type, r.extract_json, q.fields
+      FROM RAW r
+      JOIN req q
+        ON q.file_name = r.file_name
+       AND q.created_at = r.created_at
+    ),
+    edited AS (
+      SELECT file_name, created_at, OBJECT_AGG(k, v) AS extract_json
+      FROM (
+        SELECT *
+        FROM (
+          SELECT t.file_name, t.created_at, e.key AS k, e.value AS v, 1 AS pri
+          FROM targets t, LATERAL FLATTEN(input => COALESCE(t.extract_json:response, t.extract_json)) e
+          WHERE t.fields IS NOT NULL
+          UNION ALL
+          SELECT t.file_name, t.created_at, o.key, o.value, 0
+          FROM targets t, LATERAL FLATTEN(input => t.fields) o
+          WHERE EXISTS (
+            SELECT 1
+            FROM DOC_TYPE_PROMPTS p
+            WHERE p.document_type = t.document_type
+              AND p.field_name = o.key
+          )
+        ) u
+        -- Overrides (pri 0) win over extracted values
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY u.file_name, u.created_at, u.k ORDER BY u.pri) = 1
+      )
+      GROUP BY file_name, created_at
+    )
+    SELECT t.file_name, t.created_at, COALESCE(e.extract_json, t.extract_json) AS extract_json
+    FROM targets t
+    LEFT JOIN edited e ON e.file_name = t.file_name AND e.created_at = t.created_at
+  ) s
+  ON t.file_name = s.file_name AND t.created_at = s.created_at
+  WHEN MATCHED THEN UPDATE SET
+    extract_json = s.extract_json,
+    approved = TRUE,
+    approved_at = CURRENT_TIMESTAMP();
+  v_rows := SQLROWCOUNT;
+
+  SELECT ARRAY_AGG(DISTINCT value:file_name::STRING) INTO :v_files
+  FROM TABLE(FLATTEN(input => :p_records));
+  CALL INDEX_RECORD_FIELDS(:v_files);
+  RETURN 'OK (approved ' || v_rows || ' record(s))';
+END;
+$$;
+
+-- Unloads approved records of one document type to @EXPORT_STAGE/<type>/<timestamp>/ as
+-- Parquet or gzipped CSV, one column per DOC_TYPE_PROMPTS field (arrays joined with ', ' as in
+-- the Review editor). COPY INTO writes the result in parallel file parts, so nothing is
+-- buffered in the procedure. Unless p_full, only records approved after the last run's
+-- watermark for p_export_name are read; the run then records its own watermark.
+CREATE OR REPLACE PROCEDURE EXPORT_APPROVED(p_document_type VARCHAR, p_format VARCHAR DEFAULT 'PARQUET', p_export_name VARCHAR DEFAULT 'stage', p_full BOOLEAN DEFAULT FALSE)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_format STRING := UPPER(COALESCE(p_format, 'PARQUET'));
+  v_since TIMESTAMP_NTZ;
+  v_through TIMESTAMP_NTZ;
+  v_rows NUMBER := 0;
+  v_columns STRING;
+  v_path STRING;
+  v_file_format STRING;
+BEGIN
+  IF (v_format NOT IN ('PARQUET', 'CSV')) THEN
+    RETURN 'ERROR: format must be PARQUET or CSV';
+  END IF;
+  IF (NOT COALESCE(p_full, FALSE)) THEN
+    SELECT MAX(approved_through) INTO :v_since
+    FROM EXPORT_WATERMARKS
+    WHERE export_name = :p_export_name AND document_type = :p_document_type;
+  END IF;
+
+  -- Fix the upper bound first; records approved while the unload runs go to the next run
+  SELECT MAX(approved_at), COUNT(*) INTO :v_through, :v_rows
+  FROM RAW
+  WHERE approved
+    AND document_type = :p_document_type
+    AND (:v_since IS NULL OR approved_at > :v_since);
+  IF (v_rows = 0) THEN
+    RETURN 'OK (exported 0 record(s))';
+  END IF;
+
+  SELECT COALESCE(LISTAGG(
+           ', IFF(IS_ARRAY(j[' || lit || ']), ARRAY_TO_STRING(j[' || lit || '], '', ''), j[' || lit || ']::STRING) AS ' || ident, '')
+           WITHIN GROUP (ORDER BY sort_order, field_name), '')
+  INTO :v_columns
+  FROM (
+    SELECT field_name,
+           sort_order,
+           '''' || REPLACE(field_name, '''', '''''') || '''' AS lit,
+           '"' || REPLACE(field_name, '"', '""') || '"' AS ident
+    FROM DOC_TYPE_PROMPTS
+    WHERE document_type = :p_document_type
+  );
+
+  v_path := '@EXPORT_STAGE/' || REGEXP_REPLACE(p_document_type, '[^A-Za-z0-9_-]', '_') || '/'
+            || TO_VARCHAR(CURRENT_TIMESTAMP(), 'YYYYMMDD_HH24MISS') || '/';
+  v_file_format := IFF(v_format = 'CSV',
+                       'TYPE = CSV COMPRESSION = GZIP FIELD_OPTIONALLY_ENCLOSED_BY = ''"''',
+                       'TYPE = PARQUET');
+  EXECUTE IMMEDIATE
+    'COPY INTO ' || v_path || ' FROM ('
+    || 'SELECT file_name, document_type, created_at, approved_at' || v_columns
+    || ' FROM (SELECT r.file_name, r.document_type, r.created_at, r.approved_at,'
+    || ' COALESCE(r.extract_json:response, r.extract_json) AS j FROM RAW r'
+    || ' WHERE r.approved AND r.document_type = ''' || REPLACE(p_document_type, '''', '''''') || ''''
+    || ' AND r.approved_at <= TO_TIMESTAMP_NTZ(''' || TO_VARCHAR(v_through, 'YYYY-MM-DD HH24:MI:SS.FF9') || ''')'
+    || IFF(v_since IS NULL, '', ' AND r.approved_at > TO_TIMESTAMP_NTZ(''' || TO_VARCHAR(v_since, 'YYYY-MM-DD HH24:MI:SS.FF9') || ''')')
+    || '))'
+    || ' FILE_FORMAT = (' || v_file_format || ') HEADER = TRUE MAX_FILE_SIZE = 268435456';
+
+  INSERT INTO EXPORT_WATERMARKS (export_name, document_type, approved_through, rows_exported, location)
+  VALUES (:p_export_name, :p_document_type, :v_through, :v_rows, :v_path);
+  RETURN CONCAT('OK (exported ', v_rows, ' record(s) to ', v_path, ')');
+END;
+$$;
+
+-- Runs EXPORT_APPROVED for every document type; used by the nightly export task
+CREATE OR REPLACE PROCEDURE EXPORT_APPROVED_ALL(p_format VARCHAR DEFAULT 'PARQUET', p_export_name VARCHAR DEFAULT 'stage')
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  c_types CURSOR FOR SELECT document_type FROM DOC_TYPES ORDER BY document_type;
+  v_summary STRING := '';
+  v_result STRING;
+BEGIN
+  FOR t IN c_types DO
+    LET v_type STRING := t.document_type;
+    CALL EXPORT_APPROVED(:v_type, :p_format, :p_export_name) INTO :v_result;
+    v_summary := v_summary || v_type || ': ' || v_result || '; ';
+  END FOR;
+  RETURN RTRIM(v_summary, '; ');
+END;
+$$;
+
+-- Nightly incremental unload of every document type. Created suspended; enable with
+--   ALTER TASK EXPORT_APPROVED_NIGHTLY RESUME;
+CREATE OR REPLACE TASK EXPORT_APPROVED_NIGHTLY
+  WAREHOUSE = AI_EXTRACT_XS_WH
+  SCHEDULE = 'USING CRON 0 2 * * * UTC'
+AS
+  CALL EXPORT_APPROVED_ALL('PARQUET', 'stage');
+
+-- ========================================================================
+-- Background ingestion of files dropped straight onto DOCS_ROUTER_STAGE
+-- ========================================================================
+-- INGEST_ENQUEUE_TASK moves new DOCS_ROUTER_STREAM entries into INGEST_QUEUE (reading the
+-- stream inside DML advances its offset). Its child INGEST_DRAIN_TASK then processes due files
+-- in micro-batches of p_batch_size through PROCESS_BATCH. Task runs never overlap, so the batch
+-- size caps how many files are in flight. When a batch fails, the files it had not yet written
+-- to RAW are retried file by file, so a poison file only blocks itself. Failed files are retried with exponential backoff and moved
+-- to INGEST_DEAD_LETTER after p_max_attempts.
+
+-- One row per stage file; a new version of a file resets its row to PENDING
+CREATE OR REPLACE TABLE INGEST_QUEUE (
+  file_name         VARCHAR,
+  last_modified     TIMESTAMP_NTZ,  -- stage LAST_MODIFIED of the queued version
+  status            VARCHAR DEFAULT 'PENDING',  -- PENDING, PROCESSING, DONE or DEAD
+  attempts          NUMBER(38,0) DEFAULT 0,
+  next_attempt_at   TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+  claimed_at        TIMESTAMP_NTZ,
+  checked_at        TIMESTAMP_NTZ,  -- touched while a retry waits, which re-arms INGEST_ENQUEUE_TASK
+  last_error        VARCHAR,
+  result            VARCHAR,
+  enqueued_at       TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP(),
+  finished_at       TIMESTAMP_NTZ
+);
+
+-- Queue changes (new files, pending retries) keep the task graph running until the queue settles
+CREATE OR REPLACE STREAM INGEST_QUEUE_STREAM ON TABLE INGEST_QUEUE;
+
+-- Files that failed p_max_attempts times; re-uploading the file queues it again
+CREATE OR REPLACE TABLE INGEST_DEAD_LETTER (
+  file_name         VARCHAR,
+  last_modified     TIMESTAMP_NTZ,
+  attempts          NUMBER(38,0),
+  last_error        VARCHAR,
+  enqueued_at       TIMESTAMP_NTZ,
+  dead_lettered_at  TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP()
+);
+
+-- One row per DRAIN_INGEST_QUEUE run
+CREATE OR REPLACE TABLE INGEST_RUNS (
+  started_at        TIMESTAMP_NTZ,
+  queue_changes     NUMBER(38,0),   -- INGEST_QUEUE_STREAM rows consumed by the run
+  batches           NUMBER(38,0),
+  processed         NUMBER(38,0),
+  retried           NUMBER(38,0),
+  dead_lettered     NUMBER(38,0),
+  waiting           NUMBER(38,0),   -- PENDING files whose next attempt is not due yet
+  finished_at       TIMESTAMP_NTZ
+);
+
+CREATE OR REPLACE PROCEDURE ENQUEUE_STAGE_FILES()
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_queued NUMBER := 0;
+BEGIN
+  -- Skips stage versions that already have a RAW row (pre-loaded files, app uploads the app
+  -- has processed) or a DONE queue entry. An app upload the app failed to process is queued
+  -- like any other file; one still in flight is marked done by DRAIN_INGEST_QUEUE if the app
+  -- writes it first.
+  MERGE INTO INGEST_QUEUE q
+  USING (
+    SELECT s.RELATIVE_PATH AS file_name,
+           MAX(s.LAST_MODIFIED)::TIMESTAMP_NTZ AS last_modified
+    FROM DOCS_ROUTER_STREAM s
+    WHERE s.METADATA$ACTION = 'INSERT'
+      AND NOT STARTSWITH(s.RELATIVE_PATH, '_chunks/')  -- page chunks of PROCESS_CHUNKED_FILE
+      AND NOT EXISTS (
+        SELECT 1 FROM RAW r
+        WHERE r.file_name = s.RELATIVE_PATH AND r.created_at >= s.LAST_MODIFIED::TIMESTAMP_NTZ
+      )
+      AND NOT EXISTS (
+        SELECT 1 FROM INGEST_QUEUE d
+        WHERE d.file_name = s.RELATIVE_PATH
+          AND d.status = 'DONE'
+          AND d.last_modified >= s.LAST_MODIFIED::TIMESTAMP_NTZ
+      )
+    GROUP BY s.RELATIVE_PATH
+  ) n
+  ON q.file_name = n.file_name
+  WHEN MATCHED THEN UPDATE SET
+    last_modified = n.last_modified,
+    status = 'PENDING',
+    attempts = 0,
+    next_attempt_at = CURRENT_TIMESTAMP(),
+    claimed_at = NULL,
+    last_error = NULL,
+    result = NULL,
+    enqueued_at = CURRENT_TIMESTAMP(),
+    finished_at = NULL
+  WHEN NOT MATCHED THEN INSERT (file_name, last_modified) VALUES (n.file_name, n.last_modified);
+  v_queued := SQLROWCOUNT;
+  RETURN CONCAT('OK (queued ', v_queued, ' file(s))');
+END;
+$$;
+
+CREATE OR REPLACE PROCEDURE DRAIN_INGEST_QUEUE(
+  p_batch_size NUMBER DEFAULT 10,
+  p_max_batches NUMBER DEFAULT 5,
+  p_max_attempts NUMBER DEFAULT 3,
+  p_backoff_seconds NUMBER DEFAULT 60
+)
+RETURNS STRING
+LANGUAGE SQL
+AS $$
+DECLARE
+  v_started TIMESTAMP_NTZ := CURRENT_TIMESTAMP();
+  v_batch VARIANT;
+  v_claimed TIMESTAMP_NTZ;
+  v_written VARIANT;
+  v_missing VARIANT;
+  v_batches NUMBER := 0;
+  v_done NUMBER := 0;
+  v_retried NUMBER := 0;
+  v_dead NUMBER := 0;
+  v_waiting NUMBER := 0;
+  v_file STRING;
+  v_attempts NUMBER;
+  v_error STRING;
+  v_result STRING;
+BEGIN
+  -- Consume the queue's change stream first, so changes made while draining re-arm the tasks
+  INSERT INTO INGEST_RUNS (started_at, queue_changes)
+  SELECT :v_started, COUNT(*) FROM INGEST_QUEUE_STREAM;
+
+  -- Files claimed by a run that died (warehouse or task timeout) go back to the queue
+  UPDATE INGEST_QUEUE
+  SET status = 'PENDING'
+  WHERE status = 'PROCESSING'
+    AND claimed_at < DATEADD(hour, -1, CURRENT_TIMESTAMP());
+
+  -- Queued files written to RAW since (app uploads the app finished first) need no AI calls
+  UPDATE INGEST_QUEUE q
+  SET status = 'DONE', result = 'OK (already in RAW)', last_error = NULL, finished_at = CURRENT_TIMESTAMP()
+  WHERE q.status = 'PENDING'
+    AND EXISTS (
+      SELECT 1 FROM RAW r
+      WHERE r.file_name = q.file_name AND r.created_at >= q.last_modified
+    );
+  v_done := SQLROWCOUNT;
+
+  WHILE (v_batches < p_max_batches) DO
+    SELECT ARRAY_AGG(file_name) WITHIN GROUP (ORDER BY enqueued_at, file_name) INTO :v_batch
+    FROM (
+      SELECT file_name, enqueued_at
+      FROM INGEST_QUEUE
+      WHERE status = 'PENDING'
+        AND next_attempt_at <= CURRENT_TIMESTAMP()
+      ORDER BY enqueued_at, file_name
+      LIMIT :p_batch_size
+    );
+    IF (v_batch IS NULL OR ARRAY_SIZE(v_batch) = 0) THEN
+      BREAK;
+    END IF;
+    v_batches := v_batches + 1;
+
+    v_claimed := CURRENT_TIMESTAMP();
+    UPDATE INGEST_QUEUE
+    SET status = 'PROCESSING',
+        attempts = attempts + 1,
+        claimed_at = :v_claimed
+    WHERE status = 'PENDING'
+      AND ARRAY_CONTAINS(file_name::VARIANT, :v_batch);
+
+    BEGIN
+      CALL PROCESS_BATCH(:v_batch) INTO :v_result;
+      UPDATE INGEST_QUEUE
+      SET status = 'DONE', result = :v_result, last_error = NULL, finished_at = CURRENT_TIMESTAMP()
+      WHERE status = 'PROCESSING'
+        AND ARRAY_CONTAINS(file_name::VARIANT, :v_batch);
+      v_done := v_done + SQLROWCOUNT;
+    EXCEPTION
+      WHEN OTHER THEN
+        -- Rows PROCESS_BATCH wrote before failing (reuse or a later stage) are kept; only files
+        -- without a RAW row since the claim go through the AI calls again
+        SELECT ARRAY_AGG(IFF(r.file_name IS NOT NULL, b.value::STRING, NULL)),
+               ARRAY_AGG(IFF(r.file_name IS NULL, b.value::STRING, NULL))
+        INTO :v_written, :v_missing
+        FROM TABLE(FLATTEN(input => :v_batch)) b
+        LEFT JOIN (
+          SELECT DISTINCT file_name
+          FROM RAW
+          WHERE created_at >= :v_claimed
+        ) r ON r.file_name = b.value::STRING;
+        IF (ARRAY_SIZE(v_written) > 0) THEN
+          CALL INDEX_RECORD_FIELDS(:v_written);
+          UPDATE INGEST_QUEUE
+          SET status = 'DONE', result = 'OK (written before the batch failed)', last_error = NULL, finished_at = CURRENT_TIMESTAMP()
+          WHERE status = 'PROCESSING'
+            AND ARRAY_CONTAINS(file_name::VARIANT, :v_written);
+          v_done := v_done + SQLROWCOUNT;
+        END IF;
+        -- One bad file fails the whole set-based statement; isolate it by retrying file by file
+        FOR i IN 0 TO ARRAY_SIZE(v_missing) - 1 DO
+          v_file := GET(v_missing, i)::STRING;
+          BEGIN
+            BEGIN TRANSACTION;
+            CALL PROCESS_ONE_FILE(:v_file) INTO :v_result;
+            COMMIT;
+            UPDATE INGEST_QUEUE
+            SET status = 'DONE', result = :v_result, last_error = NULL, finished_at = CURRENT_TIMESTAMP()
+            WHERE file_name = :v_file AND status = 'PROCESSING';
+            v_done := v_done + SQLROWCOUNT;
+          EXCEPTION
+            WHEN OTHER THEN
+              ROLLBACK;
+              v_error := SQLERRM;
+              SELECT MAX(attempts) INTO :v_attempts
+              FROM INGEST_QUEUE
+              WHERE file_name = :v_file AND status = 'PROCESSING';
+              IF (v_attempts >= p_max_attempts) THEN
+                UPDATE INGEST_QUEUE
+                SET status = 'DEAD', last_error = :v_error, finished_at = CURRENT_TIMESTAMP()
+                WHERE file_name = :v_file AND status = 'PROCESSING';
+                INSERT INTO INGEST_DEAD_LETTER (file_name, last_modified, attempts, last_error, enqueued_at)
+                SELECT file_name, last_modified, attempts, last_error, enqueued_at
+                FROM INGEST_QUEUE
+                WHERE file_name = :v_file AND status = 'DEAD';
+                v_dead := v_dead + 1;
+              ELSEIF (v_attempts IS NOT NULL) THEN
+                UPDATE INGEST_QUEUE
+                SET status = 'PENDING',
+                    last_error = :v_error,
+                    next_attempt_at = DATEADD(second, (:p_backoff_seconds * POWER(2, attempts - 1))::INTEGER, CURRENT_TIMESTAMP())
+                WHERE file_name = :v_file AND status = 'PROCESSING';
+                v_retried := v_retried + 1;
+              END IF;
+          END;
+        END FOR;
+    END;
+  END WHILE;
+
+  -- Retries still waiting on their backoff: touching them keeps INGEST_QUEUE_STREAM non-empty,
+  -- so the task graph runs again once a minute until they are due
+  UPDATE INGEST_QUEUE
+  SET checked_at = CURRENT_TIMESTAMP()
+  WHERE status = 'PENDING';
+  v_waiting := SQLROWCOUNT;
+
+  UPDATE INGEST_RUNS
+  SET batches = :v_batches,
+      processed = :v_done,
+      retried = :v_retried,
+      dead_lettered = :v_dead,
+      waiting = :v_waiting,
+      finished_at = CURRENT_TIMESTAMP()
+  WHERE started_at = :v_started;
+  RETURN CONCAT('OK (processed ', v_done, ' file(s) in ', v_batches, ' batch(es), retrying ', v_retried,
+                ', dead-lettered ', v_dead, ', waiting ', v_waiting, ')');
+END;
+$$;
+
+-- Runs whenever new stage files or queue changes exist; the drain task follows each run
+CREATE OR REPLACE TASK INGEST_ENQUEUE_TASK
+  WAREHOUSE = AI_EXTRACT_XS_WH
+  SCHEDULE = '1 MINUTE'
+  WHEN SYSTEM$STREAM_HAS_DATA('DOCS_ROUTER_STREAM') OR SYSTEM$STREAM_HAS_DATA('INGEST_QUEUE_STREAM')
+AS
+  CALL ENQUEUE_STAGE_FILES();
+
+CREATE OR REPLACE TASK INGEST_DRAIN_TASK
+  WAREHOUSE = AI_EXTRACT_XS_WH
+  AFTER INGEST_ENQUEUE_TASK
+AS
+  CALL DRAIN_INGEST_QUEUE(10, 5, 3, 60);
+
 -- Seed PERMIT prompts
 INSERT INTO DOC_TYPE_PROMPTS (document_type, field_name, retrieval_prompt, sort_order)
 SELECT 'PERMIT','applicant_name','Applicant full name',1 UNION ALL
@@ -311,4 +1845,55 @@ SELECT 'CONTRACTOR','signed_date','What date was the document signed?',21 UNION
 SELECT 'CONTRACTOR','approved_by','Who approved this application?',22 UNION ALL
 SELECT 'CONTRACTOR','approved_date','What is the approved date, it will be found on a label/stamp/sticker. Likely towards the bottom of the page. It has a blue background.',23;
 
-CALL PROCESS_RAW();
\ No newline at end of file
+-- Seed validation rules for the simple-format fields; free-text fields are left to AI_COMPLETE
+UPDATE DOC_TYPE_PROMPTS p
+SET value_type = s.value_type,
+    pattern = s.pattern,
+    min_value = s.min_value,
+    max_value = s.max_value,
+    required = s.required
+FROM (
+  SELECT 'PERMIT' AS document_type,'applicant_name' AS field_name,NULL AS value_type,NULL AS pattern,NULL AS min_value,NULL AS max_value,TRUE AS required UNION ALL
+  SELECT 'PERMIT','phone','phone',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'PERMIT','email','email',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'PERMIT','estimated_cost','number',NULL,0,NULL,FALSE UNION ALL
+  SELECT 'PERMIT','affirmation','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'PERMIT','has_signature','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'PERMIT','signed_date','date',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'PERMIT','has_seal','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','applicant_name',NULL,NULL,NULL,NULL,TRUE UNION ALL
+  SELECT 'CONTRACTOR','state',NULL,'[A-Za-z]{2}',NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','zip','zip',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','phone','phone',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','email','email',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','wc_yes','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','bonded','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','years_experience','integer',NULL,0,100,FALSE UNION ALL
+  SELECT 'CONTRACTOR','affirmation','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','has_signature','boolean',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','signed_date','date',NULL,NULL,NULL,FALSE UNION ALL
+  SELECT 'CONTRACTOR','approved_date','date',NULL,NULL,NULL,FALSE
+) s
+WHERE p.document_type = s.document_type
+  AND p.field_name = s.field_name;
+
+-- Record the seeded prompt sets as version 1 so later edits can be diffed and re-extracted
+INSERT INTO DOC_TYPE_PROMPT_VERSIONS (document_type, version, prompt_hash, prompts, diff)
+SELECT document_type,
+       1,
+       SHA2(TO_JSON(prompts)),
+       prompts,
+       OBJECT_CONSTRUCT('added', fields, 'changed', ARRAY_CONSTRUCT(), 'removed', ARRAY_CONSTRUCT())
+FROM (
+  SELECT document_type,
+         ARRAY_AGG(ARRAY_CONSTRUCT(field_name, retrieval_prompt)) WITHIN GROUP (ORDER BY sort_order, field_name) AS prompts,
+         ARRAY_AGG(field_name) WITHIN GROUP (ORDER BY sort_order, field_name) AS fields
+  FROM DOC_TYPE_PROMPTS
+  GROUP BY document_type
+);
+
+CALL PROCESS_RAW();
+
+-- Start background ingestion only now, so the pre-loaded files processed above are skipped.
+-- Resuming tasks as SYSADMIN needs the EXECUTE TASK grant made at the top of this script.
+SELECT SYSTEM$TASK_DEPENDENTS_ENABLE('INGEST_ENQUEUE_TASK');
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""Shared fixtures: the app script imported once against the benchmarks' FakeSession."""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import run_benchmarks as bench  # noqa: E402
+from fake_session import FakeSession  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def documents():
+    return bench.load_documents()
+
+
+@pytest.fixture(scope="session")
+def fake_session(documents) -> FakeSession:
+    session = FakeSession(sql_latency_s=0, ai_latency_s=0, put_latency_s=0, get_latency_s=0)
+    for dtype, (description, fields) in bench.SEED_TYPES.items():
+        session.add_doc_type(dtype, description, [(f, f.replace("_", " ").capitalize()) for f in fields])
+    session.stage.update(documents)
+    # The script renders the Review tab on import, so it needs at least one record
+    session.seed_records(10, list(documents))
+    return session
+
+
+@pytest.fixture(scope="session")
+def app(fake_session):
+    return bench.load_app(fake_session)
+
+
+@pytest.fixture
+def records(app, fake_session, documents):
+    """Reseed RAW with 10 records and invalidate every record list and detail."""
+    fake_session.seed_records(10, list(documents))
+    app.bump_records(None, ["Approved", "Not Approved"])
+    for name in documents:
+        app.get_cache_versions().bump(("record", name))
+    return fake_session
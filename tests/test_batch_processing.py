@@ -0,0 +1,42 @@
+import json
+import re
+
+import run_benchmarks as bench
+
+
+def spy_calls(session, monkeypatch, procedure):
+    calls = []
+    sql = session.sql
+    monkeypatch.setattr(session, "sql", lambda q: (calls.append(q) if procedure in q else None) or sql(q))
+    return calls
+
+
+def payloads(call):
+    return [json.loads(p.replace("''", "'")) for p in re.findall(r"PARSE_JSON\('((?:[^']|'')*)'\)", call)]
+
+
+def test_full_batch_is_one_process_batch_call(app, records, documents, monkeypatch):
+    data = next(iter(documents.values()))
+    names = [f"set_{i}.pdf" for i in range(4)]
+    calls = spy_calls(records, monkeypatch, ".PROCESS_BATCH(")
+    rows = app.run_upload_pipeline([bench.UploadedFile(n, data) for n in names], upload_workers=4, batch_size=4, max_attempts=1)
+    assert {r["status"] for r in rows} == {"done"}
+    assert len(calls) == 1
+    assert sorted(payloads(calls[0])[0]) == names
+
+
+def test_single_file_remainder_uses_process_one_file(app, records, documents, monkeypatch):
+    data = next(iter(documents.values()))
+    batch_calls = spy_calls(records, monkeypatch, ".PROCESS_BATCH(")
+    rows = app.run_upload_pipeline([bench.UploadedFile("alone.pdf", data)], batch_size=4, max_attempts=1)
+    assert rows[0]["status"] == "done"
+    assert batch_calls == []
+
+
+def test_batch_passes_pre_classified_types(app, records, monkeypatch):
+    calls = spy_calls(records, monkeypatch, ".PROCESS_BATCH(")
+    app.process_staged_batch(["o'brien.pdf", "b.pdf"], {"o'brien.pdf": "CONTRACTOR"})
+    names, types = payloads(calls[0])
+    assert names == ["o'brien.pdf", "b.pdf"]
+    assert types == {"o'brien.pdf": "CONTRACTOR"}
+    assert [r["DOCUMENT_TYPE"] for r in records._raw if r["FILE_NAME"] == "o'brien.pdf"] == ["CONTRACTOR"]
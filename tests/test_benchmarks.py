@@ -0,0 +1,26 @@
+import pypdfium2 as pdfium
+
+import run_benchmarks as bench
+
+
+def test_summarize_reports_percentiles_and_throughput():
+    result = bench.summarize("x", [0.1, 0.2, 0.3, 0.4], items_per_sample=5)
+    assert result["runs"] == 4
+    assert result["p50_ms"] == 250
+    assert result["p95_ms"] == 400
+    assert result["throughput_per_s"] == 20
+
+
+def test_multipage_pdf_has_requested_pages(documents):
+    pdf = pdfium.PdfDocument(bench.make_multipage_pdf(documents, 5))
+    try:
+        assert len(pdf) == 5
+    finally:
+        pdf.close()
+
+
+def test_fake_session_processes_staged_files(app, records):
+    before = records.raw_count
+    app.process_staged_batch(["a.pdf", "b.pdf"], {"a.pdf": "PERMIT"})
+    assert records.raw_count == before + 2
+    assert {r["DOCUMENT_TYPE"] for r in records._raw if r["FILE_NAME"] == "a.pdf"} == {"PERMIT"}
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+
+@pytest.fixture
+def sql_log(fake_session, monkeypatch):
+    queries = []
+    real_sql = fake_session.sql
+    monkeypatch.setattr(fake_session, "sql", lambda q: queries.append(q) or real_sql(q))
+    return queries
+
+
+def unapproved(session, doc_type):
+    return [r for r in session._raw if not r["APPROVED"] and r["DOCUMENT_TYPE"] == doc_type]
+
+
+def extracted(row):
+    data = json.loads(row["EXTRACT_JSON"])
+    return data.get("response", data)
+
+
+def test_approves_many_records_in_one_call(app, records, sql_log):
+    chosen = [r for r in records._raw if not r["APPROVED"]]
+    items = [{"file_name": r["FILE_NAME"], "created_at": str(r["CREATED_AT"])} for r in chosen]
+    result = app.approve_records(items)
+    assert result == f"OK (approved {len(chosen)} record(s))"
+    assert len(sql_log) == 1 and "APPROVE_RECORDS(PARSE_JSON(" in sql_log[0]
+    assert all(r["APPROVED"] for r in records._raw)
+
+
+def test_overrides_apply_only_to_the_given_records(app, records):
+    first, second = unapproved(records, "PERMIT")[:2]
+    app.approve_records([
+        {"file_name": first["FILE_NAME"], "created_at": str(first["CREATED_AT"]), "fields": {"owner_name": "O'Neil"}},
+        {"file_name": second["FILE_NAME"], "created_at": str(second["CREATED_AT"])},
+    ])
+    assert extracted(first)["owner_name"] == "O'Neil"
+    assert extracted(second)["owner_name"] != "O'Neil"
+    assert first["APPROVED"] and second["APPROVED"]
+
+
+def test_approved_records_leave_the_not_approved_list(app, records):
+    target = unapproved(records, "CONTRACTOR")[0]
+    before = app.load_record_page("CONTRACTOR", "Not Approved", None, app.records_version("CONTRACTOR", "Not Approved"))
+    assert target["FILE_NAME"] in set(before["FILE_NAME"])
+    app.approve_records([{"file_name": target["FILE_NAME"], "created_at": str(target["CREATED_AT"])}])
+    app.bump_records("CONTRACTOR", ["Approved", "Not Approved"])
+    after = app.load_record_page("CONTRACTOR", "Not Approved", None, app.records_version("CONTRACTOR", "Not Approved"))
+    assert len(after) == len(before) - 1
@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.fixture
+def sql_log(fake_session, monkeypatch):
+    queries = []
+    real_sql = fake_session.sql
+    monkeypatch.setattr(fake_session, "sql", lambda q: queries.append(q) or real_sql(q))
+    return queries
+
+
+def test_bump_records_touches_only_lists_that_can_hold_the_record(app):
+    before = {
+        (t, f): app.records_version(t, f)
+        for t in ("PERMIT", "CONTRACTOR", "All")
+        for f in ("Approved", "Not Approved", "All")
+    }
+    app.bump_records("PERMIT", ["Approved"])
+    changed = {k for k, v in before.items() if app.records_version(*k) != v}
+    assert changed == {("PERMIT", "Approved"), ("PERMIT", "All"), ("All", "Approved"), ("All", "All")}
+
+
+def test_bump_records_without_a_type_touches_every_type(app):
+    before = {t: app.records_version(t, "Not Approved") for t in ("PERMIT", "CONTRACTOR", "All")}
+    approved = app.records_version("PERMIT", "Approved")
+    app.bump_records(None, ["Not Approved"])
+    assert all(app.records_version(t, "Not Approved") != v for t, v in before.items())
+    assert app.records_version("PERMIT", "Approved") == approved
+
+
+def test_prompt_writes_reload_only_their_own_type(app, sql_log):
+    versions = app.get_cache_versions()
+    for dtype in ("PERMIT", "CONTRACTOR"):
+        app.load_prompts(dtype, versions.get("prompts", dtype))
+    versions.bump(("prompts", "PERMIT"))
+    del sql_log[:]
+    app.load_prompts("CONTRACTOR", versions.get("prompts", "CONTRACTOR"))
+    assert sql_log == []
+    app.load_prompts("PERMIT", versions.get("prompts", "PERMIT"))
+    assert len(sql_log) == 1 and "'PERMIT'" in sql_log[0]
+
+
+def test_record_list_is_cached_until_its_scope_is_bumped(app, records, sql_log):
+    app.load_record_page("CONTRACTOR", "Not Approved", None, app.records_version("CONTRACTOR", "Not Approved"))
+    app.bump_records("PERMIT", ["Approved"])
+    del sql_log[:]
+    app.load_record_page("CONTRACTOR", "Not Approved", None, app.records_version("CONTRACTOR", "Not Approved"))
+    assert sql_log == []
+    app.bump_records("CONTRACTOR", ["Not Approved"])
+    app.load_record_page("CONTRACTOR", "Not Approved", None, app.records_version("CONTRACTOR", "Not Approved"))
+    assert len(sql_log) == 1
@@ -0,0 +1,75 @@
+import os
+
+
+def test_spills_least_recently_used_entries_to_disk(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=10, disk_bytes=100, spill_dir=str(tmp_path))
+    cache.put("a", b"aaaaaa")
+    cache.put("b", b"bbbbbb")  # pushes "a" out of memory
+    assert cache.get("b") == b"bbbbbb"
+    assert bytes(cache.get("a")) == b"aaaaaa"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["spills"]) == (1, 1, 1)
+
+
+def test_reuses_one_map_per_spilled_file(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=0, disk_bytes=100, spill_dir=str(tmp_path))
+    cache.put("a", b"abc")
+    assert cache.get("a") is cache.get("a")
+
+
+def test_evicts_disk_entries_beyond_limit(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=0, disk_bytes=8, spill_dir=str(tmp_path))
+    cache.put("a", b"aaaaa")
+    cache.put("b", b"bbbbb")
+    assert cache.get("a") is None
+    assert bytes(cache.get("b")) == b"bbbbb"
+    assert cache.stats()["disk_bytes"] == 5
+
+
+def test_survives_empty_and_truncated_spills(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=5, disk_bytes=100, spill_dir=str(tmp_path))
+    cache.put("empty", b"")
+    cache.put("b", b"bbb")
+    cache.put("c", b"ccc")  # evicts "empty" and "b"; an empty file cannot be mapped
+    assert cache.get("empty") is None
+    assert cache.stats()["evictions"] == 1
+    cache.put("a", b"abcdef")
+    with open(cache._spill_path("a"), "r+b") as fh:
+        fh.truncate(2)
+    assert cache.get("a") is None
+    assert cache.stats()["disk_entries"] == 1
+    assert os.listdir(tmp_path) == [os.path.basename(cache._spill_path("b"))]
+
+
+def test_closes_maps_beyond_max_maps(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=0, disk_bytes=100, spill_dir=str(tmp_path), max_maps=1)
+    cache.put("a", b"aaa")
+    cache.put("b", b"bbb")
+    first = cache.get("a")
+    assert bytes(cache.get("b")) == b"bbb"
+    assert first.closed
+    assert cache.stats()["open_maps"] == 1
+    assert bytes(cache.get("a")) == b"aaa"  # mapped again on the next hit
+
+
+def test_defers_closing_maps_that_renders_still_view(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=0, disk_bytes=100, spill_dir=str(tmp_path), max_maps=1)
+    cache.put("a", b"aaa")
+    cache.put("b", b"bbb")
+    view = memoryview(cache.get("a"))  # stands in for a PdfDocument opened over the map
+    cache.get("b")
+    assert cache.stats()["open_maps"] == 2
+    assert view.tobytes() == b"aaa"
+    view.release()
+    cache.get("b")
+    assert cache.stats()["open_maps"] == 1
+
+
+def test_invalidate_closes_the_map(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=0, disk_bytes=100, spill_dir=str(tmp_path))
+    cache.put("a", b"abc")
+    mapped = cache.get("a")
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert mapped.closed
+    assert cache.stats()["open_maps"] == 0
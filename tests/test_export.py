@@ -0,0 +1,51 @@
+import io
+import json
+
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from fake_session import FakeDataFrame
+
+
+@pytest.fixture
+def approved(app, records, monkeypatch):
+    """PERMIT records approved one after another, exported two rows per result batch."""
+    monkeypatch.setattr(FakeDataFrame, "batch_rows", 2)
+    permits = [r for r in records._raw if r["DOCUMENT_TYPE"] == "PERMIT"]
+    # The first batch has no owner_name, so its column must not be typed from it
+    for r in permits[:2]:
+        extract = json.loads(r["EXTRACT_JSON"])
+        extract.get("response", extract).pop("owner_name")
+        r["EXTRACT_JSON"] = json.dumps(extract)
+    for r in permits:
+        app.approve_records([{"file_name": r["FILE_NAME"], "created_at": str(r["CREATED_AT"])}])
+    return permits
+
+
+def test_parquet_export_streams_every_batch(app, approved):
+    dest = io.BytesIO()
+    rows, through = app.write_export(app.export_approved_sql("PERMIT", ["owner_name", "phone"]), "parquet", dest)
+    table = pq.read_table(io.BytesIO(dest.getvalue()))
+    assert rows == table.num_rows == len(approved)
+    assert table.schema.field("owner_name").type == "string"
+    assert table.column("owner_name").null_count == 2
+    assert pd.Timestamp(through) == max(r["APPROVED_AT"] for r in approved)
+
+
+def test_csv_export_writes_one_header(app, approved):
+    dest = io.BytesIO()
+    rows, _ = app.write_export(app.export_approved_sql("PERMIT", ["phone"]), "csv", dest)
+    frame = pd.read_csv(io.BytesIO(dest.getvalue()))
+    assert rows == len(frame) == len(approved)
+    assert list(frame.columns) == ["FILE_NAME", "DOCUMENT_TYPE", "CREATED_AT", "APPROVED_AT", "phone"]
+
+
+def test_incremental_export_starts_after_the_watermark(app, approved):
+    sql = app.export_approved_sql("PERMIT", ["phone"])
+    _, through = app.write_export(sql, "csv", io.BytesIO())
+    assert app.write_export(app.export_approved_sql("PERMIT", ["phone"], through), "csv", io.BytesIO()) == (0, None)
+    latest = approved[-1]
+    app.approve_records([{"file_name": latest["FILE_NAME"], "created_at": str(latest["CREATED_AT"])}])
+    rows, newer = app.write_export(app.export_approved_sql("PERMIT", ["phone"], through), "csv", io.BytesIO())
+    assert rows == 1 and newer > through
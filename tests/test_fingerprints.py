@@ -0,0 +1,27 @@
+import hashlib
+import io
+
+import run_benchmarks as bench
+
+
+def test_fingerprint_hashes_the_streamed_bytes(app, records, monkeypatch):
+    monkeypatch.setattr(app, "UPLOAD_HASH_BLOCK_BYTES", 7)
+    data = b"identical bytes are processed once" * 3
+    app.record_fingerprint("same.pdf", io.BytesIO(data), page_count=2)
+    assert records.fingerprints["same.pdf"] == hashlib.sha256(data).hexdigest()
+
+
+def test_uploads_of_equal_bytes_share_a_fingerprint(app, records, documents):
+    data = next(iter(documents.values()))
+    app.run_upload_pipeline([bench.UploadedFile("copy_a.pdf", data), bench.UploadedFile("copy_b.pdf", data)], max_attempts=1)
+    assert records.fingerprints["copy_a.pdf"] == records.fingerprints["copy_b.pdf"]
+
+
+def test_first_page_classification_uses_the_shared_prompt(app, records, documents, monkeypatch):
+    queries = []
+    sql = records.sql
+    monkeypatch.setattr(records, "sql", lambda q: queries.append(q) or sql(q))
+    label = app.classify_first_pages("head.pdf", next(iter(documents.values())), ["CONTRACTOR", "PERMIT"])
+    assert label == "CONTRACTOR"
+    classify = [q for q in queries if "AI_EXTRACT(" in q]
+    assert len(classify) == 1 and "CLASSIFICATION_PROMPT" in classify[0]
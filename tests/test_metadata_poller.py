@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture
+def poller(app, fake_session):
+    p = app.MetadataChangePoller(app.CacheVersions(), interval_s=60)
+    assert p.poll(fake_session) == []  # the first poll only records the markers
+    return p
+
+
+def test_bumps_only_the_scopes_that_changed(poller, fake_session, monkeypatch):
+    monkeypatch.setitem(fake_session.prompts, "PERMIT", fake_session.prompts["PERMIT"][:-1])
+    assert poller.poll(fake_session) == [("prompts", "PERMIT")]
+    assert poller.versions.get("prompts", "PERMIT") == 1
+    assert poller.versions.get("prompts", "CONTRACTOR") == 0
+    assert poller.versions.get("doc_types") == 0
+    assert poller.poll(fake_session) == []
+
+
+def test_in_place_edits_are_caught_by_the_digest(poller, fake_session, monkeypatch):
+    monkeypatch.setitem(fake_session.doc_types, "PERMIT", "Building permit (renamed)")
+    assert poller.poll(fake_session) == [("doc_types",)]
+
+
+def test_maybe_poll_queries_at_most_once_per_interval(poller, fake_session, monkeypatch):
+    monkeypatch.setitem(fake_session.doc_types, "INVOICE", "Invoice")
+    before = fake_session.statements
+    assert poller.maybe_poll(fake_session) == [("doc_types",)]
+    monkeypatch.setitem(fake_session.doc_types, "RECEIPT", "Receipt")
+    assert poller.maybe_poll(fake_session) == []
+    assert fake_session.statements == before + 1
+
+
+def test_maybe_poll_survives_a_failed_query(poller, fake_session, monkeypatch):
+    def fail(q):
+        raise RuntimeError("warehouse suspended")
+
+    monkeypatch.setattr(fake_session, "sql", fail)
+    assert poller.maybe_poll(fake_session) == []
+
+
+def test_refresh_absorbs_own_writes_and_falls_back_to_bumping(poller, fake_session, monkeypatch):
+    monkeypatch.setitem(fake_session.prompts, "CONTRACTOR", fake_session.prompts["CONTRACTOR"][:-1])
+    poller.refresh(fake_session, ("prompts", "CONTRACTOR"))
+    assert poller.poll(fake_session) == []
+
+    def fail(q):
+        raise RuntimeError("warehouse suspended")
+
+    monkeypatch.setattr(fake_session, "sql", fail)
+    poller.refresh(fake_session, ("prompts", "CONTRACTOR"))
+    assert poller.versions.get("prompts", "CONTRACTOR") == 2
@@ -0,0 +1,40 @@
+import pytest
+
+import run_benchmarks as bench
+
+
+@pytest.fixture(scope="module")
+def sample_pdf(documents):
+    return bench.make_multipage_pdf(documents, 3)
+
+
+def test_renders_once_per_page_and_scale(app, sample_pdf):
+    cache = app.PageRenderCache(max_bytes=1 << 30, max_docs=2)
+    assert cache.page_count("a.pdf::1", sample_pdf) == 3
+    first = cache.get("a.pdf::1", sample_pdf, 0, 0.5)
+    assert cache.get("a.pdf::1", sample_pdf, 0, 0.5) is first
+    assert cache.get("a.pdf::1", sample_pdf, 0, 0.25) is not first
+
+
+def test_evicts_least_recently_used_pages_but_keeps_the_newest(app, sample_pdf):
+    cache = app.PageRenderCache(max_bytes=1, max_docs=2)
+    first = cache.get("a.pdf::1", sample_pdf, 0, 0.25)
+    newest = cache.get("a.pdf::1", sample_pdf, 1, 0.25)
+    assert list(cache._pages) == [("a.pdf::1", 1, 0.25)]
+    assert cache.get("a.pdf::1", sample_pdf, 1, 0.25) is newest
+    assert cache.get("a.pdf::1", sample_pdf, 0, 0.25) is not first
+
+
+def test_closes_documents_beyond_max_docs(app, sample_pdf):
+    cache = app.PageRenderCache(max_bytes=1 << 30, max_docs=2)
+    for key in ("a::1", "b::1", "c::1"):
+        cache.page_count(key, sample_pdf)
+    assert list(cache._docs) == ["b::1", "c::1"]
+
+
+def test_prefetched_neighbours_are_served_from_cache(app, sample_pdf):
+    cache = app.PageRenderCache(max_bytes=1 << 30, max_docs=2)
+    cache.prefetch("a.pdf::1", sample_pdf, [1, 2], 0.25)
+    cache._prefetcher.shutdown(wait=True)
+    assert not cache._inflight
+    assert cache.get("a.pdf::1", sample_pdf, 2, 0.25) is cache._pages[("a.pdf::1", 2, 0.25)][0]
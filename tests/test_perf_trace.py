@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def trace(app):
+    previous = app.current_perf_trace()
+    app._perf_local.trace = app.PerfTrace(0, "test")
+    yield app._perf_local.trace
+    app._perf_local.trace = previous
+
+
+def cache_spans(trace, name):
+    return [s["hit"] for s in trace.spans if s["kind"] == "cache" and s["name"] == name]
+
+
+def test_traced_cache_labels_hits_and_misses(app, trace):
+    calls = []
+
+    @app.traced_cache("test_square", ttl=60)
+    def square(x):
+        calls.append(x)
+        return x * x
+
+    assert [square(3), square(3), square(4)] == [9, 9, 16]
+    assert calls == [3, 4]
+    assert cache_spans(trace, "test_square") == [False, True, False]
+
+
+def test_inner_hit_does_not_relabel_the_outer_miss(app, trace):
+    @app.traced_cache("test_inner", ttl=60)
+    def inner(x):
+        return x + 1
+
+    @app.traced_cache("test_outer", ttl=60)
+    def outer(x, salt):
+        return inner(x) * 2
+
+    inner(1)
+    assert outer(1, "a") == 4
+    assert outer(1, "a") == 4
+    assert cache_spans(trace, "test_inner") == [False, True]
+    assert cache_spans(trace, "test_outer") == [False, True]
+
+
+def test_sql_spans_and_worker_threads_land_in_the_rerun_trace(app, trace, fake_session):
+    worker = threading.Thread(target=app.bind_perf_trace(lambda: app.session.sql("SELECT 1").collect()), name="worker")
+    worker.start()
+    worker.join()
+    spans = [s for s in trace.spans if s["kind"] == "sql"]
+    assert [s["thread"] for s in spans] == ["worker"]
+    assert all(r["session_id"] == "test" for r in trace.records())
@@ -0,0 +1,46 @@
+import threading
+
+import pypdfium2 as pdfium
+
+import run_benchmarks as bench
+
+PROFILES = {"PERMIT": "Building Permit Request", "CONTRACTOR": "Contractor License Application"}
+
+
+def test_picks_a_clear_match(app):
+    assert app.preclassify_text("City of Springfield\nBuilding Permit Request form", PROFILES) == "PERMIT"
+
+
+def test_needs_a_margin_over_the_runner_up(app):
+    text = "Building permit request for a contractor license application"
+    assert app.preclassify_text(text, PROFILES) is None
+
+
+def test_needs_a_minimum_score(app):
+    assert app.preclassify_text("permit", PROFILES) is None
+
+
+def test_without_text_or_profiles(app):
+    assert app.preclassify_text("", PROFILES) is None
+    assert app.preclassify_text("building permit request", {}) is None
+
+
+def test_long_pdf_without_a_text_match_is_classified_from_its_first_pages(app, documents):
+    calls = []
+
+    def classify_pages(file_name, head, profiles):
+        calls.append((file_name, len(pdfium.PdfDocument(head))))
+        return "CONTRACTOR"
+
+    preclassify = app.make_preclassifier({"OTHER": "Unrelated form"}, threading.Lock(), classify_pages)
+    assert preclassify("long.pdf", bench.make_multipage_pdf(documents, 3)) == "CONTRACTOR"
+    assert calls == [("long.pdf", app.PRECLASSIFY_PAGES)]
+
+
+def test_leaves_images_and_failures_to_the_procedure(app, documents):
+    def classify_pages(file_name, head, profiles):
+        raise RuntimeError("warehouse unavailable")
+
+    preclassify = app.make_preclassifier(PROFILES, threading.Lock(), classify_pages)
+    assert preclassify("scan.png", b"\x89PNG") is None
+    assert preclassify("long.pdf", bench.make_multipage_pdf(documents, 3)) is None
@@ -0,0 +1,66 @@
+import calendar
+import time
+
+import pytest
+
+
+@pytest.fixture
+def sql_log(fake_session, monkeypatch):
+    queries = []
+    real_sql = fake_session.sql
+    monkeypatch.setattr(fake_session, "sql", lambda q: queries.append(q) or real_sql(q))
+    return queries
+
+
+def s3_url(name, signed_at, expires_s):
+    stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime(signed_at))
+    return f"https://bucket.s3.amazonaws.com/{name}?X-Amz-Date={stamp}&X-Amz-Expires={expires_s}&X-Amz-Signature=x"
+
+
+def test_expiry_of_s3_and_gcs_urls(app):
+    signed_at = calendar.timegm((2025, 1, 2, 3, 4, 5, 0, 0, 0))
+    gcs = "https://storage.googleapis.com/b/a.pdf?x-goog-date=20250102T030405Z&x-goog-expires=900"
+    assert app.presigned_url_expiry(s3_url("a.pdf", signed_at, 3600)) == signed_at + 3600
+    assert app.presigned_url_expiry(gcs) == signed_at + 900
+
+
+def test_expiry_of_azure_urls(app):
+    base = "https://acct.blob.core.windows.net/c/a.pdf?sv=2022-11-02&sig=x&se="
+    assert app.presigned_url_expiry(base + "2025-01-02T03:04:05Z") == calendar.timegm((2025, 1, 2, 3, 4, 5, 0, 0, 0))
+    assert app.presigned_url_expiry(base + "2025-01-02") == calendar.timegm((2025, 1, 2, 0, 0, 0, 0, 0, 0))
+
+
+@pytest.mark.parametrize("url", [None, "", "https://example.com/a.pdf", "https://x/a.pdf?X-Amz-Date=bad&X-Amz-Expires=60"])
+def test_expiry_unknown(app, url):
+    assert app.presigned_url_expiry(url) is None
+
+
+def test_signs_a_page_per_batch_and_serves_reruns_from_memory(app, fake_session, sql_log):
+    resolver = app.PresignedUrlResolver(batch=2)
+    names = ["a.pdf", "b.pdf", "it's.pdf"]
+    urls = resolver.resolve(fake_session, names)
+    assert all(urls[n] and n in urls[n] for n in names)
+    assert len(sql_log) == 2
+    assert resolver.resolve(fake_session, names) == urls
+    assert len(sql_log) == 2
+
+
+def test_reuses_known_urls_only_while_they_last(app, fake_session, sql_log):
+    resolver = app.PresignedUrlResolver()
+    now = time.time()
+    fresh = s3_url("a.pdf", now, 3600)
+    stale = s3_url("b.pdf", now, 600)  # less than PRESIGNED_URL_MIN_LIFETIME_SECONDS left
+    urls = resolver.resolve(fake_session, ["a.pdf", "b.pdf"], known={"a.pdf": fresh, "b.pdf": stale})
+    assert urls["a.pdf"] == fresh
+    assert urls["b.pdf"] != stale
+    assert len(sql_log) == 1 and "b.pdf" in sql_log[0] and "a.pdf" not in sql_log[0]
+
+
+def test_refresh_re_signs_urls_close_to_expiry(app, fake_session, sql_log):
+    resolver = app.PresignedUrlResolver(expiry_s=1000, min_lifetime_s=900, refresh_s=1200)
+    resolver.resolve(fake_session, ["a.pdf"])
+    assert resolver.refresh(fake_session) == 1
+    assert len(sql_log) == 2
+    assert resolver.refresh(fake_session) == 0  # next check is scheduled, not immediate
+    assert resolver.resolve(fake_session, ["a.pdf"])["a.pdf"] is not None
+    assert len(sql_log) == 2
@@ -0,0 +1,62 @@
+import json
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def sql_log(fake_session, monkeypatch):
+    queries = []
+    real_sql = fake_session.sql
+    monkeypatch.setattr(fake_session, "sql", lambda q: queries.append(q) or real_sql(q))
+    return queries
+
+
+def grid(*rows):
+    columns = ["field_name", "retrieval_prompt", "sort_order", "value_type", "pattern", "min_value", "max_value", "required"]
+    return pd.DataFrame([dict(zip(columns, r)) for r in rows], columns=columns)
+
+
+def test_all_patterns_are_checked_in_one_statement(app, sql_log):
+    rows = app.prompt_rows(grid(
+        ("zip", "ZIP code", 1, "zip", r"\d{5}", None, None, True),
+        ("parcel", "Parcel number", 2, None, "[0-9]{3}-[0-9]{2}", None, None, False),
+        ("owner", "Owner", 3, None, None, None, None, False),
+    ))
+    assert [r["pattern"] for r in rows] == [r"\d{5}", "[0-9]{3}-[0-9]{2}", None]
+    assert len(sql_log) == 1 and sql_log[0].count("REGEXP_LIKE(") == 2
+
+
+def test_invalid_pattern_names_its_field_before_anything_is_written(app, sql_log):
+    with pytest.raises(ValueError, match="field 'parcel'"):
+        app.prompt_rows(grid(
+            ("zip", "ZIP code", 1, None, r"\d{5}", None, None, False),
+            ("parcel", "Parcel number", 2, None, "([0-9]", None, None, False),
+        ))
+    assert all(q.startswith("SELECT REGEXP_LIKE(") for q in sql_log)
+
+
+def test_rows_without_patterns_need_no_query(app, sql_log):
+    rows = app.prompt_rows(grid(("owner:Owner name", None, "", None, None, "1", None, None)))
+    assert rows == [{
+        "field_name": "owner", "retrieval_prompt": "Owner name", "sort_order": 0, "value_type": None,
+        "pattern": None, "min_value": 1.0, "max_value": None, "required": False,
+    }]
+    assert sql_log == []
+
+
+@pytest.mark.parametrize("row, message", [
+    (("amount", "Amount", 1, "money", None, None, None, False), "Unknown value_type"),
+    (("amount", "Amount", 1, "number", None, "ten", None, False), "min_value for field 'amount'"),
+])
+def test_rejects_rules_the_view_cannot_evaluate(app, row, message):
+    with pytest.raises(ValueError, match=message):
+        app.prompt_rows(grid(row))
+
+
+def test_replace_prompts_sends_the_prepared_rows(app, sql_log):
+    rows = app.prompt_rows(grid(("owner", "Owner's name", 1, None, None, None, None, False)))
+    saved, diff = app.replace_prompts("PERMIT", rows)
+    assert saved == 1 and diff["version"] == 1
+    payload = sql_log[-1].split("PARSE_JSON('", 1)[1].rsplit("')", 1)[0].replace("''", "'")
+    assert json.loads(payload) == rows
@@ -0,0 +1,65 @@
+import itertools
+
+_versions = itertools.count(1000)
+
+
+def fresh_version():
+    # load_record_page is cached on its arguments; a new version forces a query
+    v = next(_versions)
+    return (v, v)
+
+
+def test_records_where_filters(app):
+    assert app._records_where("All", "All") == []
+    assert app._records_where("O'NEIL", "Approved") == ["document_type = 'O''NEIL'", "approved = TRUE"]
+    assert app._records_where("PERMIT", "Not Approved") == ["document_type = 'PERMIT'", "approved = FALSE"]
+
+
+def test_record_page_cursor_breaks_ties_on_file_name(app, fake_session, monkeypatch):
+    queries = []
+    real_sql = fake_session.sql
+    monkeypatch.setattr(fake_session, "sql", lambda q: queries.append(q) or real_sql(q))
+    app.load_record_page("PERMIT", "All", ("2025-01-01 00:00:05", "it's.pdf"), fresh_version(), page_size=5)
+    sql = " ".join(queries[-1].split())
+    assert "extract_json" not in sql.lower()
+    assert "r.created_at < TO_TIMESTAMP_NTZ('2025-01-01 00:00:05')" in sql
+    assert "r.created_at = TO_TIMESTAMP_NTZ('2025-01-01 00:00:05') AND r.file_name < 'it''s.pdf'" in sql
+    assert "ORDER BY r.created_at DESC, r.file_name DESC" in sql
+    assert sql.endswith("LIMIT 6")
+
+
+def test_record_pages_cover_every_record_once(app, fake_session, documents):
+    fake_session.seed_records(23, ["a.pdf", "b.pdf", "c.pdf"])
+    try:
+        seen, cursor, pages = [], None, 0
+        while True:
+            page = app.load_record_page("All", "All", cursor, fresh_version(), page_size=5)
+            rows = page.head(5)
+            seen.extend(zip(rows["CREATED_AT"].astype(str), rows["FILE_NAME"]))
+            pages += 1
+            if len(page) <= 5:
+                break
+            last = rows.iloc[-1]
+            cursor = (str(last["CREATED_AT"]), str(last["FILE_NAME"]))
+    finally:
+        fake_session.seed_records(10, list(documents))
+    assert pages == 5
+    assert len(seen) == len(set(seen)) == 23
+    assert seen == sorted(seen, reverse=True)
+
+
+def test_stage_file_key_is_stable_until_the_file_is_replaced(app, fake_session, documents):
+    name = next(iter(documents))
+    app.get_document_cache().invalidate(name)
+    data, key = app.fetch_stage_file(fake_session, name)
+    assert bytes(data) == documents[name]
+    assert app.fetch_stage_file(fake_session, name)[1] == key
+    app.get_document_cache().invalidate(name)
+    assert app.fetch_stage_file(fake_session, name)[1] != key
+
+
+def test_content_key_changes_on_every_put(app, tmp_path):
+    cache = app.DocumentByteCache(memory_bytes=0, disk_bytes=100, spill_dir=str(tmp_path))
+    first = cache.put("a", b"abc")
+    assert cache.lookup("a")[1] == first  # served from the spill tier
+    assert cache.put("a", b"abc") != first
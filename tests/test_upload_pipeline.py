@@ -0,0 +1,43 @@
+import run_benchmarks as bench
+
+
+def upload(names, documents):
+    data = next(iter(documents.values()))
+    return [bench.UploadedFile(name, data) for name in names]
+
+
+def rows_for(session, name):
+    return [r for r in session._raw if r["FILE_NAME"] == name]
+
+
+def test_pipeline_stages_and_processes_every_file(app, records, documents):
+    names = [f"pipe_{i}.pdf" for i in range(6)]
+    rows = app.run_upload_pipeline(upload(names, documents), upload_workers=3, process_workers=2, max_attempts=1)
+    assert [r["file"] for r in rows] == names
+    assert {r["status"] for r in rows} == {"done"}
+    for name in names:
+        assert name in records.stage
+        assert name in records.fingerprints
+        assert len(rows_for(records, name)) == 1
+
+
+def test_pipeline_reports_progress_snapshots(app, records, documents):
+    seen = []
+    app.run_upload_pipeline(upload(["progress.pdf"], documents), max_attempts=1, on_progress=seen.append)
+    assert seen[-1][0]["status"] == "done"
+    assert seen[0][0] is not seen[-1][0]  # each snapshot copies the rows
+
+
+def test_failed_batch_retries_only_unwritten_files(app, records, documents, monkeypatch):
+    names = ["batch_ok_1.pdf", "batch_bad.pdf", "batch_ok_2.pdf"]
+    monkeypatch.setattr(records, "failing_files", {"batch_bad.pdf"})
+    calls = []
+    process = app.process_staged_file
+    monkeypatch.setattr(app, "process_staged_file", lambda name, *a: calls.append(name) or process(name, *a))
+    rows = {r["file"]: r for r in app.run_upload_pipeline(upload(names, documents), batch_size=3, max_attempts=1)}
+    assert calls == ["batch_bad.pdf"]
+    assert rows["batch_bad.pdf"]["status"] == "failed (processing)"
+    for name in ("batch_ok_1.pdf", "batch_ok_2.pdf"):
+        assert rows[name]["status"] == "done"
+        assert rows[name]["result"] == "OK (written before the batch failed)"
+        assert len(rows_for(records, name)) == 1
@@ -0,0 +1,58 @@
+import io
+import threading
+
+from PIL import Image
+
+import run_benchmarks as bench
+
+
+def scan(app, dpi, fmt="JPEG"):
+    # A4-height page at ``dpi``; noise keeps the encoding realistically large
+    height = int(dpi * app.UPLOAD_PAGE_INCHES)
+    img = Image.effect_noise((int(height * 0.7), height), 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, fmt, quality=92) if fmt == "JPEG" else img.save(buf, fmt)
+    return buf.getvalue()
+
+
+def long_side(data):
+    with Image.open(io.BytesIO(data)) as img:
+        return max(img.size)
+
+
+def test_scans_at_twice_the_limit_are_resized(app):
+    data = scan(app, 66)
+    out = app.downsample_image(data, 30)
+    assert out is not None and len(out) < len(data)
+    assert long_side(out) == int(30 * app.UPLOAD_PAGE_INCHES)
+
+
+def test_scans_below_the_ratio_are_left_alone(app):
+    data = scan(app, 54)
+    assert app.downsample_image(data, 30) is None
+    assert app.downsample_image(data, 30, min_ratio=1.0) is not None
+
+
+def test_png_keeps_its_format(app):
+    out = app.downsample_image(scan(app, 66, "PNG"), 30)
+    with Image.open(io.BytesIO(out)) as img:
+        assert img.format == "PNG"
+
+
+def test_preprocessor_skips_small_files_and_unreadable_images(app):
+    data = scan(app, 66)
+    lock = threading.Lock()
+    assert app.make_upload_preprocessor(lock, 30, False, len(data) + 1)("a.jpg", data) is None
+    assert app.make_upload_preprocessor(lock, 30, False, 0)("a.jpg", data) is not None
+    assert app.make_upload_preprocessor(lock, 30, False, 0)("b.jpg", b"not an image") is None
+    assert app.make_upload_preprocessor(lock, None, False, 0)("a.jpg", data) is None
+
+
+def test_pipeline_stages_the_smaller_bytes(app, fake_session):
+    data = scan(app, 66)
+    preprocess = app.make_upload_preprocessor(threading.Lock(), 30, False, 0)
+    rows = app.run_upload_pipeline([bench.UploadedFile("scan_small.jpg", data)], max_attempts=1, preprocess=preprocess)
+    assert rows[0]["status"] == "done"
+    staged = fake_session.stage["scan_small.jpg"]
+    assert len(staged) < len(data)
+    assert rows[0]["saved_kb"] == round((len(data) - len(staged)) / 1024, 1)